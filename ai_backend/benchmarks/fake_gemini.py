@@ -0,0 +1,113 @@
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass
+
+_LATEST_MESSAGE_RE = re.compile(r'(?:Latest Message|User Question|Follow-up Question): "(.*)"')
+_CATEGORY_LINE_RE = re.compile(r"^\s*- (\w+)\s*$", re.MULTILINE)
+
+
+@dataclass
+class _Usage:
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+
+
+class _Part:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, text: str):
+        self.parts = [_Part(text)]
+
+
+class _Candidate:
+    def __init__(self, text: str):
+        self.content = _Content(text)
+
+
+class FakeResponse:
+    """The subset of a Gemini `GenerateContentResponse` the app reads."""
+
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.candidates = [_Candidate(text)]
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        self.usage_metadata = _Usage(prompt_tokens, output_tokens, prompt_tokens + output_tokens)
+
+
+class FakeGeminiModel:
+    """
+    Deterministic stand-in for `genai.GenerativeModel`, with configurable latency.
+
+    Replies are a function of the prompt only: planner and classifier prompts get a category
+    picked by name from the prompt's own category list, re-framing prompts get the question
+    back, everything else gets a canned answer of `output_words` words. Latency is
+    `latency_ms + uniform(0, jitter_ms) + ms_per_output_token * tokens`, seeded per prompt.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter_ms: float = 200.0,
+        ms_per_output_token: float = 0.0,
+        output_words: int = 250,
+        model_name: str = "models/fake-gemini",
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_output_token = ms_per_output_token
+        self.output_words = output_words
+        self.model_name = model_name
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @staticmethod
+    def _latest_message(prompt: str) -> str:
+        match = _LATEST_MESSAGE_RE.search(prompt)
+        return match.group(1).strip() if match else ""
+
+    @staticmethod
+    def _pick_category(prompt: str, question: str) -> str:
+        lowered = question.lower()
+        for category in _CATEGORY_LINE_RE.findall(prompt):
+            if category.lower() in lowered:
+                return category
+        return "General"
+
+    def _reply(self, prompt: str) -> str:
+        question = self._latest_message(prompt)
+        if "query planner" in prompt:
+            return json.dumps({
+                "standalone_question": question,
+                "category": self._pick_category(prompt, question),
+                "needs_retrieval": True,
+            })
+        if "legal document classifier" in prompt:
+            return self._pick_category(prompt, question)
+        if "Standalone Question:" in prompt:
+            return question
+        words = ("The relevant provision applies to the facts described and the procedure is as follows.").split()
+        return " ".join(words[i % len(words)] for i in range(self.output_words))
+
+    def generate_content(self, prompt, **kwargs) -> FakeResponse:
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        text = self._reply(prompt)
+        digest = int(hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()[:8], 16)
+        delay_ms = (
+            self.latency_ms
+            + random.Random(digest).uniform(0, self.jitter_ms)
+            + self.ms_per_output_token * (len(text) // 4)
+        )
+        time.sleep(delay_ms / 1000)
+        with self._lock:
+            self.calls += 1
+        return FakeResponse(text, prompt)
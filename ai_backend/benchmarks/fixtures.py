@@ -0,0 +1,100 @@
+import os
+import csv
+import json
+import random
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE_DIR = os.path.join(BENCHMARKS_DIR, ".fixtures", "chroma")
+DEFAULT_NUMPY_FIXTURE_DIR = os.path.join(BENCHMARKS_DIR, ".fixtures", "numpy")
+FIXTURE_COLLECTION_NAME = "benchmark_chunks"
+
+
+def sample_chunks(csv_path: str, per_source: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    Up to `per_source` chunks from each source document of the processed corpus
+    (all of them for small sources such as the procedural guides), in a fixed order.
+    """
+    by_source: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("text_chunk"):
+                by_source[row.get("source_document", "")].append(row)
+
+    rng = random.Random(seed)
+    sample = []
+    for source in sorted(by_source):
+        rows = by_source[source]
+        sample += rows if len(rows) <= per_source else rng.sample(rows, per_source)
+    return sample
+
+
+def build_chroma_fixture(
+    fixture_dir: str,
+    csv_path: str,
+    embedding_model_name: str,
+    per_source: int = 60,
+    seed: int = 0,
+    collection_name: str = FIXTURE_COLLECTION_NAME,
+) -> int:
+    """
+    [Blocking] Builds (or reuses) a local Chroma collection from a sample of the processed
+    corpus, with the same ids and metadata as scripts/ingest.py. The fixture is rebuilt only
+    when its parameters or the corpus file change. Returns the number of chunks.
+    """
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+
+    fingerprint = {
+        "csv": os.path.abspath(csv_path),
+        "csv_mtime": os.path.getmtime(csv_path),
+        "embedding_model": embedding_model_name,
+        "per_source": per_source,
+        "seed": seed,
+        "collection": collection_name,
+    }
+    manifest_path = os.path.join(fixture_dir, "fixture.json")
+    client = chromadb.PersistentClient(path=fixture_dir)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("fingerprint") == fingerprint:
+            logger.info(f"Reusing Chroma fixture at {fixture_dir} ({manifest['count']} chunks).")
+            return manifest["count"]
+
+    rows = sample_chunks(csv_path, per_source, seed)
+    logger.info(f"Building Chroma fixture with {len(rows)} chunks at {fixture_dir}...")
+    try:
+        client.delete_collection(name=collection_name)
+    except Exception:
+        pass
+    collection = client.get_or_create_collection(name=collection_name)
+    model = SentenceTransformer(embedding_model_name)
+
+    batch_size = 128
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        texts = [row["text_chunk"] for row in batch]
+        collection.add(
+            ids=[row["chunk_id"] for row in batch],
+            embeddings=model.encode(texts).tolist(),
+            documents=texts,
+            metadatas=[{k: v for k, v in row.items() if k != "text_chunk"} for row in batch],
+        )
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "count": len(rows)}, f, indent=2)
+    return len(rows)
+
+
+def build_numpy_fixture(fixture_dir: str, numpy_dir: str, collection_name: str = FIXTURE_COLLECTION_NAME) -> dict:
+    """[Blocking] Exports the Chroma fixture to a NumPy vector store (same vectors, same ids)."""
+    import chromadb
+    from src.services.vector_store import export_chroma_collection
+
+    collection = chromadb.PersistentClient(path=fixture_dir).get_collection(name=collection_name)
+    return export_chroma_collection(collection, numpy_dir)
@@ -0,0 +1,226 @@
+"""
+Memory, latency and recall of quantized first-pass search in the NumPy vector store.
+
+Exports the Chroma fixture (or the real collection with --full-corpus) to a NumPy store,
+optionally grows it to --scale rows by jittering the real vectors (to see how the corpus
+behaves once state acts and judgments are added), then for every configuration measures:
+
+- recall@N against exact float32 search (the baseline every configuration is held to),
+- p50/p95 search latency,
+- RAM scanned per search and the on-disk size of the files it needs.
+
+    python benchmarks/quantization_benchmark.py --n-results 20 --oversample 2 4 8 16
+    python benchmarks/quantization_benchmark.py --scale 200000 --min-recall 0.95 --output quant.json
+
+With --min-recall, the configuration with the smallest first-pass memory that meets it is
+printed (and the exit status is 1 if none does).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+
+# --- Add project root to path ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+# -------------------------------
+
+from benchmarks.fixtures import DEFAULT_FIXTURE_DIR, FIXTURE_COLLECTION_NAME, build_chroma_fixture
+
+# --- Setup logging ---
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[logging.StreamHandler(sys.stderr)],
+)
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUESTIONS = os.path.join(BENCHMARKS_DIR, "questions.json")
+DEFAULT_STORE_DIR = os.path.join(BENCHMARKS_DIR, ".fixtures", "numpy_quantized")
+
+# Which store files each first pass reads (the float32 file is only touched for rescoring)
+FILES_BY_QUANTIZATION = {
+    "none": ["embeddings"],
+    "int8": ["int8", "int8_scales", "full"],
+    "binary": ["binary", "binary_center", "full"],
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else 0.0
+
+
+def load_vectors(args, settings) -> Dict[str, list]:
+    """ids, embeddings, documents and metadatas of the collection to benchmark."""
+    import chromadb
+    from src.config import CHROMA_DB_PATH, PROCESSED_DATA_PATH
+
+    if args.full_corpus:
+        chroma_dir, collection_name = CHROMA_DB_PATH, settings.CHROMA_COLLECTION_NAME
+    else:
+        build_chroma_fixture(args.fixture_dir, args.corpus or PROCESSED_DATA_PATH, settings.EMBEDDING_MODEL_NAME,
+                             per_source=args.chunks_per_source)
+        chroma_dir, collection_name = args.fixture_dir, FIXTURE_COLLECTION_NAME
+    collection = chromadb.PersistentClient(path=chroma_dir).get_collection(name=collection_name)
+    records = collection.get(include=["embeddings", "documents", "metadatas"])
+    return {
+        "ids": list(records["ids"]),
+        "embeddings": np.asarray(records["embeddings"], dtype=np.float32),
+        "documents": list(records["documents"]),
+        "metadatas": [dict(meta or {}) for meta in records["metadatas"]],
+    }
+
+
+def grow(vectors: Dict[str, list], rows: int, noise: float, seed: int) -> Dict[str, list]:
+    """Adds jittered copies of the real vectors until there are `rows` (same sources, new ids)."""
+    count = len(vectors["ids"])
+    if rows <= count:
+        return vectors
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, count, size=rows - count)
+    extra = vectors["embeddings"][picks] + rng.normal(0, noise, size=(len(picks), vectors["embeddings"].shape[1]))
+    extra_ids = [f"synthetic_{i}" for i in range(len(picks))]
+    return {
+        "ids": vectors["ids"] + extra_ids,
+        "embeddings": np.concatenate([vectors["embeddings"], extra.astype(np.float32)]),
+        "documents": vectors["documents"] + [""] * len(picks),
+        "metadatas": vectors["metadatas"] + [
+            {**vectors["metadatas"][pick], "chunk_id": chunk_id} for pick, chunk_id in zip(picks, extra_ids)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized (int8 / binary) first pass vs. exact float32 search.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--n-results", type=int, default=None, help="Default: N_TO_RETRIEVE.")
+    parser.add_argument("--quantization", nargs="+", choices=["none", "int8", "binary"], default=["none", "int8", "binary"])
+    parser.add_argument("--oversample", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sample-queries", type=int, default=200,
+                        help="Extra queries: jittered stored vectors (the question set alone is small).")
+    parser.add_argument("--scale", type=int, default=0, help="Grow the store to this many rows with jittered copies.")
+    parser.add_argument("--noise", type=float, default=0.05, help="Jitter (std. dev.) for --scale and --sample-queries.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--full-corpus", action="store_true", help="Use the real collection (CHROMA_DB_DIR).")
+    parser.add_argument("--fixture-dir", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR, help="Where the NumPy store is written.")
+    parser.add_argument("--corpus", default=None, help="Processed chunks CSV for the fixture (default: PROCESSED_DATA_PATH).")
+    parser.add_argument("--chunks-per-source", type=int, default=60)
+    parser.add_argument("--min-recall", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+    os.environ.setdefault("MONGO_DB_URL", "mongodb://localhost:27017")
+    from sentence_transformers import SentenceTransformer
+    from src.config import settings
+    from src.services.vector_store import NumpyVectorStore, write_numpy_store
+
+    n_results = args.n_results or settings.N_TO_RETRIEVE
+    vectors = grow(load_vectors(args, settings), args.scale, args.noise, args.seed)
+    manifest = write_numpy_store(args.store_dir, vectors["ids"], vectors["embeddings"], vectors["documents"],
+                                 vectors["metadatas"], settings.EMBEDDING_MODEL_NAME)
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    queries = SentenceTransformer(settings.EMBEDDING_MODEL_NAME).encode(questions).astype(np.float32)
+    if args.sample_queries:
+        rng = np.random.default_rng(args.seed + 1)
+        picks = rng.integers(0, len(vectors["ids"]), size=args.sample_queries)
+        jittered = vectors["embeddings"][picks] + rng.normal(0, args.noise, size=(len(picks), queries.shape[1]))
+        queries = np.concatenate([queries, jittered.astype(np.float32)])
+
+    # Baseline: exact float32 search over the normalized vectors the store was written from
+    full = np.load(os.path.join(args.store_dir, manifest["files"]["full"]))
+    with open(os.path.join(args.store_dir, manifest["files"]["records"]), "r", encoding="utf-8") as f:
+        stored_ids = json.load(f)["ids"]
+    normalized_queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    baseline = [
+        {stored_ids[i] for i in np.argsort(-(full @ query), kind="stable")[:n_results]} for query in normalized_queries
+    ]
+    del full
+    print(f"{manifest['count']} rows x {manifest['dimension']} dims, {len(queries)} queries, top {n_results}.",
+          file=sys.stderr)
+
+    configs = [
+        (quantization, oversample)
+        for quantization in args.quantization
+        for oversample in ([1] if quantization == "none" else args.oversample)
+    ]
+    results = []
+    for quantization, oversample in configs:
+        store = NumpyVectorStore(args.store_dir, quantization=quantization, oversample=oversample)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, baseline):
+            store.search(query, None, n_results)  # warm the page cache
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _, metadatas = store.search(query, None, n_results)
+                latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len({meta["chunk_id"] for meta in metadatas} & expected) / len(expected))
+        footprint = store.memory_footprint()
+        disk_bytes = sum(
+            os.path.getsize(os.path.join(args.store_dir, manifest["files"][name]))
+            for name in FILES_BY_QUANTIZATION[quantization]
+        )
+        results.append({
+            "quantization": quantization,
+            "oversample": oversample if quantization != "none" else None,
+            "recall": round(float(np.mean(recalls)), 4),
+            "min_recall": round(float(np.min(recalls)), 4),
+            "latency_ms": {"p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95)},
+            "resident_mb": round(footprint["resident_bytes"] / (1024 * 1024), 2),
+            "disk_mb": round(disk_bytes / (1024 * 1024), 2),
+        })
+
+    print(f"\n{'first pass':<10} {'oversample':>10} {'recall@' + str(n_results):>10} {'worst':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'RAM MB':>8} {'disk MB':>8}")
+    for r in results:
+        print(
+            f"{r['quantization']:<10} {r['oversample'] or '-':>10} {r['recall']:>10.4f} {r['min_recall']:>7.3f} "
+            f"{r['latency_ms']['p50']:>8.3f} {r['latency_ms']['p95']:>8.3f} {r['resident_mb']:>8.2f} {r['disk_mb']:>8.2f}"
+        )
+    print("\n'none' scores a float32 copy of the float16 matrix in RAM (up to NUMPY_STORE_MAX_RAM_MB).")
+
+    exit_code = 0
+    if args.min_recall is not None:
+        eligible = [r for r in results if r["recall"] >= args.min_recall]
+        if eligible:
+            best = min(eligible, key=lambda r: (r["resident_mb"], r["latency_ms"]["p50"]))
+            print(f"Smallest first pass with recall@{n_results} >= {args.min_recall}: "
+                  f"{best['quantization']} (oversample {best['oversample'] or '-'})")
+        else:
+            print(f"No configuration reaches recall@{n_results} >= {args.min_recall}.")
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "rows": manifest["count"],
+                "dimension": manifest["dimension"],
+                "embedding_model": settings.EMBEDDING_MODEL_NAME,
+                "n_results": n_results,
+                "queries": len(queries),
+                "scale": args.scale,
+                "noise": args.noise,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Offline per-stage latency benchmark for QueryEngine.query.
+
+Builds a QueryEngine against a local Chroma fixture (a sample of data/processed) and a
+deterministic fake Gemini model with configurable latency, runs a fixed question set at
+several concurrency levels and reports p50/p95/p99 per stage and overall as JSON:
+
+    python benchmarks/rag_benchmark.py --concurrency 1 4 16 --llm-latency-ms 800 --output run.json
+
+Stages are recorded by `src.utils.instrumentation.stage` inside the engine (plan, reframe,
+classify, embed, retrieve, rerank, prompt_build, generate and the speculative-retrieval
+stages). Stages that overlap (speculation) can sum to more than the end-to-end time.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List
+
+# --- Add project root to path ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+# -------------------------------
+
+from benchmarks.fake_gemini import FakeGeminiModel
+from benchmarks.fixtures import (
+    DEFAULT_FIXTURE_DIR, DEFAULT_NUMPY_FIXTURE_DIR, FIXTURE_COLLECTION_NAME, build_chroma_fixture, build_numpy_fixture
+)
+
+# --- Setup logging ---
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[logging.StreamHandler(sys.stderr)],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+
+    def pct(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 2) if values else 0.0
+
+    return {
+        "samples": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "max": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def configure_environment(args):
+    """Points the app settings at the fixture and lifts external limits. Must run before importing src."""
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+    os.environ.setdefault("MONGO_DB_URL", "mongodb://localhost:27017")
+    os.environ["CHROMA_DB_DIR"] = os.path.abspath(args.fixture_dir)
+    os.environ["CHROMA_COLLECTION_NAME"] = FIXTURE_COLLECTION_NAME
+    # Cached planner/classifier replies would hide the LLM stages after the first pass
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["LLM_RPM_LIMIT"] = str(args.rpm_limit)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    os.environ["SPECULATIVE_RETRIEVAL_ENABLED"] = "false" if args.no_speculation else "true"
+    os.environ["VECTOR_STORE_BACKEND"] = args.vector_store
+    os.environ["NUMPY_STORE_DIR"] = os.path.abspath(DEFAULT_NUMPY_FIXTURE_DIR)
+
+
+def run_level(engine, questions: List[dict], concurrency: int, repeat: int) -> dict:
+    from src.utils.instrumentation import collect_stages
+
+    # Each level starts cold: no cached classifications from the previous level
+    engine.classification_cache.clear()
+    jobs = [item for _ in range(repeat) for item in questions]
+
+    def run_one(item: dict) -> dict:
+        with collect_stages() as timings:
+            start = time.perf_counter()
+            result = engine.query(item["question"], list(item.get("chat_history") or []))
+            total_ms = (time.perf_counter() - start) * 1000
+        return {
+            "id": item["id"],
+            "total_ms": total_ms,
+            "stages": dict(timings.stages),
+            "error": str(result.get("answer", "")).startswith("Error"),
+        }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        results = list(pool.map(run_one, jobs))
+    wall_seconds = time.perf_counter() - start
+
+    stage_names = sorted({name for r in results for name in r["stages"]})
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": sum(r["error"] for r in results),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_qps": round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+        "overall_ms": percentiles([r["total_ms"] for r in results]),
+        # Only requests that ran a stage count towards it (e.g. small talk never retrieves)
+        "stages_ms": {
+            name: percentiles([r["stages"][name] for r in results if name in r["stages"]])
+            for name in stage_names
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the RAG query path (fake LLM).")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="JSON list of {id, question, chat_history?}.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=2, help="Passes over the question set per concurrency level.")
+    parser.add_argument("--fixture-dir", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--corpus", default=None, help="Processed chunks CSV (default: PROCESSED_DATA_PATH).")
+    parser.add_argument("--chunks-per-source", type=int, default=60)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0, help="Extra latency per output token.")
+    parser.add_argument("--llm-output-words", type=int, default=250)
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY for the scheduler.")
+    parser.add_argument("--rpm-limit", type=int, default=100_000, help="LLM_RPM_LIMIT (default: effectively off).")
+    parser.add_argument("--no-speculation", action="store_true", help="Disable speculative retrieval.")
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default="chroma", help="VECTOR_STORE_BACKEND.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    from src.config import settings, PROCESSED_DATA_PATH
+    from src.services.llm_scheduler import llm_scheduler
+    from src.query_engine import QueryEngine
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    chunk_count = build_chroma_fixture(
+        args.fixture_dir,
+        args.corpus or PROCESSED_DATA_PATH,
+        settings.EMBEDDING_MODEL_NAME,
+        per_source=args.chunks_per_source,
+        seed=args.seed,
+    )
+    if args.vector_store == "numpy":
+        build_numpy_fixture(args.fixture_dir, DEFAULT_NUMPY_FIXTURE_DIR)
+
+    engine = QueryEngine()
+    fake_model = FakeGeminiModel(
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        ms_per_output_token=args.llm_ms_per_token,
+        output_words=args.llm_output_words,
+        seed=args.seed,
+    )
+    engine.gemini_model = fake_model
+
+    try:
+        # Warm up (model kernels, Chroma index load) so it isn't billed to the first level
+        engine.query(questions[0]["question"], [])
+        levels = []
+        for concurrency in args.concurrency:
+            print(f"Running {len(questions)} question(s) x {args.repeat} at concurrency {concurrency}...", file=sys.stderr)
+            levels.append(run_level(engine, questions, concurrency, args.repeat))
+    finally:
+        engine.shutdown()
+        llm_scheduler.shutdown()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "questions": os.path.basename(args.questions),
+            "question_count": len(questions),
+            "repeat": args.repeat,
+            "fixture_chunks": chunk_count,
+            "embedding_model": settings.EMBEDDING_MODEL_NAME,
+            "reranker": settings.RERANKER_MODEL_NAME if engine.reranker_model is not None else None,
+            "n_to_retrieve": settings.N_TO_RETRIEVE,
+            "top_k": settings.TOP_K_RESULTS,
+            "speculative_retrieval": settings.SPECULATIVE_RETRIEVAL_ENABLED,
+            "vector_store": settings.VECTOR_STORE_BACKEND,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_ms_per_token": args.llm_ms_per_token,
+            "llm_concurrency": args.llm_concurrency,
+        },
+        "llm_calls": fake_model.calls,
+        "planner": dict(engine.planner_stats),
+        "speculation": dict(engine.speculation_stats),
+        "levels": levels,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Retrieval quality vs. latency over the legal corpus.
+
+Runs a versioned golden set (benchmarks/golden/*.json: questions mapped to expected chunk ids
+or section patterns) through the engine's retrieval path under every combination of
+smart filter on/off, reranker on/off, candidate count N and HNSW search ef, and reports
+recall@k, MRR, nDCG@k and per-query latency (embed + search + rerank) as a table:
+
+    python benchmarks/retrieval_eval.py --n-candidates 10 20 40 --ef 50 100 --min-recall 0.6
+
+With `--ef` the persisted Chroma DB is first copied to --scratch-dir and the search ef is
+changed on that copy only; the live collection is never written. Without it the
+collection's current setting is used. No LLM calls are made: the filter category
+comes from the golden set (or the local keyword classifier with --filter-source keyword).
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import argparse
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+# --- Add project root to path ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+# -------------------------------
+
+# --- Setup logging ---
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[logging.StreamHandler(sys.stderr)],
+)
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GOLDEN = os.path.join(BENCHMARKS_DIR, "golden", "legal_retrieval_v1.json")
+DEFAULT_SCRATCH_DIR = os.path.join(BENCHMARKS_DIR, ".fixtures", "retrieval_eval_chroma")
+
+
+@dataclass(frozen=True)
+class RetrievalConfig:
+    use_filter: bool
+    rerank: bool
+    n_candidates: int
+    ef: Optional[int]
+
+    @property
+    def label(self) -> str:
+        ef = self.ef if self.ef is not None else "default"
+        return f"filter={'on' if self.use_filter else 'off'} rerank={'on' if self.rerank else 'off'} N={self.n_candidates} ef={ef}"
+
+
+# --- Metrics (binary relevance) ---
+def recall_at_k(retrieved: List[str], relevant: Set[str], k: int) -> float:
+    return len(set(retrieved[:k]) & relevant) / len(relevant) if relevant else 0.0
+
+
+def reciprocal_rank(retrieved: List[str], relevant: Set[str], k: int) -> float:
+    for rank, chunk_id in enumerate(retrieved[:k], start=1):
+        if chunk_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(retrieved: List[str], relevant: Set[str], k: int) -> float:
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, chunk_id in enumerate(retrieved[:k], start=1) if chunk_id in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(k, len(relevant)) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2) if values else 0.0
+
+
+# --- Golden set ---
+def load_golden(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    if not golden.get("items"):
+        raise ValueError(f"Golden set {path} has no items.")
+    return golden
+
+
+def resolve_relevance(collection, items: List[dict]) -> Dict[str, Set[str]]:
+    """
+    Expands each item's expected chunk ids and section patterns into the set of relevant
+    chunk ids present in the collection. Items with nothing in the collection are dropped.
+    """
+    records = collection.get(include=["documents", "metadatas"])
+    chunks = list(zip(records["ids"], records["documents"], records["metadatas"]))
+    present = set(records["ids"])
+
+    relevance: Dict[str, Set[str]] = {}
+    for item in items:
+        spec = item.get("relevant", {})
+        relevant = {chunk_id for chunk_id in spec.get("chunk_ids", []) if chunk_id in present}
+        for section in spec.get("sections", []):
+            pattern = re.compile(section["pattern"])
+            relevant |= {
+                chunk_id for chunk_id, document, metadata in chunks
+                if (metadata or {}).get("source_document") == section["source_document"] and pattern.search(document or "")
+            }
+        if relevant:
+            relevance[item["id"]] = relevant
+        else:
+            logger.warning(f"Golden item '{item['id']}' has no relevant chunks in this collection; skipped.")
+    return relevance
+
+
+# --- HNSW search ef (only ever set on a scratch copy) ---
+def copy_chroma_db(source_dir: str, scratch_dir: str):
+    """Fresh copy of the persisted Chroma DB, for runs that modify collection settings."""
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    shutil.copytree(source_dir, scratch_dir)
+
+
+def set_search_ef(collection, ef: int):
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": ef}})
+    except Exception:
+        # Older Chroma releases keep HNSW parameters in the collection metadata
+        collection.modify(metadata={**(collection.metadata or {}), "hnsw:search_ef": ef})
+
+
+# --- Evaluation ---
+def retrieve(engine, question_embedding: List[float], question: str, where_filter: Optional[Dict],
+             config: RetrievalConfig, top_k: int) -> List[str]:
+    results = engine.collection.query(
+        query_embeddings=[question_embedding],
+        n_results=config.n_candidates,
+        where=where_filter,
+        include=["documents"],
+    )
+    ids, documents = results["ids"][0], results["documents"][0]
+    if config.rerank and engine.reranker_model is not None and ids:
+        scores = engine.reranker_model.predict([[question, document] for document in documents]).tolist()
+        ids = [chunk_id for _, chunk_id in sorted(zip(scores, ids), key=lambda pair: pair[0], reverse=True)]
+    return ids[:top_k]
+
+
+def evaluate(engine, items: List[dict], relevance: Dict[str, Set[str]], embeddings: Dict[str, tuple],
+             config: RetrievalConfig, ks: List[int], filter_source: str) -> dict:
+    top_k = max(ks)
+    per_k = {k: {"recall": [], "mrr": [], "ndcg": []} for k in ks}
+    latencies = []
+    for item in items:
+        relevant = relevance[item["id"]]
+        embedding, embed_ms = embeddings[item["id"]]
+        where_filter = None
+        if config.use_filter:
+            category = item.get("category") if filter_source == "golden" else None
+            where_filter = engine._build_filter(category or engine._fallback_keyword_classify(item["question"]))
+
+        start = time.perf_counter()
+        retrieved = retrieve(engine, embedding, item["question"], where_filter, config, top_k)
+        latencies.append(embed_ms + (time.perf_counter() - start) * 1000)
+
+        for k in ks:
+            per_k[k]["recall"].append(recall_at_k(retrieved, relevant, k))
+            per_k[k]["mrr"].append(reciprocal_rank(retrieved, relevant, k))
+            per_k[k]["ndcg"].append(ndcg_at_k(retrieved, relevant, k))
+
+    return {
+        "config": config.label,
+        "use_filter": config.use_filter,
+        "rerank": config.rerank,
+        "n_candidates": config.n_candidates,
+        "ef": config.ef,
+        "metrics": {
+            f"@{k}": {name: round(sum(values) / len(values), 4) for name, values in scores.items()}
+            for k, scores in per_k.items()
+        },
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+        },
+    }
+
+
+def print_table(results: List[dict], k: int):
+    print(f"{'configuration':<46} {'recall@' + str(k):>10} {'MRR':>7} {'nDCG@' + str(k):>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for result in results:
+        metrics = result["metrics"][f"@{k}"]
+        print(
+            f"{result['config']:<46} {metrics['recall']:>10.3f} {metrics['mrr']:>7.3f} {metrics['ndcg']:>8.3f} "
+            f"{result['latency_ms']['p50']:>8.1f} {result['latency_ms']['p95']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality (recall@k, MRR, nDCG) vs. latency per configuration.")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN, help="Versioned golden set JSON.")
+    parser.add_argument("--k", type=int, nargs="+", default=None, help="Cut-offs (default: TOP_K_RESULTS). The first is tabulated.")
+    parser.add_argument("--filter", nargs="+", choices=["on", "off"], default=["on", "off"])
+    parser.add_argument("--rerank", nargs="+", choices=["on", "off"], default=["on", "off"])
+    parser.add_argument("--n-candidates", type=int, nargs="+", default=None, help="Default: N_TO_RETRIEVE.")
+    parser.add_argument("--ef", type=int, nargs="+", default=None, help="HNSW search ef values to try (on a copy).")
+    parser.add_argument("--scratch-dir", default=DEFAULT_SCRATCH_DIR, help="Where the DB is copied for --ef runs.")
+    parser.add_argument("--filter-source", choices=["golden", "keyword"], default="golden",
+                        help="Category for the smart filter: the golden label, or the local keyword classifier.")
+    parser.add_argument("--min-recall", type=float, default=None, help="Pick the fastest config meeting this recall@k.")
+    parser.add_argument("--min-mrr", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="Also write the full results as JSON.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "retrieval-eval-fake-key")
+    os.environ.setdefault("MONGO_DB_URL", "mongodb://localhost:27017")
+    import chromadb
+    from src.config import settings, CHROMA_DB_PATH
+    from src.services.llm_scheduler import llm_scheduler
+    from src.query_engine import QueryEngine
+
+    golden = load_golden(args.golden)
+    if args.ef:
+        # Copied before the engine opens the DB
+        copy_chroma_db(CHROMA_DB_PATH, args.scratch_dir)
+    engine = QueryEngine()
+    try:
+        if args.ef:
+            # Models and filters come from the engine; searches (and ef changes) hit the copy
+            engine.collection = chromadb.PersistentClient(path=args.scratch_dir).get_collection(
+                name=settings.CHROMA_COLLECTION_NAME
+            )
+        ks = args.k or [settings.TOP_K_RESULTS]
+        relevance = resolve_relevance(engine.collection, golden["items"])
+        items = [item for item in golden["items"] if item["id"] in relevance]
+        if not items:
+            print("No golden items have relevant chunks in this collection.")
+            return
+        print(f"Golden set '{golden.get('name')}' v{golden.get('version')}: {len(items)}/{len(golden['items'])} item(s) evaluated.",
+              file=sys.stderr)
+        if engine.reranker_model is None and "on" in args.rerank:
+            print("Reranker unavailable; 'rerank=on' configurations are skipped.", file=sys.stderr)
+
+        # The question embedding is shared by every configuration; its cost is added to each query's latency
+        embeddings = {}
+        engine.embedding_model.encode(items[0]["question"])  # warm-up
+        for item in items:
+            start = time.perf_counter()
+            embedding = engine.embedding_model.encode(item["question"]).tolist()
+            embeddings[item["id"]] = (embedding, (time.perf_counter() - start) * 1000)
+
+        configs = [
+            RetrievalConfig(use_filter == "on", rerank == "on", n, ef)
+            for ef, use_filter, rerank, n in itertools.product(
+                args.ef or [None], args.filter, args.rerank, args.n_candidates or [settings.N_TO_RETRIEVE]
+            )
+            if not (rerank == "on" and engine.reranker_model is None)
+        ]
+
+        results = []
+        for config in configs:
+            if config.ef is not None:
+                set_search_ef(engine.collection, config.ef)
+            results.append(evaluate(engine, items, relevance, embeddings, config, ks, args.filter_source))
+    finally:
+        engine.shutdown()
+        llm_scheduler.shutdown()
+
+    print()
+    print_table(results, ks[0])
+
+    if args.min_recall is not None:
+        key = f"@{ks[0]}"
+        eligible = [
+            r for r in results
+            if r["metrics"][key]["recall"] >= args.min_recall and r["metrics"][key]["mrr"] >= args.min_mrr
+        ]
+        print()
+        if eligible:
+            best = min(eligible, key=lambda r: r["latency_ms"]["p50"])
+            print(f"Cheapest configuration with recall{key} >= {args.min_recall} and MRR >= {args.min_mrr}: {best['config']}")
+        else:
+            print(f"No configuration reaches recall{key} >= {args.min_recall} and MRR >= {args.min_mrr}.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "golden": {"name": golden.get("name"), "version": golden.get("version"), "items": len(items)},
+                "k": ks,
+                "filter_source": args.filter_source,
+                "embedding_model": settings.EMBEDDING_MODEL_NAME,
+                "reranker": settings.RERANKER_MODEL_NAME if engine.reranker_model is not None else None,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
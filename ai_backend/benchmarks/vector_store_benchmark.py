@@ -0,0 +1,166 @@
+"""
+Search latency of the corpus vector-store backends: Chroma vs. the in-process NumPy store.
+
+Both backends hold the same vectors (the NumPy store is exported from the Chroma collection),
+so the only difference is the search itself. Every question in benchmarks/questions.json is
+embedded once, then searched unfiltered, with a single-source filter and with a multi-source
+`$in` filter (the three shapes QueryEngine._build_filter produces):
+
+    python benchmarks/vector_store_benchmark.py --n-results 20 60 --repeat 5
+    python benchmarks/vector_store_benchmark.py --full-corpus   # db/chroma_db instead of the fixture
+
+Reports p50/p95 latency per backend and filter shape, and how many of Chroma's top N the
+NumPy store returns too (Chroma's HNSW search is approximate, the NumPy search is exact).
+"numpy" scores a float32 copy held in RAM; "numpy_mmap" widens the float16 mmap per search.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# --- Add project root to path ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+# -------------------------------
+
+from benchmarks.fixtures import (
+    DEFAULT_FIXTURE_DIR, DEFAULT_NUMPY_FIXTURE_DIR, FIXTURE_COLLECTION_NAME, build_chroma_fixture
+)
+
+# --- Setup logging ---
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[logging.StreamHandler(sys.stderr)],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else 0.0
+
+
+def filter_shapes(sources: List[str]) -> Dict[str, Optional[Dict]]:
+    """One filter of each shape, over the largest sources so the filtered searches are not trivial."""
+    shapes: Dict[str, Optional[Dict]] = {"unfiltered": None}
+    if sources:
+        shapes["single_source"] = {"source_document": sources[0]}
+    if len(sources) > 1:
+        shapes["multi_source"] = {"source_document": {"$in": sources[:3]}}
+    return shapes
+
+
+def chunk_key(metadata: Dict) -> str:
+    return str((metadata or {}).get("chunk_id"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs. NumPy vector store search latency.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--n-results", type=int, nargs="+", default=None, help="Default: N_TO_RETRIEVE.")
+    parser.add_argument("--repeat", type=int, default=5, help="Searches per question, filter shape and N.")
+    parser.add_argument("--full-corpus", action="store_true", help="Use the real collection (CHROMA_DB_DIR).")
+    parser.add_argument("--fixture-dir", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--numpy-dir", default=DEFAULT_NUMPY_FIXTURE_DIR, help="Where the exported NumPy store is written.")
+    parser.add_argument("--corpus", default=None, help="Processed chunks CSV for the fixture (default: PROCESSED_DATA_PATH).")
+    parser.add_argument("--chunks-per-source", type=int, default=60)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+    os.environ.setdefault("MONGO_DB_URL", "mongodb://localhost:27017")
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+    from src.config import settings, CHROMA_DB_PATH, PROCESSED_DATA_PATH
+    from src.services.vector_store import ChromaVectorStore, NumpyVectorStore, export_chroma_collection
+
+    if args.full_corpus:
+        chroma_dir, collection_name = CHROMA_DB_PATH, settings.CHROMA_COLLECTION_NAME
+    else:
+        build_chroma_fixture(args.fixture_dir, args.corpus or PROCESSED_DATA_PATH, settings.EMBEDDING_MODEL_NAME,
+                             per_source=args.chunks_per_source)
+        chroma_dir, collection_name = args.fixture_dir, FIXTURE_COLLECTION_NAME
+    collection = chromadb.PersistentClient(path=chroma_dir).get_collection(name=collection_name)
+    manifest = export_chroma_collection(collection, args.numpy_dir, settings.EMBEDDING_MODEL_NAME)
+    stores = {
+        "chroma": ChromaVectorStore(collection),
+        "numpy": NumpyVectorStore(args.numpy_dir),  # float32 copy in RAM
+        "numpy_mmap": NumpyVectorStore(args.numpy_dir, max_ram_mb=0),  # widened from the float16 mmap per search
+    }
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+    embeddings = model.encode(questions).tolist()
+
+    numpy_state = stores["numpy"]._state
+    source_sizes = {source: stop - start for source, (start, stop) in numpy_state.source_rows.items()}
+    sources = sorted(source_sizes, key=source_sizes.get, reverse=True)
+    shapes = filter_shapes(sources)
+    print(f"{manifest['count']} chunks x {manifest['dimension']} dims, {len(questions)} questions, "
+          f"{len(sources)} sources.", file=sys.stderr)
+
+    results = []
+    for n_results in args.n_results or [settings.N_TO_RETRIEVE]:
+        for shape, where_filter in shapes.items():
+            latencies: Dict[str, List[float]] = {name: [] for name in stores}
+            overlaps: Dict[str, List[float]] = {name: [] for name in stores if name != "chroma"}
+            for embedding in embeddings:
+                top = {}
+                for name, store in stores.items():
+                    store.search(embedding, where_filter, n_results)  # warm (HNSW segment / page cache)
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        _, metadatas = store.search(embedding, where_filter, n_results)
+                        latencies[name].append((time.perf_counter() - start) * 1000)
+                    top[name] = {chunk_key(meta) for meta in metadatas}
+                if top["chroma"]:
+                    for name in overlaps:
+                        overlaps[name].append(len(top["chroma"] & top[name]) / len(top["chroma"]))
+            results.append({
+                "n_results": n_results,
+                "filter": shape,
+                "latency_ms": {
+                    name: {"p50": percentile(values, 0.50), "p95": percentile(values, 0.95)}
+                    for name, values in latencies.items()
+                },
+                "overlap_with_chroma": {
+                    name: round(sum(values) / len(values), 4) if values else None for name, values in overlaps.items()
+                },
+            })
+
+    print(f"\n{'N':>4} {'filter':<14} {'backend':<11} {'p50 ms':>8} {'p95 ms':>8} {'overlap w/ chroma':>18}")
+    for result in results:
+        for name, latency in result["latency_ms"].items():
+            overlap = result["overlap_with_chroma"].get(name)
+            print(
+                f"{result['n_results']:>4} {result['filter']:<14} {name:<11} {latency['p50']:>8.3f} {latency['p95']:>8.3f} "
+                f"{'-' if overlap is None else f'{overlap:.3f}':>18}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "collection": collection_name,
+                "chunks": manifest["count"],
+                "dimension": manifest["dimension"],
+                "embedding_model": settings.EMBEDDING_MODEL_NAME,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+# --- Add project root to path ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+# -------------------------------
+
+from src.services.extraction_service import ExtractionService, OCR_BACKENDS
+
+# --- Setup logging ---
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff")
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings (two-row dynamic programming)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def char_accuracy(reference: str, hypothesis: str) -> float:
+    """1 - character error rate, on whitespace-normalized text (clamped to 0)."""
+    reference, hypothesis = normalize(reference), normalize(hypothesis)
+    if not reference:
+        return 1.0 if not hypothesis else 0.0
+    return max(0.0, 1.0 - edit_distance(reference, hypothesis) / len(reference))
+
+
+def load_images(image_dir: str) -> List[Dict]:
+    """
+    Loads every image in `image_dir`. An optional ground-truth transcript is read from
+    a sidecar file named `<image name>.gt.txt` (e.g. `fir.jpeg.gt.txt`).
+    """
+    samples = []
+    for filename in sorted(os.listdir(image_dir)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(image_dir, filename)
+        with open(path, "rb") as f:
+            content = f.read()
+        ground_truth = None
+        gt_path = f"{path}.gt.txt"
+        if os.path.exists(gt_path):
+            with open(gt_path, "r", encoding="utf-8") as f:
+                ground_truth = f.read()
+        samples.append({"name": filename, "content": content, "ground_truth": ground_truth})
+    return samples
+
+
+def run_backend(service: ExtractionService, backend: str, samples: List[Dict], repeat: int) -> Dict:
+    outputs: Dict[str, str] = {}
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            t0 = time.perf_counter()
+            try:
+                outputs[sample["name"]] = service.ocr_image_sync(sample["content"], backend=backend, use_cache=False)
+            except Exception as e:
+                errors += 1
+                outputs.setdefault(sample["name"], "")
+                logger.warning(f"[{backend}] {sample['name']} failed: {e}")
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "outputs": outputs,
+        "images_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "chars": sum(len(text) for text in outputs.values()),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR backends on sample FIR / cheque images.")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "temp_uploads"),
+                        help="Directory of sample images (optional <image>.gt.txt ground truth).")
+    parser.add_argument("--backends", nargs="+", default=list(OCR_BACKENDS), choices=OCR_BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the image set per backend.")
+    args = parser.parse_args()
+
+    samples = load_images(args.images)
+    if not samples:
+        print(f"No images found in {args.images}")
+        return
+
+    service = ExtractionService()
+    print(f"Benchmarking {len(samples)} image(s) x {args.repeat} pass(es): {', '.join(args.backends)}")
+
+    try:
+        # Warm up (process pool start-up, Vision channel + auth) so it isn't billed to the first backend
+        for backend in args.backends:
+            try:
+                service.ocr_image_sync(samples[0]["content"], backend=backend, use_cache=False)
+            except Exception as e:
+                print(f"Warm-up failed for {backend}: {e}")
+        results = [run_backend(service, backend, samples, args.repeat) for backend in args.backends]
+    finally:
+        service.shutdown()
+
+    # Accuracy reference: ground truth when present, otherwise Vision's output (agreement score)
+    vision_outputs: Optional[Dict[str, str]] = next(
+        (r["outputs"] for r in results if r["backend"] == "vision"), None
+    )
+
+    print()
+    print(f"{'backend':<10} {'img/s':>8} {'p50 ms':>9} {'max ms':>9} {'chars':>8} {'errors':>7} {'char acc':>9}  reference")
+    for result in results:
+        scores, reference_kind = [], "-"
+        for sample in samples:
+            reference = sample["ground_truth"]
+            if reference is not None:
+                reference_kind = "ground truth"
+            elif vision_outputs is not None and result["backend"] != "vision":
+                reference = vision_outputs.get(sample["name"])
+                reference_kind = "vision"
+            if reference:
+                scores.append(char_accuracy(reference, result["outputs"].get(sample["name"], "")))
+        accuracy = f"{sum(scores) / len(scores):.3f}" if scores else "n/a"
+        print(
+            f"{result['backend']:<10} {result['images_per_sec']:>8.2f} {result['p50_ms']:>9.0f} "
+            f"{result['max_ms']:>9.0f} {result['chars']:>8} {result['errors']:>7} {accuracy:>9}  {reference_kind}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import pandas as pd
 from sentence_transformers import SentenceTransformer
 import chromadb
 from tqdm import tqdm
+import argparse
 import logging
 import sys
 import os
@@ -13,7 +14,8 @@ sys.path.append(PROJECT_ROOT)
 
 # --- UPDATED Imports ---
 # Now import the settings object and computed paths
-from src.config import settings, PROCESSED_DATA_PATH, CHROMA_DB_PATH, INGEST_LOG_FILE
+from src.config import settings, PROCESSED_DATA_PATH, CHROMA_DB_PATH, NUMPY_STORE_PATH, INGEST_LOG_FILE
+from src.services.vector_store import export_chroma_collection
 # ---
 
 # --- Setup logging ---
@@ -29,11 +31,41 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def build_numpy_store(collection):
+    """Exports the Chroma collection to the NumPy vector store (VECTOR_STORE_BACKEND=numpy)."""
+    logger.info(f"Building NumPy vector store at '{NUMPY_STORE_PATH}'...")
+    try:
+        manifest = export_chroma_collection(collection, NUMPY_STORE_PATH, settings.EMBEDDING_MODEL_NAME)
+    except Exception as e:
+        logger.error(f"Failed to build the NumPy vector store: {e}", exc_info=True)
+        return
+    logger.info(
+        f"NumPy vector store ready: {manifest['count']} chunks x {manifest['dimension']} dims "
+        f"(version {manifest['version']})."
+    )
+
+
 def main():
     """
     Main function to ingest data and metadata from a CSV file
     into a ChromaDB vector database.
     """
+    parser = argparse.ArgumentParser(description="Ingest the processed corpus into ChromaDB.")
+    parser.add_argument("--numpy", action="store_true",
+                        help="Also build the NumPy vector store (always done when VECTOR_STORE_BACKEND=numpy).")
+    parser.add_argument("--numpy-only", action="store_true",
+                        help="Only export the existing Chroma collection to the NumPy vector store (no re-embedding).")
+    args = parser.parse_args()
+
+    if args.numpy_only:
+        try:
+            collection = chromadb.PersistentClient(path=CHROMA_DB_PATH).get_collection(name=settings.CHROMA_COLLECTION_NAME)
+        except Exception as e:
+            logger.error(f"Failed to open collection '{settings.CHROMA_COLLECTION_NAME}': {e}", exc_info=True)
+            return
+        build_numpy_store(collection)
+        return
+
     logger.info("Starting data ingestion process...")
 
     # --- 1. Load Data ---
@@ -153,5 +185,9 @@ def main():
     logger.info("Ingestion complete!")
     logger.info(f"Total documents in collection: {collection.count()}")
 
+    # --- 5. NumPy vector store (exact in-process search over the same vectors) ---
+    if args.numpy or settings.VECTOR_STORE_BACKEND == "numpy":
+        build_numpy_store(collection)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,6 @@
 import fitz  # PyMuPDF
 import os
 import pandas as pd
-import re
-import unicodedata
 import logging
 from tqdm import tqdm
 from typing import List, Dict, Optional, Any
@@ -17,6 +15,7 @@ sys.path.append(PROJECT_ROOT)
 # --- CORRECTED IMPORTS: Use settings object and computed paths ---
 # Assuming these paths and settings are correctly defined in src.config
 from src.config import settings, DATA_DIR, PROCESSED_DATA_PATH, INGEST_LOG_FILE
+from src.utils.chunking import clean_text
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 # --- Setup logging ---
@@ -31,28 +30,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def clean_text(text: str) -> str:
-    """
-    Cleans raw text by normalizing unicode, fixing hyphenation, and handling whitespace.
-    """
-    # Fix common encoding artifacts
-    text = text.replace('â€™', "'").replace('â€œ', '"').replace('â€', '"')
-    text = text.replace('â€”', '-').replace('â€¦', '...')
-
-    # Normalize unicode characters
-    text = unicodedata.normalize("NFKC", text)
-
-    # Fix words broken by hyphenation at line breaks (e.g., "docu-\nment" -> "document")
-    text = re.sub(r'(\w)-\s*\n\s*(\w)', r'\1\2', text)
-
-    # Remove common PDF artifacts (e.g., page numbers or section labels)
-    text = re.sub(r'\d+\s+SECTIONS', '', text)
-
-    # Remove excessive whitespace, newlines, and tabs
-    text = re.sub(r'\s+', ' ', text)
-
-    return text.strip()
-
 def extract_text_from_file(file_path: str, file_extension: str) -> Optional[str]:
     """
     Extracts and cleans text based on file type (.pdf or .txt).
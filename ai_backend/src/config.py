@@ -1,7 +1,7 @@
 # src/config.py
 import os
 from pydantic_settings import BaseSettings
-from pydantic import AnyHttpUrl, Field
+from pydantic import AnyHttpUrl, Field, model_validator
 from typing import Optional, List
 
 # --- Project Root ---
@@ -28,6 +28,15 @@ class Settings(BaseSettings):
     CHROMA_DB_DIR: str = "db/chroma_db"
     CHROMA_COLLECTION_NAME: str = "legal_documents"
     RESET_DATABASE: bool = False
+    # Corpus search backend: "chroma", or "numpy" (exact search over an mmap'd float16 matrix
+    # exported from the Chroma collection by scripts/ingest.py). Evidence always uses Chroma.
+    VECTOR_STORE_BACKEND: str = "chroma"
+    NUMPY_STORE_DIR: str = "db/numpy_store"
+    NUMPY_STORE_MAX_RAM_MB: int = 512  # Up to this size a float32 copy is scored in RAM; beyond, straight from the mmap
+    # First pass over quantized vectors ("none" | "int8" | "binary"); the top N x OVERSAMPLE are
+    # rescored against float32 rows on disk. Binary usually needs a larger oversample (8-16).
+    NUMPY_STORE_QUANTIZATION: str = "none"
+    NUMPY_STORE_OVERSAMPLE: int = 4
 
     # Data Paths
     DATA_DIR_NAME: str = "data"
@@ -35,6 +44,11 @@ class Settings(BaseSettings):
     PROCESSED_DATA_FILE: str = "processed/processed_legal_chunks.csv"
     SAMPLE_TEMPLATES_SUBDIR: str = "raw/Sample_Templates"
 
+    # Ingestion (columns of the processed CSV written by preprocess.py)
+    TEXT_COLUMN_NAME: str = "text_chunk"
+    ID_COLUMN_NAME: str = "chunk_id"
+    BATCH_SIZE: int = 128
+
     # Models
     EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
     GEMINI_MODEL_NAME: str = "gemini-pro-latest"
@@ -48,17 +62,124 @@ class Settings(BaseSettings):
     N_TO_RETRIEVE: int = 20
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = True  # Search while the query planner's LLM call is in flight
+    SPECULATIVE_OVERFETCH: int = 3  # Unfiltered speculative search fetches N_TO_RETRIEVE x this
+    SPECULATIVE_MAX_WORKERS: int = 8
+    ASK_BATCH_MAX_QUESTIONS: int = 64  # /ask/batch rejects larger batches with 413
+    ASK_BATCH_CONCURRENCY: int = 4  # Planner / answer LLM calls in flight per batch
+
+    # Uploads
+    UPLOAD_MAX_MB: int = 20  # Per file; larger uploads are rejected with 413
+    UPLOAD_MAX_REQUEST_MB: int = 60  # Whole multipart request (checked from Content-Length)
+    UPLOAD_MAX_FILES: int = 20  # Files per multipart request
+    UPLOAD_SPOOL_MEMORY_MB: int = 2  # Larger files are spooled to a temp file while streaming in
+
+    # OCR
+    OCR_BACKEND: str = "vision"  # "vision" | "tesseract" | "auto" (local first, Vision on low confidence)
+    OCR_MAX_CONCURRENCY: int = 4
+    OCR_PROCESS_WORKERS: int = 2  # Tesseract worker processes
+    OCR_AUTO_MAX_PIXELS: int = 4_000_000  # "auto" only tries Tesseract on images up to this size
+    OCR_AUTO_MIN_CONFIDENCE: float = 70.0  # Mean Tesseract word confidence (0-100) needed to skip Vision
+    TESSERACT_LANGS: str = "eng+hin"
+    TESSERACT_CMD: Optional[str] = None  # Path to the tesseract binary if it is not on PATH
+    VISION_BATCH_SIZE: int = 16  # Vision accepts at most 16 images per batch request
+    VISION_API_ENDPOINT: Optional[str] = None  # e.g. "localhost:50051" for a local fake server
+    VISION_API_INSECURE: bool = False  # Plaintext gRPC channel (local testing only)
+
+    # PDF Extraction (PyMuPDF)
+    # Every upload is capped by UPLOAD_MAX_MB (413 while streaming). PDF_MAX_MB can only lower
+    # that for PDFs, which are then stored as "[PDF too large ...]" instead of being extracted.
+    PDF_MAX_MB: Optional[int] = None  # Defaults to UPLOAD_MAX_MB; may not exceed it
+    PDF_MAX_PAGES: int = 500  # Only the first N pages are extracted
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Below this, extract in one go (no process fan-out)
+    PDF_PAGES_PER_TASK: int = 16  # Minimum page-range size per worker process
+
+    # Document Templates (held in memory, hot-reloaded on change)
+    TEMPLATE_WATCH_ENABLED: bool = True
+    TEMPLATE_POLL_SECONDS: float = 2.0  # Only used if watchfiles is unavailable
+    TEMPLATE_MATCH_THRESHOLD: float = 0.45  # Cosine similarity to accept the best template outright
+    TEMPLATE_MATCH_MARGIN: float = 0.05  # ...and its lead over the runner-up
+    TEMPLATE_MATCH_MIN_SCORE: float = 0.25  # Below this no template fits (draft from scratch)
+    # /chat intent routing: TF-IDF over exemplars (well under 1 ms) unless this opts in to the
+    # sentence embedder (a few ms per message; its thresholds are not calibrated yet)
+    INTENT_ROUTER_EMBEDDINGS: bool = False
+
+    # Evidence Index (per-case vectors, filtered by case_id)
+    EVIDENCE_COLLECTION_NAME: str = "case_evidence"
+    EVIDENCE_CHUNK_SIZE: int = 800
+    EVIDENCE_CHUNK_OVERLAP: int = 100
+    EVIDENCE_TOP_K: int = 8  # Candidate passages retrieved per question
+    EVIDENCE_CONTEXT_TOKENS: int = 1500  # Prompt budget for evidence passages (~4 chars/token)
+
+    # Extraction Cache (OCR / PDF text results, keyed by file hash + extractor)
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = "cache/extraction"
+    EXTRACTION_CACHE_MAX_MB: int = 256
+
+    # LLM Scheduler (one shared Gemini budget for chat, classification and drafting)
+    LLM_RPM_LIMIT: int = 60  # Requests per minute
+    LLM_TPM_LIMIT: int = 1_000_000  # Tokens per minute (prompt estimate + expected output)
+    LLM_MAX_CONCURRENCY: int = 8  # Gemini calls in flight at once
+    LLM_MAX_RETRIES: int = 5
+    LLM_BACKOFF_BASE_SECONDS: float = 1.0  # Exponential backoff (full jitter) on 429/503
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 512  # Reserved per call until real usage is known
+
+    # LLM Response Cache (persistent; only for call sites whose output is a pure function of the prompt)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_FILE_NAME: str = "cache/llm_cache.sqlite3"
+    LLM_CACHE_TTL_HOURS: int = 24 * 7
+    LLM_CACHE_MAX_ENTRIES: int = 50_000
+    # Call sites (scheduler "purpose" names) cached by default; free-form generation is not listed
+    LLM_CACHE_PURPOSES: str = "smart_filter,template_classify,triage,reframe,query_plan"
+
+    # Metrics (Prometheus text format on /metrics; needs prometheus-client)
+    METRICS_ENABLED: bool = True
+
+    # Tracing (OpenTelemetry; spans for routes, QueryEngine stages, MongoDB, Gemini and Vision)
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "otlp"  # "otlp" (gRPC collector) or "console" (stdout)
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4317"
+    TRACING_OTLP_INSECURE: bool = True
+    TRACING_SAMPLE_RATIO: float = 1.0  # Fraction of new traces kept; callers' sampling decisions are honoured
+    TRACING_SERVICE_NAME: str = "gen-vidhik-sahayak-api"
+
+    # Profiling (opt-in, one request at a time: X-Profile: 1 or ?profile=1, plus X-Admin-Key)
+    PROFILING_ENABLED: bool = False  # When off, the profiling middleware is not installed at all
+    PROFILING_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILING_DIR: str = "cache/profiles"
+    PROFILING_MAX_FILES: int = 50
 
     # Logging
     INGEST_LOG_FILE_NAME: str = "ingest.log"
-    QUERY_LOG_FILE_NAME: str = "query_engine.log"
+    QUERY_LOG_FILE_NAME: str = "query_engine.log"  # API process log (rotated, gzipped)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" (one object per line) or "text"
+    LOG_FILE_MAX_MB: int = 20
+    LOG_FILE_BACKUPS: int = 5
+    LOG_MAX_MESSAGE_CHARS: int = 2000  # Longer messages (questions, model output) are truncated
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1  # Fraction of DEBUG records kept when LOG_LEVEL=DEBUG
 
     # --- SECURITY SETTINGS (New) ---
     # Defaults provided here, but can be overridden by .env
+    # Admin endpoints (/admin/*) require this key in the X-Admin-Key header; unset = disabled
+    ADMIN_API_KEY: Optional[str] = None
+
     JWT_SECRET_KEY: str = "super_secret_fallback_key_change_this"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 Days
 
+    @model_validator(mode="after")
+    def _check_pdf_limit(self):
+        if self.PDF_MAX_MB is None:
+            self.PDF_MAX_MB = self.UPLOAD_MAX_MB
+        elif self.PDF_MAX_MB > self.UPLOAD_MAX_MB:
+            raise ValueError(
+                f"PDF_MAX_MB ({self.PDF_MAX_MB}) cannot exceed UPLOAD_MAX_MB ({self.UPLOAD_MAX_MB}): "
+                "larger PDFs would be rejected by the upload limit before reaching the PDF check."
+            )
+        return self
+
     class Config:
         env_file = os.path.join(PROJECT_ROOT, ".env")
         env_file_encoding = "utf-8"
@@ -77,9 +198,13 @@ else:
 
 # --- Computed Paths ---
 CHROMA_DB_PATH = os.path.join(PROJECT_ROOT, settings.CHROMA_DB_DIR)
+NUMPY_STORE_PATH = os.path.join(PROJECT_ROOT, settings.NUMPY_STORE_DIR)
 DATA_DIR = os.path.join(PROJECT_ROOT, settings.DATA_DIR_NAME)
 RAW_DATA_DIR = os.path.join(DATA_DIR, settings.RAW_DATA_SUBDIR)
 PROCESSED_DATA_PATH = os.path.join(DATA_DIR, settings.PROCESSED_DATA_FILE)
 SAMPLE_TEMPLATES_DIR = os.path.join(DATA_DIR, settings.SAMPLE_TEMPLATES_SUBDIR)
 INGEST_LOG_FILE = os.path.join(PROJECT_ROOT, settings.INGEST_LOG_FILE_NAME)
-QUERY_LOG_FILE = os.path.join(PROJECT_ROOT, settings.QUERY_LOG_FILE_NAME)
\ No newline at end of file
+QUERY_LOG_FILE = os.path.join(PROJECT_ROOT, settings.QUERY_LOG_FILE_NAME)
+EXTRACTION_CACHE_PATH = os.path.join(PROJECT_ROOT, settings.EXTRACTION_CACHE_DIR)
+LLM_CACHE_PATH = os.path.join(PROJECT_ROOT, settings.LLM_CACHE_FILE_NAME)
+PROFILES_PATH = os.path.join(PROJECT_ROOT, settings.PROFILING_DIR)
\ No newline at end of file
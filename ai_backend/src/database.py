@@ -1,10 +1,15 @@
 # src/database.py
 from motor.motor_asyncio import AsyncIOMotorClient
 from .config import settings
+from .utils import metrics, tracing
 
 # Create the async MongoDB client
 # We use settings.MONGO_DB_URL as defined in src/config.py
-client = AsyncIOMotorClient(settings.MONGO_DB_URL)
+# Command listeners feed the per-command latency histogram on /metrics and the trace spans
+client = AsyncIOMotorClient(
+    settings.MONGO_DB_URL,
+    event_listeners=metrics.mongo_event_listeners() + tracing.mongo_event_listeners(),
+)
 
 # Choose the database
 db = client[settings.MONGO_DB_NAME]
@@ -1,26 +1,40 @@
 import json
-import shutil
 import os
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+import re
+import time
+import asyncio
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from src.routes import user_routes, triage_routes, draft_routes, case_routes
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
 from uuid import uuid4
 from datetime import datetime
 import logging
 from bson import ObjectId
 
 from .config import settings
+from .utils.logging_setup import setup_logging, shutdown_logging, request_id_var
+
+# --- Setup Logging (before the imports below, so their import-time messages are kept) ---
+setup_logging()
+
 from .query_engine import QueryEngine
 from .database import cases_collection
+from .services.extraction_service import extraction_service
+from .services.llm_scheduler import llm_scheduler
+from .services.intent_router import intent_router
+from .services.llm_cache import llm_cache
+from .services.extraction_cache import extraction_cache
+from .utils.upload_utils import StreamedForm, multipart_form, multipart_openapi
+from .utils import metrics, tracing
+from .security import is_admin_key
 
-from src.routes import evidence_routes
+from src.routes import evidence_routes, admin_routes
 
-# --- Setup Logging ---
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Create FastAPI App Instance ---
@@ -56,12 +70,136 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# ==================================================
+# 1b. UPLOAD SIZE GUARD
+# ==================================================
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Rejects oversized multipart uploads with 413 from the Content-Length header,
+    before the body is parsed or spooled. Per-file limits are enforced while streaming.
+    """
+    content_length = request.headers.get("content-length")
+    if (
+        content_length
+        and content_length.isdigit()
+        and request.headers.get("content-type", "").startswith("multipart/form-data")
+        and int(content_length) > settings.UPLOAD_MAX_REQUEST_MB * 1024 * 1024
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload too large. The limit is {settings.UPLOAD_MAX_REQUEST_MB} MB per request."},
+        )
+    return await call_next(request)
+
+# ==================================================
+# 1c. REQUEST METRICS
+# ==================================================
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Latency histogram per route template (not raw path, so ids don't explode the label set)."""
+    if not settings.METRICS_ENABLED or request.url.path == "/metrics":
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    metrics.HTTP_REQUESTS_IN_PROGRESS.labels(request.method).inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_PROGRESS.labels(request.method).dec()
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_DURATION.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - start)
+
+# ==================================================
+# 1d. REQUEST TRACING
+# ==================================================
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """One SERVER span per request; QueryEngine, MongoDB and Gemini spans nest under it."""
+    with tracing.server_span(request.method, request.headers, request.url.path) as span:
+        if span is None:
+            return await call_next(request)
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        return response
+
+# ==================================================
+# 1e. ON-DEMAND PROFILING (only installed when PROFILING_ENABLED)
+# ==================================================
+if settings.PROFILING_ENABLED:
+    from .utils.profiling import SamplingProfiler, profile_store
+
+    _profiling_lock = asyncio.Lock()
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """
+        Samples every thread's stack while one request runs, when the caller asks for it with
+        `X-Profile: 1` (or `?profile=1`) and a valid X-Admin-Key. The speedscope profile is saved
+        under PROFILING_DIR and named in the X-Profile-Id response header (download it from
+        /admin/profiles/{id}). One profiled request at a time; others run unprofiled.
+        """
+        wanted = request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+        if not wanted or not is_admin_key(request.headers.get("x-admin-key")):
+            return await call_next(request)
+        if _profiling_lock.locked():
+            response = await call_next(request)
+            response.headers["X-Profile-Status"] = "busy"
+            return response
+
+        async with _profiling_lock:
+            profiler = SamplingProfiler(interval=settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop()
+            label = f"{request.method} {request.url.path}"
+            try:
+                profile_id = await run_in_threadpool(profile_store.save, label, profiler.to_speedscope(label))
+            except OSError as e:
+                logger.error(f"❌ Could not save profile for {label}: {e}")
+                response.headers["X-Profile-Status"] = "failed"
+                return response
+        logger.info(f"🔬 Profiled {label} ({profiler.duration * 1000:.0f} ms) -> {profile_id}")
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
+# ==================================================
+# 1f. REQUEST IDS (outermost, so every log record of a request carries its id)
+# ==================================================
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Reuses a well-formed X-Request-ID from the caller (e.g. a proxy), otherwise makes one."""
+    request_id = request.headers.get("x-request-id", "")
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # --- Include User Routes ---
 app.include_router(user_routes.router)
 app.include_router(triage_routes.router)
 app.include_router(draft_routes.router)
 app.include_router(case_routes.router)
 app.include_router(evidence_routes.router)
+app.include_router(admin_routes.router)
 
 SUPPORTED_TEMPLATES = {
     "vakalatnama": "Vakalatnama",
@@ -81,6 +219,13 @@ except Exception as e:
     logger.error(f"❌ Failed to initialize Query Engine: {e}", exc_info=True)
     query_engine = None
 
+# Shared with routers (e.g. evidence indexing) without a circular import
+app.state.query_engine = query_engine
+
+# /chat intent routing is TF-IDF unless embedding scoring is opted in (reuses the engine's embedder)
+if query_engine is not None and settings.INTENT_ROUTER_EMBEDDINGS:
+    intent_router.use_embedder(query_engine.embedding_model)
+
 
 
 # ==================================================
@@ -106,6 +251,23 @@ class Answer(BaseModel):
     sources: Optional[List[str]] = None
     chat_history: Optional[List[ChatMessage]] = None
 
+class BatchQuery(BaseModel):
+    """Request model for the /ask/batch endpoint (at most ASK_BATCH_MAX_QUESTIONS questions)"""
+    questions: List[Query] = Field(..., min_length=1)
+
+
+class BatchAnswerItem(BaseModel):
+    """One answer of /ask/batch; `index` is the question's position in the request"""
+    index: int
+    received_question: str
+    answer: str
+    sources: Optional[List[str]] = None
+
+
+class BatchAnswer(BaseModel):
+    """Response model for the /ask/batch endpoint (answers in request order)"""
+    answers: List[BatchAnswerItem]
+
 class ChatRequest(BaseModel):
     query: str
     case_context: Optional[str] = None  # The current analysis/summary of the case
@@ -127,6 +289,8 @@ class DraftingRequest(BaseModel):
         example="My friend Ravi Sharma owes me 50,000 rupees for a personal loan given on Jan 1st. He has not repaid.",
     )
     template_type: Optional[str] = "auto"
+    # Known facts (e.g. the case fact sheet); used to fill template placeholders without the LLM
+    facts: Optional[Dict[str, Any]] = None
 
 class AnalysisResponse(BaseModel):
     """Response model for the /analyze endpoint"""
@@ -158,11 +322,82 @@ class DocumentAnalysisResponse(BaseModel):
 async def startup_event():
     logger.info("🚀 API startup complete. Ready to receive requests.")
     logger.info(f"Allowing client origins: {settings.CLIENT_ORIGINS}")
+    logger.info(f"OCR backend: {extraction_service.backend}")
+    tracing.setup_tracing()
+    if query_engine is not None and settings.TEMPLATE_WATCH_ENABLED:
+        query_engine.template_store.start_watching()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop the Tesseract worker processes (no-op if they were never started)
+    extraction_service.shutdown()
+    llm_scheduler.shutdown()
+    if query_engine is not None:
+        query_engine.template_store.stop_watching()
+        query_engine.shutdown()
+    tracing.shutdown_tracing()
+    shutdown_logging()
 
 # ==================================================
 # 3. BASIC ENDPOINTS
 # ==================================================
 
+def metrics_snapshot():
+    """Queue depths and cache counters the services already keep, read at scrape time."""
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter().statistics()
+    yield metrics.gauge_family("threadpool_workers", "Worker threads of the request threadpool.", ["state"], [
+        (["busy"], limiter.borrowed_tokens),
+        (["capacity"], limiter.total_tokens),
+        (["queued"], limiter.tasks_waiting),
+    ])
+
+    scheduler = llm_scheduler.stats()
+    yield metrics.gauge_family("llm_scheduler_jobs", "LLM calls waiting in or dispatched by the scheduler.", ["state"], [
+        (["queued"], scheduler["queued"]),
+        (["in_flight"], scheduler["in_flight"]),
+    ])
+
+    caches = [
+        ("llm_response", llm_cache.hits, llm_cache.misses),
+        ("extraction", extraction_cache.hits, extraction_cache.misses),
+    ]
+    flights = {"llm": llm_scheduler.flight, "ocr": extraction_service.flight}
+    if query_engine is not None:
+        planner = query_engine.planner_stats
+        # A "local" plan is a planner call avoided
+        caches.append(("query_plan_local", planner["local"], planner["plans"] - planner["local"]))
+        speculation = query_engine.speculation_stats
+        hits = speculation["hit_unfiltered"] + speculation["hit_category"] + speculation["hit_subset"]
+        caches.append(("speculative_retrieval", hits, speculation["miss"]))
+        flights.update(smart_filter=query_engine._filter_flight, template_classify=query_engine._template_flight)
+        yield metrics.gauge_family("speculative_pool_queue_depth", "Speculative searches waiting for a worker.", [], [
+            ([], query_engine._speculation_pool._work_queue.qsize()),
+        ])
+
+    yield metrics.counter_family("cache_lookups", "Cache lookups by cache and result.", ["cache", "result"], [
+        sample for name, hits, misses in caches for sample in (([name, "hit"], hits), ([name, "miss"], misses))
+    ])
+    yield metrics.counter_family("single_flight_calls", "Calls that ran (leader) or joined an identical in-flight call (shared).",
+                                 ["flight", "role"], [
+        sample for name, flight in flights.items()
+        for sample in (([name, "leader"], flight.leaders), ([name, "shared"], flight.shared))
+    ])
+
+
+if settings.METRICS_ENABLED:
+    metrics.add_snapshot_source(metrics_snapshot)
+
+
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint. Rendered on the event loop (it reads the threadpool limiter)."""
+    if not settings.METRICS_ENABLED or not metrics.METRICS_AVAILABLE:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 @app.get("/", tags=["System"])
 async def read_root():
     return {"message": "Welcome to the Gen-Vidhik Sahayak API!"}
@@ -174,15 +409,15 @@ async def health_check():
 
 
 @app.get("/templates", tags=["2. Document Drafting"])
-async def get_available_templates() -> List[str]:
+async def get_available_templates() -> List[dict]:
     """
-    Returns a list of all available document template keys
-    that can be used with the /draft-document endpoint.
+    Returns all available document templates (keys usable with the /draft-document endpoint)
+    with their placeholder metadata. Served from memory; no disk access.
     """
     if query_engine is None:
         logger.error("Query Engine unavailable.")
         raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
-    return list(query_engine.template_map.keys())
+    return query_engine.template_store.list_metadata()
 
 
 
@@ -190,6 +425,22 @@ async def get_available_templates() -> List[str]:
 # 4. ASK ENDPOINT (CHAT + PERSISTENCE)
 # ==================================================
 
+def backfill_evidence_index(case_id: str, evidence_list: List[dict]) -> int:
+    """
+    [Blocking] Indexes every evidence file of the case that is not indexed yet (e.g. stored
+    before per-case vectors existed), file by file. Returns the number of chunks added.
+    """
+    indexed = query_engine.indexed_evidence_ids(case_id)
+    total = 0
+    for doc in evidence_list:
+        if doc.get("id", "") in indexed:
+            continue
+        total += query_engine.index_evidence(
+            case_id, doc.get("id", ""), doc.get("filename", ""), doc.get("extracted_text", "")
+        )
+    return total
+
+
 @app.post("/ask", response_model=Answer, tags=["1. RAG Query"])
 async def ask_question(query: Query, case_id: Optional[str] = None) -> Answer:
     logger.info(f"🧠 Received query: {query.question} (case_id={case_id})")
@@ -217,14 +468,24 @@ async def ask_question(query: Query, case_id: Optional[str] = None) -> Answer:
                 situation = case_doc.get("description", "")
                 facts = case_doc.get("facts", {})
                 
-                # --- FETCH & FORMAT EVIDENCE ---
+                # --- RETRIEVE RELEVANT EVIDENCE PASSAGES ---
+                # Only the passages closest to this question, across ALL of the case's
+                # evidence, within the EVIDENCE_CONTEXT_TOKENS budget.
                 evidence_list = case_doc.get("evidence", [])
-                recent_evidence = evidence_list[-3:] # Use last 3 files to save token space
-                
+                passages = []
+                if evidence_list:
+                    try:
+                        # Evidence uploaded before the index existed gets indexed first (a cached
+                        # id lookup once every file is indexed)
+                        await run_in_threadpool(backfill_evidence_index, case_id, evidence_list)
+                        passages = await run_in_threadpool(query_engine.search_evidence, case_id, query.question)
+                    except Exception as e:
+                        logger.error(f"Evidence retrieval failed for case {case_id}: {e}", exc_info=True)
+
                 evidence_text = ""
-                for doc in recent_evidence:
-                    clean_text = doc.get('extracted_text', '').replace('\n', ' ')
-                    evidence_text += f"\n--- EVIDENCE FILE: {doc.get('filename')} ---\n{clean_text[:2000]}\n"
+                for passage in passages:
+                    clean_text = passage["text"].replace('\n', ' ')
+                    evidence_text += f"\n--- EVIDENCE FILE: {passage['filename']} (excerpt) ---\n{clean_text}\n"
 
                 # --- INJECT INTO PROMPT ---
                 context_block = f"""
@@ -232,7 +493,7 @@ async def ask_question(query: Query, case_id: Optional[str] = None) -> Answer:
                 Situation: {situation}
                 Key Entities: {facts}
 
-                [UPLOADED EVIDENCE (Most Recent)]
+                [UPLOADED EVIDENCE (Most Relevant Excerpts)]
                 {evidence_text}
                 
                 [INSTRUCTIONS]
@@ -276,10 +537,84 @@ async def ask_question(query: Query, case_id: Optional[str] = None) -> Answer:
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.post("/ask/batch", response_model=BatchAnswer, tags=["1. RAG Query"])
+async def ask_batch(batch: BatchQuery, request: Request, stream: bool = False):
+    """
+    Answers many independent questions (no case context, nothing saved) with shared work:
+    one embedding call, one vector search per filter group and one rerank pass for the whole
+    batch, then up to ASK_BATCH_CONCURRENCY answer generations at a time (batch priority).
+
+    Returns {"answers": [...]} in request order, or with `?stream=true` (or
+    `Accept: application/x-ndjson`) one JSON line per answer as soon as it is ready, each
+    carrying its `index`.
+    """
+    if query_engine is None:
+        raise HTTPException(status_code=503, detail="AI Engine unavailable")
+    if len(batch.questions) > settings.ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ASK_BATCH_MAX_QUESTIONS} questions per batch (got {len(batch.questions)}).",
+        )
+    logger.info(f"🧠 Received batch of {len(batch.questions)} questions (stream={stream})")
+
+    items = [
+        {"question": q.question, "chat_history": [msg.model_dump() for msg in q.chat_history or []]}
+        for q in batch.questions
+    ]
+    try:
+        prepared = await run_in_threadpool(query_engine.prepare_batch, items)
+    except Exception as e:
+        logger.error(f"💥 Batch ask error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    semaphore = asyncio.Semaphore(settings.ASK_BATCH_CONCURRENCY)
+
+    async def answer(index: int) -> BatchAnswerItem:
+        async with semaphore:
+            result = await query_engine.answer_prepared(prepared[index])
+        return BatchAnswerItem(
+            index=index, received_question=batch.questions[index].question,
+            answer=result["answer"], sources=result.get("sources"),
+        )
+
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def ndjson_lines():
+            # Tasks start only once the response streams, so nothing runs for a client
+            # that disconnected before the body was sent
+            tasks = [asyncio.create_task(answer(index)) for index in range(len(prepared))]
+            try:
+                for next_answer in asyncio.as_completed(tasks):
+                    yield (await next_answer).model_dump_json() + "\n"
+            finally:
+                # Client went away: stop generating the rest
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    # If the request is cancelled, gather cancels every outstanding answer
+    return BatchAnswer(answers=await asyncio.gather(*(answer(index) for index in range(len(prepared)))))
+
+
 # ==================================================
 # 5. DRAFT DOCUMENT ENDPOINT
 # ==================================================
 
+async def load_case_facts(case_id: str) -> Dict[str, Any]:
+    """Structured facts stored on a case (fact sheet, AI-extracted facts and jurisdiction)."""
+    query = {"case_id": case_id}
+    if ObjectId.is_valid(case_id):
+        query = {"$or": [query, {"_id": ObjectId(case_id)}]}
+    doc = await cases_collection.find_one(query, {"jurisdiction": 1, "structured_facts": 1, "facts": 1})
+    if not doc:
+        return {}
+    facts: Dict[str, Any] = {}
+    for field_name in ("jurisdiction", "structured_facts", "facts"):
+        if isinstance(doc.get(field_name), dict):
+            facts.update(doc[field_name])
+    return facts
+
+
 @app.post(
     "/draft-document",
     summary="Draft a legal document from a scenario",
@@ -303,12 +638,19 @@ async def draft_document_endpoint(
         raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
 
     try:
+        # Case facts (if the case exists) + facts sent with the request (these win)
+        facts = {}
+        if case_id:
+            facts = await load_case_facts(case_id)
+        facts.update(request.facts or {})
+
         drafted_raw = await query_engine.draft_document(
             scenario=request.scenario,
             template_type=request.template_type,
+            facts=facts,
         )
 
-        logger.info(f"🧾 draft_document returned type={type(drafted_raw)} value={drafted_raw}")
+        logger.info(f"🧾 draft_document returned {type(drafted_raw).__name__} ({len(str(drafted_raw or ''))} chars)")
 
         if drafted_raw is None:
             logger.error("draft_document returned None")
@@ -377,16 +719,17 @@ async def draft_document_endpoint(
     description="Upload an image or PDF, extract text using OCR, and answer a question based only on that text.",
     tags=["3. Document Analysis (OCR)"],
     response_model=DocumentAnalysisResponse,
+    openapi_extra=multipart_openapi(["file", "question"], file="file", question="string"),
 )
-async def analyze_document_endpoint(
-    file: UploadFile = File(...),
-    question: str = Form(...),
-):
+async def analyze_document_endpoint(form: StreamedForm = Depends(multipart_form)):
     """
     Receives an uploaded document (image/pdf) and a question.
     1. Extracts text from the document using OCR.
     2. Answers the question based only on the extracted text.
+    The file was spooled and hashed while the body streamed in (413 if over UPLOAD_MAX_MB).
     """
+    file = form.file("file")
+    question = form.field("question", required=True)
     logger.info(f"📄 Received file: {file.filename}, for question: {question}")
 
     if query_engine is None:
@@ -394,13 +737,7 @@ async def analyze_document_endpoint(
         raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
 
     try:
-        file_content = await file.read()
-    except Exception as e:
-        logger.error(f"Error reading uploaded file: {e}", exc_info=True)
-        raise HTTPException(status_code=400, detail="Could not read the uploaded file.")
-
-    try:
-        extracted_text = await query_engine.get_text_from_image(file_content)
+        extracted_text = await query_engine.get_text_from_image(file)
 
         if extracted_text.startswith("Error:"):
             logger.warning(f"OCR failed: {extracted_text}")
@@ -432,6 +769,8 @@ async def analyze_document_endpoint(
             status_code=500,
             detail="Internal error while analyzing document.",
         )
+    finally:
+        file.close()
 # ... inside src/main.py ...
 
 # ==================================================
@@ -443,16 +782,17 @@ async def analyze_document_endpoint(
     summary="Analyze a new case (Text + OCR)",
     description="Accepts a situation description and optional file, extracts facts, and suggests a strategy.",
     tags=["1. Triage"],
+    openapi_extra=multipart_openapi(["situation"], situation="string", file="file"),
 )
-async def analyze_case_endpoint(
-    situation: str = Form(...),
-    file: Optional[UploadFile] = File(None)
-):
+async def analyze_case_endpoint(form: StreamedForm = Depends(multipart_form)):
     """
     1. Processing OCR (if file exists).
     2. Combining Text + OCR.
     3. Asking AI for JSON analysis.
     """
+    situation = form.field("situation", required=True)
+    # Oversized files were already rejected (413) while streaming, not silently skipped
+    file = form.file("file", required=False)
     logger.info(f"🕵️ Analyzing case. Situation length: {len(situation)}")
     
     if query_engine is None:
@@ -463,13 +803,14 @@ async def analyze_case_endpoint(
     if file:
         try:
             logger.info(f"📷 Processing file: {file.filename}")
-            file_content = await file.read()
             # Call the existing OCR method in your query_engine
-            extracted_text = await query_engine.get_text_from_image(file_content)
+            extracted_text = await query_engine.get_text_from_image(file)
             logger.info("✅ OCR Complete")
         except Exception as e:
             logger.error(f"OCR Failed: {e}")
             # We continue even if OCR fails
+        finally:
+            file.close()
     
     # 2. Combine Context
     full_context = situation
@@ -498,17 +839,16 @@ async def analyze_case_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
     
 
-@app.post("/upload-document")
-async def upload_document(file: UploadFile = File(...)):
+@app.post("/upload-document", openapi_extra=multipart_openapi(["file"], file="file"))
+async def upload_document(form: StreamedForm = Depends(multipart_form)):
+    file = form.file("file")
     try:
         # Save to temp folder
         os.makedirs("temp_uploads", exist_ok=True)
-        file_path = f"temp_uploads/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_path = f"temp_uploads/{os.path.basename(file.filename)}"
+        await run_in_threadpool(file.save_to, file_path)
             
-        # Optional: Trigger your query_engine to ingest this file
-        # await query_engine.ingest_file(file_path)
+        # Note: adding documents to the RAG corpus is done via POST /admin/ingest
         
         return {"status": "success", "filename": file.filename}
     except Exception as e:
@@ -563,8 +903,12 @@ async def delete_case(case_id: str):
     try:
         result = await cases_collection.delete_one({"_id": ObjectId(case_id)})
         if result.deleted_count == 1:
+            if query_engine is not None:
+                await run_in_threadpool(query_engine.remove_evidence, case_id)
             return {"message": "Case deleted"}
         raise HTTPException(status_code=404, detail="Case not found")
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid Case ID format")
 
@@ -596,30 +940,29 @@ async def chat_endpoint(request: ChatRequest):
         raise HTTPException(status_code=503, detail="AI Engine is unavailable.")
 
     try:
-        query_lower = request.query.lower()
-        
-        # --- A. INTENT DETECTION ---
-        draft_keywords = ["draft", "generate", "create", "make a", "prepare"]
-        is_drafting_request = any(k in query_lower for k in draft_keywords)
+        # --- A. INTENT DETECTION (local router, no LLM call; TF-IDF runs well under 1 ms) ---
+        if intent_router.uses_embeddings:
+            routed = await run_in_threadpool(intent_router.route, request.query)
+        else:
+            routed = intent_router.route(request.query)
+        logger.info(
+            f"🧭 Intent: {routed.intent} ({routed.confidence:.2f}), template: {routed.template_key} "
+            f"({routed.template_confidence:.2f}) in {routed.latency_ms:.2f} ms"
+        )
 
         # --- B. DRAFTING LOGIC ---
-        if is_drafting_request:
+        if routed.intent == "draft":
             logger.info(f"⚡ Drafting Intent Detected: {request.query}")
             
-            # 1. Automatic Type Detection
-            detected_type = "auto" 
-            for key in SUPPORTED_TEMPLATES.keys():
-                if key in query_lower or key.replace("_", " ") in query_lower:
-                    detected_type = key
-                    break
-            
-            if "bail" in query_lower and detected_type == "auto":
-                detected_type = "bail_application"
+            # 1. Automatic Type Detection ("auto" lets the engine pick a sample template)
+            detected_type = routed.template_key
 
-            # 2. Generate the text (Using Real Engine)
+            # 2. Generate the text (Using Real Engine). The request itself goes into the scenario
+            # so "auto" template selection sees which document was asked for.
+            scenario = f"{request.case_context}\n\nUser request: {request.query}" if request.case_context else request.query
             try:
                 drafted_text = await query_engine.draft_document(
-                    scenario=request.case_context or "General Legal Scenario",
+                    scenario=scenario,
                     template_type=detected_type
                 )
                 
@@ -1,29 +1,38 @@
 # src/query_engine.py
 import os
-import sys
 import time
 import logging
 import asyncio 
-from google.cloud import vision  
-from typing import List, Dict, Optional, Any
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Callable, Set, Tuple
 import chromadb
 from sentence_transformers import SentenceTransformer , CrossEncoder
 import google.generativeai as genai
 from fastapi.concurrency import run_in_threadpool # <-- Import for non-blocking calls
 
 # --- CORRECTED Imports ---
-from .config import settings, CHROMA_DB_PATH, QUERY_LOG_FILE, SAMPLE_TEMPLATES_DIR
+from .config import settings, CHROMA_DB_PATH, NUMPY_STORE_PATH, SAMPLE_TEMPLATES_DIR, DATA_DIR
+from .services.extraction_service import extraction_service, ExtractionSource, is_placeholder_text
+from .services.llm_scheduler import llm_scheduler, Priority
+from .services.template_store import TemplateStore
+from .services.template_classifier import TemplateClassifier, normalize_template_reply
+from .services.vector_store import ChromaVectorStore, NumpyVectorStore
+from .services.query_planner import (
+    QueryPlan, build_plan_prompt, confident_category, is_small_talk, parse_plan
+)
+from .services.template_engine import (
+    apply_values, fill_template, flatten_facts, parse_gap_values, placeholder_context
+)
+from .utils.chunking import split_text, clean_text
+from .utils.singleflight import SingleFlight, make_key
+from .utils.instrumentation import stage
+from .utils import tracing
 # ---
 
-# --- Logging Configuration ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] - %(message)s",
-    handlers=[
-        logging.FileHandler(QUERY_LOG_FILE, encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+# --- Logging (configured centrally, see src/utils/logging_setup.py) ---
 logger = logging.getLogger(__name__)
 
 
@@ -39,6 +48,17 @@ except Exception as e:
 # ---
 
 
+@dataclass
+class PreparedAnswer:
+    """One question of a batch after planning, retrieval and reranking (see QueryEngine.prepare_batch)."""
+    question: str
+    prompt: Optional[str] = None
+    purpose: str = "answer"
+    sources: List[str] = field(default_factory=list)
+    # Set when no LLM call is needed (empty question, nothing retrieved, or an earlier stage failed)
+    answer: Optional[str] = None
+
+
 class QueryEngine:
     def __init__(self):
         # --- Startup Header ---
@@ -70,11 +90,36 @@ class QueryEngine:
             self.collection = client.get_collection(
                 name=settings.CHROMA_COLLECTION_NAME
             )
+            # Per-case evidence passages live in their own collection, filtered by case_id
+            self.evidence_collection = client.get_or_create_collection(
+                name=settings.EVIDENCE_COLLECTION_NAME
+            )
+            # case_id -> evidence ids known to be indexed (loaded from Chroma on first use per case)
+            self._indexed_evidence: Dict[str, Set[str]] = {}
+            self._indexed_evidence_lock = threading.Lock()
             logger.info("ChromaDB connection successful.")
         except Exception as e:
             logger.error("Failed to connect to ChromaDB", exc_info=True)
             raise RuntimeError(f"Failed to connect to ChromaDB: {e}")
 
+        # --- 3b. Corpus vector store (Chroma stays the source of truth for ingestion) ---
+        self._chroma_store = ChromaVectorStore(self.collection)
+        if settings.VECTOR_STORE_BACKEND == "numpy":
+            try:
+                self.vector_store = NumpyVectorStore(
+                    NUMPY_STORE_PATH,
+                    settings.EMBEDDING_MODEL_NAME,
+                    max_ram_mb=settings.NUMPY_STORE_MAX_RAM_MB,
+                    quantization=settings.NUMPY_STORE_QUANTIZATION,
+                    oversample=settings.NUMPY_STORE_OVERSAMPLE,
+                )
+            except Exception as e:
+                logger.error("Failed to load the NumPy vector store", exc_info=True)
+                raise RuntimeError(f"Failed to load the NumPy vector store: {e}")
+        else:
+            self.vector_store = self._chroma_store
+        logger.info(f"Corpus vector store: {self.vector_store.backend}")
+
         # --- 4. Initialize Gemini Model ---
         logger.info(f"Initializing Gemini model: {settings.GEMINI_MODEL_NAME}")
         try:
@@ -109,9 +154,35 @@ class QueryEngine:
 
         # --- 7. Cache ---
         self.classification_cache = {}
+
+        # --- 7b. Single-flight: identical concurrent classifications share one LLM call ---
+        self._filter_flight = SingleFlight("smart_filter")
+        self._template_flight = SingleFlight("template_classify")
+
+        # --- 7c. Query planner counters (see _plan_query) ---
+        self._stats_lock = threading.Lock()
+        self.planner_stats = {"plans": 0, "local": 0, "llm": 0, "fallback": 0, "round_trips_saved": 0, "retrieval_skipped": 0}
+
+        # --- 7d. Speculative retrieval: searches run while the planner's LLM call is in flight ---
+        self._speculation_pool = ThreadPoolExecutor(
+            max_workers=max(2, settings.SPECULATIVE_MAX_WORKERS), thread_name_prefix="speculative"
+        )
+        self.speculation_stats = {"speculated": 0, "hit_unfiltered": 0, "hit_category": 0, "hit_subset": 0, "miss": 0, "unused": 0}
+
+        # Serializes online ingestion (document_map / keyword_map / collection upserts)
+        self._ingest_lock = threading.Lock()
         
         # --- 8. Dynamically Load Document Templates (NEW) ---
-        self.template_map = {}
+        # Bodies + placeholders are held in memory and hot-reloaded by a file watcher
+        self.template_store = TemplateStore(SAMPLE_TEMPLATES_DIR, poll_seconds=settings.TEMPLATE_POLL_SECONDS)
+        self.template_store.add_listener(self._on_templates_changed)
+        # Local "auto" template selection (embeddings; LLM only breaks ties). Re-embeds on reload.
+        self.template_classifier = TemplateClassifier(
+            self.embedding_model,
+            threshold=settings.TEMPLATE_MATCH_THRESHOLD,
+            min_score=settings.TEMPLATE_MATCH_MIN_SCORE,
+            margin=settings.TEMPLATE_MATCH_MARGIN,
+        )
         self._load_templates() # Call the new helper function
 
         # --- Final Startup Log ---
@@ -123,18 +194,14 @@ class QueryEngine:
         logger.info("✅ Query Engine initialization complete.\n")
 
 
-    # --- Helper: Safe Gemini Call with Retry (unchanged) ---
-    def _safe_generate(self, prompt: str):
-        for attempt in range(2):
-            try:
-                return self.gemini_model.generate_content(prompt)
-            except Exception as e:
-                if "429" in str(e): 
-                    logger.warning("Rate limit hit. Retrying in 2 seconds...")
-                    time.sleep(2)
-                    continue
-                logger.error(f"Gemini API error during generation: {e}", exc_info=False)
-                raise
+    # --- Helper: Safe Gemini Call (rate limiting + retries handled by the shared LLM scheduler) ---
+    def _safe_generate(self, prompt: str, priority: Priority = Priority.INTERACTIVE, purpose: str = "generate"):
+        """[Blocking] For code already running in a worker thread (e.g. `query`)."""
+        return llm_scheduler.generate_sync(self.gemini_model, prompt, priority=priority, purpose=purpose)
+
+    async def _agenerate(self, prompt: str, priority: Priority = Priority.INTERACTIVE, purpose: str = "generate"):
+        """[Async] Same as `_safe_generate`, but awaits the scheduler instead of holding a threadpool worker."""
+        return await llm_scheduler.generate(self.gemini_model, prompt, priority=priority, purpose=purpose)
 
     # --- Reframe Follow-Up Question (unchanged) ---
     def _reframe_question(
@@ -158,7 +225,7 @@ class QueryEngine:
         Standalone Question:"""
         try:
             logger.info("Re-framing question based on chat history...")
-            response = self._safe_generate(reframe_prompt)
+            response = self._safe_generate(reframe_prompt, Priority.INTERACTIVE, "reframe")
             standalone_question = getattr(response, "text", "").strip()
             if standalone_question:
                 logger.info(f"Re-framed question → '{standalone_question}'")
@@ -170,12 +237,17 @@ class QueryEngine:
             logger.warning(f"Could not reframe question, using original: {e}", exc_info=True)
             return question
 
-    # --- Fallback keyword classifier (unchanged) ---
-    def _fallback_keyword_classify(self, question: str) -> str:
+    # --- Fallback keyword classifier ---
+    def _keyword_scores(self, question: str) -> Dict[str, int]:
         question_lower = question.lower()
+        return {
+            category: sum(1 for kw in keywords if kw in question_lower)
+            for category, keywords in self.keyword_map.items()
+        }
+
+    def _fallback_keyword_classify(self, question: str) -> str:
         best_match, best_score = "General", 0 
-        for category, keywords in self.keyword_map.items():
-            score = sum(1 for kw in keywords if kw in question_lower)
+        for category, score in self._keyword_scores(question).items():
             if score > 0 and score >= best_score:
                 best_match, best_score = category, score
         logger.info(f"Fallback classification result: '{best_match}' (Score: {best_score})")
@@ -189,16 +261,20 @@ class QueryEngine:
         ]
         if category in self.document_map:
             doc_filename = self.document_map[category]
+            if isinstance(doc_filename, list):
+                # Category backed by several documents (e.g. added via online ingestion)
+                logger.debug(f"Applying MULTI-DOCUMENT filter for '{category}'. Targeting {len(doc_filename)} sources.")
+                return {"source_document": {"$in": list(doc_filename)}}
             if category == "Contract" or category == "Negotiable":
                 target_documents = [doc_filename] + PROCEDURAL_DEBT_GUIDES
-                logger.info(f"Applying HYBRID filter for Debt/Contract. Targeting {len(target_documents)} sources.")
+                logger.debug(f"Applying HYBRID filter for Debt/Contract. Targeting {len(target_documents)} sources.")
                 return {"source_document": {"$in": target_documents}}
-            logger.info(f"Applying SINGLE filter for '{category}'.")
+            logger.debug(f"Applying SINGLE filter for '{category}'.")
             return {"source_document": doc_filename}
-        logger.info(f"No document filter applied (category='{category}'). Searching all documents.")
+        logger.debug(f"No document filter applied (category='{category}'). Searching all documents.")
         return None
 
-    # --- Smart Filter Classification (unchanged) ---
+    # --- Smart Filter Classification ---
     def _get_smart_filter(self, question: str) -> Optional[Dict]:
         question = question.strip()
         if not question:
@@ -207,6 +283,16 @@ class QueryEngine:
             cached_category = self.classification_cache[question]
             logger.info(f"Using cached classification: '{cached_category}'")
             return self._build_filter(cached_category)
+        # Concurrent requests for the same question wait for one classification
+        category = self._filter_flight.do_sync(
+            make_key("smart_filter", question, sorted(self.document_map)),
+            self._classify_category,
+            question,
+        )
+        return self._build_filter(category)
+
+    def _classify_category(self, question: str) -> str:
+        """[Blocking] Asks the LLM for the question's document category (keyword fallback on failure)."""
         logger.info("Classifying query for smart filtering...")
         categories = "\n".join([f"- {key}" for key in self.document_map.keys()])
         classifier_prompt = f"""
@@ -222,7 +308,7 @@ class QueryEngine:
         Respond with ONLY the single most relevant category name from the list. Do not add explanations.
         Category:"""
         try:
-            response = self._safe_generate(classifier_prompt)
+            response = self._safe_generate(classifier_prompt, Priority.CLASSIFICATION, "smart_filter")
             raw_category = getattr(response, "text", "General").strip()
             category = "General" 
             for cat_key in self.document_map.keys():
@@ -233,12 +319,205 @@ class QueryEngine:
                  logger.warning(f"AI classifier returned unexpected text: '{raw_category}'. Using fallback.")
                  category = self._fallback_keyword_classify(question)
             self.classification_cache[question] = category
-            return self._build_filter(category)
+            return category
         except Exception as e:
             logger.warning(f"Smart classification failed: {e}. Using fallback classifier.")
             category = self._fallback_keyword_classify(question)
             self.classification_cache[question] = category
-            return self._build_filter(category)
+            return category
+
+    # --- Query Planner (one LLM call for re-framing + classification, or none) ---
+    def _plan_query(
+        self,
+        question: str,
+        chat_history: List[Dict[str, str]],
+        before_llm: Optional[Callable[[], None]] = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> QueryPlan:
+        """
+        [Blocking] Decides the standalone question, the document category and whether retrieval is
+        needed. Without history, small talk and confidently keyword-classified questions need no LLM;
+        otherwise one structured call replaces the separate re-frame and classification round trips.
+        `before_llm` runs just before that call (used to start speculative retrieval).
+        """
+        question = question.strip()
+        # Round trips the old path (re-frame, then classify) would have made
+        baseline_calls = (1 if chat_history else 0) + (0 if question in self.classification_cache and not chat_history else 1)
+
+        plan = None
+        if not chat_history:
+            if is_small_talk(question):
+                plan = QueryPlan(question, "General", False, "local")
+            elif question in self.classification_cache:
+                plan = QueryPlan(question, self.classification_cache[question], True, "local")
+            else:
+                category = confident_category(self._keyword_scores(question))
+                if category:
+                    plan = QueryPlan(question, category, True, "local")
+
+        if plan is None:
+            if before_llm is not None:
+                before_llm()
+            try:
+                response = self._safe_generate(
+                    build_plan_prompt(question, chat_history, self.document_map.keys()),
+                    priority,
+                    "query_plan",
+                )
+                parsed = parse_plan(getattr(response, "text", "") or "", self.document_map.keys())
+            except Exception as e:
+                logger.warning(f"Query planner call failed: {e}. Falling back to re-frame + classify.")
+                parsed = None
+            if parsed:
+                if not chat_history:
+                    # Nothing to re-frame: keep the user's wording (as _reframe_question does)
+                    parsed["standalone_question"] = question
+                plan = QueryPlan(source="llm", llm_calls=1, **parsed)
+                self.classification_cache[plan.standalone_question] = plan.category
+            else:
+                # Old two-step path (each step has its own error handling / keyword fallback)
+                with stage("reframe"):
+                    standalone_question = self._reframe_question(question, chat_history)
+                with stage("classify"):
+                    self._get_smart_filter(standalone_question)
+                category = self.classification_cache.get(standalone_question.strip(), "General")
+                plan = QueryPlan(standalone_question, category, True, "fallback", llm_calls=baseline_calls + 1)
+
+        plan.round_trips_saved = baseline_calls - plan.llm_calls
+        with self._stats_lock:
+            self.planner_stats["plans"] += 1
+            self.planner_stats[plan.source] += 1
+            self.planner_stats["round_trips_saved"] += plan.round_trips_saved
+            self.planner_stats["retrieval_skipped"] += int(not plan.needs_retrieval)
+        logger.info(
+            f"🗺️ Query plan ({plan.source}): category={plan.category}, retrieval={plan.needs_retrieval}, "
+            f"LLM calls={plan.llm_calls}, round trips saved={plan.round_trips_saved} → '{plan.standalone_question}'"
+        )
+        return plan
+
+    # --- Retrieval ---
+    def _search(self, question_embedding: List[float], where_filter: Optional[Dict], n_results: int) -> Tuple[List[str], List[Dict]]:
+        """[Blocking] One dense search: (documents, metadatas)."""
+        return self.vector_store.search(question_embedding, where_filter, n_results)
+
+    @staticmethod
+    def _matches_filter(metadata: Optional[Dict], where_filter: Dict) -> bool:
+        """Evaluates the filters built by _build_filter ({"source_document": x} or {"$in": [...]}) locally."""
+        condition = where_filter.get("source_document")
+        source = (metadata or {}).get("source_document")
+        if isinstance(condition, dict):
+            return source in condition.get("$in", [])
+        return source == condition
+
+    def _speculate(self, question: str) -> Dict[str, Any]:
+        """
+        Starts retrieval before the category is known: embeds the question, then runs an
+        unfiltered search (over-fetched) and, if the keyword classifier has a guess, that
+        category's filtered search, both on the engine's speculation pool.
+        """
+        guess = self._fallback_keyword_classify(question)
+        guess = guess if guess in self.document_map else None
+        n_unfiltered = settings.N_TO_RETRIEVE * max(1, settings.SPECULATIVE_OVERFETCH)
+
+        def run_in_context(fn, *args) -> Future:
+            # Carry request-scoped context (logging / tracing) into the pool thread
+            return self._speculation_pool.submit(contextvars.copy_context().run, fn, *args)
+
+        def search(embedding: List[float], where_filter: Optional[Dict], n_results: int):
+            with stage("speculative_retrieve"):
+                return self._search(embedding, where_filter, n_results)
+
+        def embed_and_search() -> Tuple[List[float], Optional[Future], Tuple[List[str], List[Dict]]]:
+            with stage("speculative_embed"):
+                embedding = self.embedding_model.encode(question).tolist()
+            category_future = None
+            if guess:
+                category_future = run_in_context(search, embedding, self._build_filter(guess), settings.N_TO_RETRIEVE)
+            return embedding, category_future, search(embedding, None, n_unfiltered)
+
+        with self._stats_lock:
+            self.speculation_stats["speculated"] += 1
+        logger.info(f"🔮 Speculative retrieval started (unfiltered x{n_unfiltered}, category guess: {guess})")
+        return {"guess": guess, "future": run_in_context(embed_and_search)}
+
+    def _resolve_speculation(
+        self, speculation: Dict[str, Any], category: str, where_filter: Optional[Dict]
+    ) -> Tuple[Optional[List[float]], Optional[Tuple[List[str], List[Dict]]]]:
+        """
+        [Blocking] Picks results for the planned category from the speculative searches.
+        Returns (embedding, (documents, metadatas)). On a miss the results are None but the
+        finished embedding is still returned, so the caller only re-runs the search.
+        Both are None if speculation failed.
+        """
+        try:
+            embedding, category_future, (documents, metadatas) = speculation["future"].result()
+        except Exception as e:
+            logger.warning(f"Speculative retrieval failed: {e}")
+            return None, None
+
+        outcome, result = "miss", None
+        if where_filter is None:
+            outcome, result = "hit_unfiltered", (documents[:settings.N_TO_RETRIEVE], metadatas[:settings.N_TO_RETRIEVE])
+        elif category == speculation["guess"] and category_future is not None:
+            try:
+                outcome, result = "hit_category", category_future.result()
+            except Exception as e:
+                logger.warning(f"Speculative category search failed: {e}")
+        if result is None and where_filter is not None:
+            # The over-fetched unfiltered list is in global distance order, so if it holds at least
+            # N chunks from the planned sources, those are exactly the filtered search's top N.
+            subset = [(d, m) for d, m in zip(documents, metadatas) if self._matches_filter(m, where_filter)]
+            if len(subset) >= settings.N_TO_RETRIEVE:
+                subset = subset[:settings.N_TO_RETRIEVE]
+                outcome, result = "hit_subset", ([d for d, _ in subset], [m for _, m in subset])
+        if category_future is not None and outcome != "hit_category":
+            category_future.cancel()
+
+        with self._stats_lock:
+            self.speculation_stats[outcome] += 1
+        logger.info(f"🔮 Speculation {outcome} (planned category: {category}, guess: {speculation['guess']})")
+        return embedding, result
+
+    def shutdown(self):
+        self._speculation_pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _small_talk_prompt(question: str, chat_history: List[Dict[str, str]]) -> str:
+        history_str = "\n".join(f"{msg['role']}: {msg['content']}" for msg in chat_history[-4:])
+        return f"""
+        You are 'Gen-Vidhik Sahayak', a friendly Indian legal AI assistant.
+        Reply briefly and politely to the user's message. Do not give legal advice in this reply;
+        invite them to describe their legal question if appropriate.
+
+        {history_str}
+        User: "{question}"
+        """
+
+    def _answer_small_talk(self, question: str, chat_history: List[Dict[str, str]]) -> str:
+        """[Blocking] Short conversational reply for messages that need no legal sources."""
+        response = self._safe_generate(self._small_talk_prompt(question, chat_history), Priority.INTERACTIVE, "small_talk")
+        return self._small_talk_text(response)
+
+    @staticmethod
+    def _small_talk_text(response) -> str:
+        return (getattr(response, "text", "") or "").strip() or "Hello! How can I help you with your legal question?"
+
+    @staticmethod
+    def _answer_text(response) -> str:
+        """Answer text of a Gemini response ("Could not generate answer." when there is none)."""
+        answer = "Could not generate answer."
+        if response and response.text:
+            answer = response.text.strip()
+        elif response and response.candidates:
+             try:
+                  answer = response.candidates[0].content.parts[0].text.strip()
+             except (IndexError, AttributeError):
+                  logger.warning("Could not extract text from response candidates.")
+        return answer
+
+    @staticmethod
+    def _source_names(sources_metadata: List[Dict]) -> List[str]:
+        return list(set([meta.get('source_document') for meta in sources_metadata if meta and 'source_document' in meta]))
 
     # --- Build Prompt for Gemini (unchanged) ---
     def _build_prompt(
@@ -292,7 +571,18 @@ class QueryEngine:
         chat_history: Optional[List[Dict[str, str]]] = None,
         case_context: Optional[str] = None  # <--- [UPDATE] Added new argument
     ) -> Dict[str, Any]:
-        
+        with tracing.span(
+            "QueryEngine.query",
+            **{"rag.history_messages": len(chat_history or []), "rag.has_case_context": bool(case_context)},
+        ):
+            return self._query(user_question, chat_history, case_context)
+
+    def _query(
+        self,
+        user_question: str,
+        chat_history: Optional[List[Dict[str, str]]],
+        case_context: Optional[str],
+    ) -> Dict[str, Any]:
         if chat_history is None:
             chat_history = []
             
@@ -303,31 +593,62 @@ class QueryEngine:
         start_time = time.time()
         logger.info(f"Processing query → '{user_question}'")
         
-        # 1. Reframe and Filter
-        standalone_question = self._reframe_question(user_question, chat_history)
-        where_filter = self._get_smart_filter(standalone_question)
+        # 1. Plan: standalone question + category (+ skip retrieval for small talk).
+        # Without history the question is already standalone, so retrieval can start
+        # speculatively while the planner's LLM call is in flight.
+        speculation = {}
+
+        def start_speculation():
+            if not chat_history and settings.SPECULATIVE_RETRIEVAL_ENABLED:
+                speculation.update(self._speculate(user_question.strip()))
+
+        with stage("plan"):
+            plan = self._plan_query(user_question, chat_history, before_llm=start_speculation)
+        standalone_question = plan.standalone_question
+        tracing.set_attributes(**{
+            "rag.plan_source": plan.source, "rag.category": plan.category,
+            "rag.needs_retrieval": plan.needs_retrieval, "rag.planner_llm_calls": plan.llm_calls,
+        })
+        if not plan.needs_retrieval:
+            if speculation:
+                speculation["future"].cancel()
+                with self._stats_lock:
+                    self.speculation_stats["unused"] += 1
+            try:
+                with stage("generate"):
+                    return {"answer": self._answer_small_talk(standalone_question, chat_history), "sources": []}
+            except Exception as e:
+                logger.error(f"Error calling Gemini API for small talk: {e}", exc_info=True)
+                return {"answer": "Error generating answer from the AI model.", "sources": []}
+        where_filter = self._build_filter(plan.category)
+        N_TO_RETRIEVE = settings.N_TO_RETRIEVE
+
+        speculative_embedding, speculative = None, None
+        if speculation:
+            with stage("speculation_wait"):
+                speculative_embedding, speculative = self._resolve_speculation(speculation, plan.category, where_filter)
         
-        # 2. Embed
+        # 2. Embed (the speculative embedding is reused even when its search results are not)
         try:
-            question_embedding = self.embedding_model.encode(standalone_question).tolist()
+            if speculative_embedding is not None:
+                question_embedding = speculative_embedding
+            else:
+                with stage("embed"):
+                    question_embedding = self.embedding_model.encode(standalone_question).tolist()
         except Exception as e:
             logger.error(f"Failed to encode question: {e}", exc_info=True)
             return {"answer": "Error encoding question.", "sources": []}
             
         # 3. Retrieve
-        N_TO_RETRIEVE = settings.N_TO_RETRIEVE
-        logger.info(f"Searching database (top {N_TO_RETRIEVE} for reranking). Filter: {where_filter or 'None'}")
-        
         try:
-            results = self.collection.query(
-                query_embeddings=[question_embedding],
-                n_results=N_TO_RETRIEVE, 
-                where=where_filter,
-                include=['metadatas', 'documents']
-            )
-            context_chunks = results.get("documents", [[]])[0]
-            sources_metadata = results.get("metadatas", [[]])[0]
+            if speculative is not None:
+                context_chunks, sources_metadata = speculative
+            else:
+                logger.debug(f"Searching database (top {N_TO_RETRIEVE} for reranking). Filter: {where_filter or 'None'}")
+                with stage("retrieve"):
+                    context_chunks, sources_metadata = self._search(question_embedding, where_filter, N_TO_RETRIEVE)
             
+            tracing.set_attributes(**{"rag.chunks_retrieved": len(context_chunks), "rag.speculative_hit": bool(speculative)})
             if not context_chunks:
                 logger.warning("No relevant results found in the database for this query.")
                 return { "answer": "Based on the provided documents, I cannot answer this question.", "sources": [] }
@@ -341,9 +662,10 @@ class QueryEngine:
         reranked_metadata = sources_metadata
         
         if self.reranker_model is not None:
-            logger.info(f"Reranking {len(context_chunks)} chunks to select top {self.top_k}...")
+            logger.debug(f"Reranking {len(context_chunks)} chunks to select top {self.top_k}...")
             sentences_to_rank = [[standalone_question, chunk] for chunk in context_chunks]
-            rerank_scores = self.reranker_model.predict(sentences_to_rank).tolist()
+            with stage("rerank"):
+                rerank_scores = self.reranker_model.predict(sentences_to_rank).tolist()
             
             scored_results = sorted(
                 list(zip(rerank_scores, context_chunks, sources_metadata)), 
@@ -354,31 +676,26 @@ class QueryEngine:
             top_k_results = scored_results[:self.top_k]
             reranked_chunks = [result[1] for result in top_k_results]
             reranked_metadata = [result[2] for result in top_k_results]
-            logger.info(f"✅ Reranking complete. Using top {self.top_k} chunks.")
+            logger.debug(f"✅ Reranking complete. Using top {self.top_k} chunks.")
             
         context_chunks = reranked_chunks
         sources_metadata = reranked_metadata
         
         # 5. Build Prompt and Generate
         # <--- [UPDATE] Passing case_context to _build_prompt
-        prompt = self._build_prompt(standalone_question, context_chunks, chat_history, case_context) 
+        with stage("prompt_build"):
+            prompt = self._build_prompt(standalone_question, context_chunks, chat_history, case_context) 
+        tracing.set_attributes(**{"rag.chunks_in_prompt": len(context_chunks), "llm.prompt_chars": len(prompt)})
         
-        logger.info("Asking Gemini for final answer...")
+        logger.debug("Asking Gemini for final answer...")
         try:
-            response = self._safe_generate(prompt)
-            answer = "Could not generate answer."
+            with stage("generate"):
+                response = self._safe_generate(prompt, Priority.INTERACTIVE, "answer")
+            answer = self._answer_text(response)
             
-            if response and response.text:
-                answer = response.text.strip()
-            elif response and response.candidates:
-                 try:
-                      answer = response.candidates[0].content.parts[0].text.strip()
-                 except (IndexError, AttributeError):
-                      logger.warning("Could not extract text from response candidates.")
+            logger.debug("Gemini answer received.")
             
-            logger.info("Gemini answer received.")
-            
-            output_sources = list(set([meta.get('source_document') for meta in sources_metadata if meta and 'source_document' in meta]))
+            output_sources = self._source_names(sources_metadata)
             end_time = time.time()
             logger.info(f"Query processed successfully in {end_time - start_time:.2f} seconds.")
             
@@ -387,19 +704,334 @@ class QueryEngine:
         except Exception as e:
             logger.error(f"Error calling Gemini API for final answer: {e}", exc_info=True)
             return { "answer": "Error generating answer from the AI model.", "sources": [] }
+    # ==========================================================
+    # BATCH QUESTIONS (/ask/batch)
+    # ==========================================================
+    def prepare_batch(self, items: List[Dict[str, Any]]) -> List[PreparedAnswer]:
+        """
+        [Blocking] Plans, retrieves and reranks a batch of {"question", "chat_history"} items
+        together: one `encode` call for every question, one vector-store search per distinct
+        filter (several query vectors each), and one reranker `predict` over all pairs.
+        Returns one PreparedAnswer per item, in order; generation is left to `answer_prepared`.
+        """
+        with tracing.span("QueryEngine.prepare_batch", **{"rag.batch_size": len(items)}):
+            return self._prepare_batch(items)
+
+    def _prepare_batch(self, items: List[Dict[str, Any]]) -> List[PreparedAnswer]:
+        prepared = [PreparedAnswer(question=item.get("question") or "") for item in items]
+        histories = [item.get("chat_history") or [] for item in items]
+        pending = []
+        for index, entry in enumerate(prepared):
+            if entry.question.strip():
+                pending.append(index)
+            else:
+                entry.answer = "Please provide a valid question."
+
+        # 1. Plan. Most plans are local; planner LLM calls overlap (bounded) at batch priority.
+        plans: Dict[int, QueryPlan] = {}
+        with stage("batch_plan"):
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(settings.ASK_BATCH_CONCURRENCY, len(pending))), thread_name_prefix="batch-plan"
+            ) as pool:
+                futures = {
+                    index: pool.submit(
+                        contextvars.copy_context().run,
+                        self._plan_query, prepared[index].question, histories[index], None, Priority.BULK,
+                    )
+                    for index in pending
+                }
+            for index, future in futures.items():
+                try:
+                    plans[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Query planning failed for batch item {index}: {e}", exc_info=True)
+                    prepared[index].answer = "Error generating answer from the AI model."
+
+        retrieval = []
+        for index, plan in plans.items():
+            if plan.needs_retrieval:
+                retrieval.append(index)
+            else:
+                prepared[index].prompt = self._small_talk_prompt(plan.standalone_question, histories[index])
+                prepared[index].purpose = "small_talk"
+        if not retrieval:
+            return prepared
+
+        # 2. Embed every standalone question in one call
+        try:
+            with stage("batch_embed"):
+                embeddings = self.embedding_model.encode([plans[index].standalone_question for index in retrieval])
+        except Exception as e:
+            logger.error(f"Failed to encode batch questions: {e}", exc_info=True)
+            for index in retrieval:
+                prepared[index].answer = "Error encoding question."
+            return prepared
+
+        # 3. Retrieve: one search per distinct filter, with all of that filter's query vectors
+        groups: Dict[str, List[int]] = {}
+        filters: Dict[str, Optional[Dict]] = {}
+        for position, index in enumerate(retrieval):
+            where_filter = self._build_filter(plans[index].category)
+            key = make_key(where_filter)
+            filters[key] = where_filter
+            groups.setdefault(key, []).append(position)
+
+        retrieved: Dict[int, Tuple[List[str], List[Dict]]] = {}
+        with stage("batch_retrieve"):
+            for key, positions in groups.items():
+                try:
+                    results = self.vector_store.search_many(
+                        [embeddings[position].tolist() for position in positions], filters[key], settings.N_TO_RETRIEVE
+                    )
+                except Exception as e:
+                    logger.error(f"Error querying the vector store for a batch group: {e}", exc_info=True)
+                    for position in positions:
+                        prepared[retrieval[position]].answer = "Error retrieving information from the database."
+                    continue
+                for position, result in zip(positions, results):
+                    if result[0]:
+                        retrieved[retrieval[position]] = result
+                    else:
+                        prepared[retrieval[position]].answer = "Based on the provided documents, I cannot answer this question."
+        tracing.set_attributes(**{"rag.batch_retrievals": len(retrieved), "rag.batch_filter_groups": len(groups)})
+
+        # 4. Rerank every (question, chunk) pair in one predict call, then split per question
+        if self.reranker_model is not None and retrieved:
+            pairs, spans = [], {}
+            for index, (chunks, _) in retrieved.items():
+                spans[index] = (len(pairs), len(pairs) + len(chunks))
+                pairs.extend([plans[index].standalone_question, chunk] for chunk in chunks)
+            with stage("batch_rerank"):
+                scores = self.reranker_model.predict(pairs).tolist()
+            for index, (start, stop) in spans.items():
+                chunks, metadatas = retrieved[index]
+                top_k_results = sorted(
+                    zip(scores[start:stop], chunks, metadatas), key=lambda x: x[0], reverse=True
+                )[:self.top_k]
+                retrieved[index] = ([r[1] for r in top_k_results], [r[2] for r in top_k_results])
+
+        # 5. Prompts
+        for index, (chunks, metadatas) in retrieved.items():
+            prepared[index].prompt = self._build_prompt(plans[index].standalone_question, chunks, histories[index])
+            prepared[index].sources = self._source_names(metadatas)
+        logger.info(
+            f"📦 Batch prepared: {len(items)} questions, {len(retrieved)} retrieved in {len(groups)} filter group(s)"
+        )
+        return prepared
+
+    async def answer_prepared(self, prepared: PreparedAnswer) -> Dict[str, Any]:
+        """[Async] Generates the answer for one prepared batch item (at batch priority)."""
+        if prepared.answer is not None:
+            return {"answer": prepared.answer, "sources": prepared.sources}
+        try:
+            response = await self._agenerate(prepared.prompt, Priority.BULK, prepared.purpose)
+            answer = self._small_talk_text(response) if prepared.purpose == "small_talk" else self._answer_text(response)
+            return {"answer": answer, "sources": prepared.sources}
+        except Exception as e:
+            logger.error(f"Error calling Gemini API for batch answer: {e}", exc_info=True)
+            return {"answer": "Error generating answer from the AI model.", "sources": []}
+
+    # ==========================================================
+    # [NEW] ONLINE CORPUS INGESTION
+    # ==========================================================
+    def ingest_document(
+        self,
+        file_path: str,
+        category: Optional[str] = None,
+        keywords: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        [Blocking] Extracts, chunks, embeds and upserts ONE document into the live
+        collection, so new Acts and guides are searchable without re-running
+        preprocess.py/ingest.py or restarting the server.
+        Optionally registers it under a smart-filter category (new or existing).
+        """
+        # Same source id scheme as preprocess.py: path relative to DATA_DIR, forward slashes
+        abs_path = os.path.abspath(file_path)
+        if abs_path.startswith(os.path.abspath(DATA_DIR) + os.sep):
+            source_document = os.path.relpath(abs_path, DATA_DIR).replace(os.sep, "/")
+        else:
+            source_document = f"raw/Uploaded_Documents/{os.path.basename(abs_path)}"
+        logger.info(f"📥 Ingesting '{source_document}' (category={category or 'None'})...")
+
+        # 1. Extract + clean
+        extension = os.path.splitext(abs_path)[1].lower()
+        if extension == ".pdf":
+            raw_text = extraction_service.pdf_file_text_sync(abs_path)
+        elif extension == ".txt":
+            with open(abs_path, "r", encoding="utf-8") as f:
+                raw_text = f.read()
+        else:
+            raise ValueError(f"Unsupported file type for ingestion: {extension}")
+        document_text = clean_text(raw_text)
+        if not document_text:
+            raise ValueError(f"No text could be extracted from {source_document}")
+
+        # 2. Chunk (same size/overlap settings as the batch pipeline)
+        chunks = split_text(document_text, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+        basename = os.path.basename(abs_path)
+        ids = [f"{basename}_chunk_{i + 1}" for i in range(len(chunks))]
+        metadatas = [{"source_document": source_document, "chunk_id": chunk_id} for chunk_id in ids]
+
+        # 3. Embed + upsert, replacing any previous version of this document
+        embeddings = self.embedding_model.encode(chunks, batch_size=64).tolist()
+        with self._ingest_lock:
+            self._chroma_store.replace_source(source_document, ids, embeddings, chunks, metadatas)
+            if self.vector_store is not self._chroma_store:
+                self.vector_store.replace_source(source_document, ids, embeddings, chunks, metadatas)
+
+            # 4. Register with the smart filter
+            if category:
+                existing = self.document_map.get(category)
+                if existing is None or existing == source_document:
+                    self.document_map[category] = source_document
+                else:
+                    sources = existing if isinstance(existing, list) else [existing]
+                    if source_document not in sources:
+                        self.document_map[category] = sources + [source_document]
+                if keywords:
+                    known = self.keyword_map.setdefault(category, [])
+                    known.extend(kw.lower() for kw in keywords if kw.lower() not in known)
+                # Cached classifications were made against the old category list
+                self.classification_cache.clear()
+
+        logger.info(f"✅ Ingested '{source_document}': {len(chunks)} chunks. Collection size: {self.vector_store.count()}")
+        return {"source_document": source_document, "chunks": len(chunks), "category": category}
+
+    # ==========================================================
+    # [NEW] PER-CASE EVIDENCE INDEX
+    # ==========================================================
+    def index_evidence(self, case_id: str, evidence_id: str, filename: str, text: str) -> int:
+        """
+        [Blocking] Chunks and embeds an evidence file's full extracted text into the
+        evidence collection, tagged with its case and evidence ids. Returns the chunk count.
+        Placeholder results ("[OCR Analysis returned no text]", "[Error reading PDF: ...]")
+        are not indexed, so /ask never retrieves them as evidence.
+        """
+        if is_placeholder_text(text):
+            logger.info(f"Evidence '{filename}' for case {case_id} has no extracted text; not indexed.")
+            chunks = []
+        else:
+            chunks = split_text(text, settings.EVIDENCE_CHUNK_SIZE, settings.EVIDENCE_CHUNK_OVERLAP)
+        if not chunks:
+            # Nothing to index; remember it so backfill does not retry on every question
+            self._mark_evidence_indexed(case_id, evidence_id)
+            return 0
+        embeddings = self.embedding_model.encode(chunks).tolist()
+        self.evidence_collection.upsert(
+            ids=[f"{case_id}:{evidence_id}:{i}" for i in range(len(chunks))],
+            embeddings=embeddings,
+            documents=chunks,
+            metadatas=[
+                {"case_id": case_id, "evidence_id": evidence_id, "filename": filename or "", "chunk_index": i}
+                for i in range(len(chunks))
+            ],
+        )
+        self._mark_evidence_indexed(case_id, evidence_id)
+        logger.info(f"Indexed evidence '{filename}' for case {case_id}: {len(chunks)} chunks.")
+        return len(chunks)
+
+    def _mark_evidence_indexed(self, case_id: str, evidence_id: str):
+        with self._indexed_evidence_lock:
+            # Only cases already loaded; otherwise the next lookup reads Chroma anyway
+            if case_id in self._indexed_evidence:
+                self._indexed_evidence[case_id].add(evidence_id)
+
+    def indexed_evidence_ids(self, case_id: str) -> Set[str]:
+        """[Blocking] Evidence ids of a case that have been indexed (one Chroma read per case, then cached)."""
+        with self._indexed_evidence_lock:
+            cached = self._indexed_evidence.get(case_id)
+            if cached is not None:
+                return set(cached)
+        result = self.evidence_collection.get(where={"case_id": case_id}, include=["metadatas"])
+        ids = {meta.get("evidence_id") for meta in result.get("metadatas") or [] if meta}
+        with self._indexed_evidence_lock:
+            self._indexed_evidence.setdefault(case_id, set()).update(ids)
+            return set(self._indexed_evidence[case_id])
+
+    def remove_evidence(self, case_id: str, evidence_id: Optional[str] = None):
+        """[Blocking] Deletes the vectors of one evidence file, or of a whole case."""
+        if evidence_id:
+            where = {"$and": [{"case_id": case_id}, {"evidence_id": evidence_id}]}
+        else:
+            where = {"case_id": case_id}
+        self.evidence_collection.delete(where=where)
+        with self._indexed_evidence_lock:
+            if evidence_id:
+                self._indexed_evidence.get(case_id, set()).discard(evidence_id)
+            else:
+                self._indexed_evidence.pop(case_id, None)
+        logger.info(f"Removed evidence vectors for case {case_id} (evidence_id={evidence_id or 'ALL'}).")
+
+    def search_evidence(self, case_id: str, question: str, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        [Blocking] Returns the case's evidence passages most relevant to the question,
+        best first, trimmed to fit the prompt budget (EVIDENCE_CONTEXT_TOKENS).
+        """
+        char_budget = (token_budget or settings.EVIDENCE_CONTEXT_TOKENS) * 4
+        question_embedding = self.embedding_model.encode(question).tolist()
+        results = self.evidence_collection.query(
+            query_embeddings=[question_embedding],
+            n_results=settings.EVIDENCE_TOP_K,
+            where={"case_id": case_id},
+            include=["documents", "metadatas"],
+        )
+        documents = results.get("documents", [[]])[0]
+        metadatas = results.get("metadatas", [[]])[0]
+
+        passages, used = [], 0
+        for text, meta in zip(documents, metadatas):
+            if used + len(text) > char_budget:
+                remaining = char_budget - used
+                if remaining < 200:
+                    break
+                text = text[:remaining]
+            passages.append({"filename": (meta or {}).get("filename", ""), "text": text})
+            used += len(text)
+        logger.info(f"Evidence search for case {case_id}: {len(passages)} passages, {used} chars.")
+        return passages
+
     # ---
     # --- [NEW] HELPER FUNCTIONS FOR ADVANCED DRAFTING ---
     # ---
 
     async def _classify_template_type(self, scenario: str) -> Optional[str]:
         """
-        [NEW] Uses the LLM to classify a scenario against the available templates.
-        Returns a matching template key or None.
+        [UPDATED] Picks the template for "auto" drafting. Returns a matching template key or None.
+        Matching is local (embedding similarity); the LLM is only asked when the top candidates
+        are too close to call. Identical concurrent scenarios share one classification.
         """
+        key = make_key("template_classify", " ".join(scenario.split()), sorted(self.template_map))
+        return await self._template_flight.do_async(key, self._select_template, scenario)
+
+    async def _select_template(self, scenario: str) -> Optional[str]:
         logger.info("Attempting to auto-classify document type...")
-        
-        # Get the list of human-readable template keys
-        available_templates = "\n".join([f"- {key}" for key in self.template_map.keys()])
+        match = await run_in_threadpool(self.template_classifier.classify, scenario)
+        logger.info(
+            f"Template match: decision={match.decision}, key={match.key}, confidence={match.confidence:.3f}, "
+            f"candidates={match.candidates}, latency={match.latency_ms:.1f} ms"
+        )
+        if match.decision == "confident":
+            return match.key
+        if match.decision == "none":
+            logger.info("Auto-classification found no matching template.")
+            return None
+
+        # Ambiguous: let the LLM choose among the local top candidates only
+        candidate_keys = [candidate for candidate, _ in match.candidates]
+        start_time = time.time()
+        try:
+            template_key = await self._break_template_tie(scenario, candidate_keys)
+        except Exception as e:
+            template_key = match.key if match.confidence >= self.template_classifier.threshold else None
+            logger.warning(f"Template tie-breaker failed: {e}. Using local result '{template_key}'.")
+            return template_key
+        logger.info(f"Template tie-breaker chose '{template_key}' in {time.time() - start_time:.2f}s")
+        return template_key
+
+    async def _break_template_tie(self, scenario: str, candidate_keys: List[str]) -> Optional[str]:
+        """Asks the LLM to pick one of `candidate_keys` (or none). Raises if the call fails."""
+        available_templates = "\n".join([f"- {key}" for key in candidate_keys])
         
         classifier_prompt = f"""
         You are an expert legal assistant. A user has provided a scenario and needs a document.
@@ -411,24 +1043,12 @@ class QueryEngine:
         User's Scenario:
         "{scenario}"
 
-        Respond with *only* the single best matching template key (e.g., "debt_recovery_notice") or respond with "None" if no template is a good match.
+        Respond with *only* the single best matching template key (e.g., "{candidate_keys[0]}") or respond with "None" if no template is a good match.
 
         Matching Template Key:
         """
-        
-        try:
-            response = await run_in_threadpool(self._safe_generate, classifier_prompt)
-            template_key = getattr(response, "text", "None").strip().lower()
-            
-            if template_key in self.template_map:
-                logger.info(f"Auto-classification successful: Matched '{template_key}'")
-                return template_key
-            else:
-                logger.info("Auto-classification found no matching template.")
-                return None
-        except Exception as e:
-            logger.warning(f"Template classification failed: {e}. Defaulting to no template.")
-            return None
+        response = await self._agenerate(classifier_prompt, Priority.CLASSIFICATION, "template_classify")
+        return normalize_template_reply(getattr(response, "text", "") or "", candidate_keys)
 
     async def _draft_document_from_scratch(self, scenario: str) -> str:
         """
@@ -453,7 +1073,7 @@ class QueryEngine:
         FINAL DRAFTED DOCUMENT:
         """
         try:
-            response = await run_in_threadpool(self._safe_generate, drafting_prompt)
+            response = await self._agenerate(drafting_prompt, Priority.BULK, "draft_scratch")
             drafted_text = getattr(response, "text", "Error: Failed to generate draft.")
             return drafted_text.strip()
         except Exception as e:
@@ -461,46 +1081,68 @@ class QueryEngine:
             return "Error: The AI model failed to generate the document from scratch."
 
     # --- HELPER FUNCTIONS FOR DRAFTING (from previous step) ---
+    @property
+    def template_map(self) -> Dict[str, str]:
+        """Current template key -> filename map (always reflects the latest hot reload)."""
+        return self.template_store.template_map
+
     def _load_templates(self):
         """
-        Dynamically scans the templates directory and builds the template map.
-        This is called once during initialization.
+        Loads every template body (and its placeholders) into the template store.
+        Called once during initialization; later changes are picked up by the watcher.
         """
         logger.info(f"Loading document templates from: {SAMPLE_TEMPLATES_DIR}")
-        self.template_map = {}
         try:
-            for filename in os.listdir(SAMPLE_TEMPLATES_DIR):
-                if filename.endswith(".txt"):
-                    # Create a key from the filename, e.g., "cheque_bounce_notice.txt" -> "cheque_bounce_notice"
-                    template_key = filename.replace(".txt", "").lower()
-                    self.template_map[template_key] = filename
-            
-            logger.info(f"✅ Found and loaded {len(self.template_map)} templates: {list(self.template_map.keys())}")
-        
-        except FileNotFoundError:
-            logger.error(f"FATAL: Sample templates directory not found at: {SAMPLE_TEMPLATES_DIR}")
+            self.template_store.refresh()
+            logger.info(f"✅ Found and loaded {len(self.template_store)} templates: {self.template_store.keys()}")
         except Exception as e:
             logger.error(f"FATAL: Failed to load document templates: {e}", exc_info=True)
 
-    def _load_template_text(self, filename: str) -> str:
-        """
-        Synchronous function to read a template file. To be run in a thread.
-        """
-        template_path = os.path.join(SAMPLE_TEMPLATES_DIR, filename)
+    def _on_templates_changed(self, changed_keys):
+        """Called after each (re)load, on the template watcher thread: re-embeds changed templates."""
+        logger.info(f"Template set now: {self.template_store.keys()} (changed: {sorted(changed_keys)})")
         try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Template file not found at: {template_path}")
-            raise
+            self.template_classifier.rebuild(self.template_store.templates())
         except Exception as e:
-            logger.error(f"Error reading template file {template_path}: {e}", exc_info=True)
-            raise
+            logger.error(f"Failed to re-embed templates: {e}", exc_info=True)
 
-    async def draft_document(self, scenario: str, template_type: Optional[str] = "auto") -> str:
+    async def _fill_template_gaps(
+        self, scenario: str, template_text: str, missing: List[str], hints: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Asks the LLM only for the placeholders the case facts could not fill.
+        The prompt carries the scenario and one line of context per placeholder (plus the template's
+        instruction for free-text sections), not the whole template.
+        """
+        hints = hints or {}
+        context = placeholder_context(template_text, missing)
+        placeholder_lines = "\n".join(
+            f'- "{name}": {context.get(name, "")}' + (f"\n  INSTRUCTION: {hints[name]}" if name in hints else "")
+            for name in missing
+        )
+        gap_prompt = f"""
+        You are an expert Indian paralegal filling placeholders in a legal document template.
+
+        SCENARIO: "{scenario}"
+
+        PLACEHOLDERS (name: the template line it appears in):
+        {placeholder_lines}
+
+        INSTRUCTIONS:
+        1. Return ONLY a JSON object mapping each placeholder name to its value.
+        2. **DO NOT INVENT FACTS:** use null for anything not stated in the scenario (names, dates, addresses, numbers).
+        3. Placeholders asking you to write a section (e.g. WRITE_..._HERE, or any with an INSTRUCTION) may be written from the scenario in formal legal language, following the instruction; its "e.g." text is only an example.
+        """
+        response = await self._agenerate(gap_prompt, Priority.BULK, "draft_gaps")
+        return parse_gap_values(getattr(response, "text", "") or "", missing)
+
+    async def draft_document(
+        self, scenario: str, template_type: Optional[str] = "auto", facts: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         [UPDATED] Main drafting function.
-        1. STRATEGY A (Smart): Tries to use specific templates if available.
+        1. STRATEGY A (Smart): Fills a matching template. Placeholders known from the case `facts`
+           are substituted locally; the LLM is asked only for the remaining gaps.
         2. STRATEGY B (Fallback): Generates from scratch if no template matches.
         """
         logger.info(f"Starting document draft request. Type: '{template_type}'")
@@ -519,35 +1161,34 @@ class QueryEngine:
             # 3. If a template exists, try to fill it
             if final_template_key:
                 logger.info(f"✅ Found matching template: {final_template_key}")
-                template_filename = self.template_map.get(final_template_key)
-                
-                # Load template text (running in threadpool to avoid blocking)
-                template_text = await run_in_threadpool(self._load_template_text, template_filename)
-
-                drafting_prompt = f"""
-                You are an expert Indian paralegal. Your task is to fill in the placeholders in the document template.
-
-                SCENARIO: "{scenario}"
-
-                TEMPLATE:
-                "{template_text}"
-
-                CRITICAL INSTRUCTIONS:
-                1. Use facts from the SCENARIO to fill the template.
-                2. **DO NOT INVENT FACTS:** If a specific detail (like Advocate Name, Father's Name, or Date) is NOT in the scenario, you MUST leave the placeholder exactly as it is (e.g., keep [ADVOCATE_NAME] or [DATE]).
-                3. Do NOT use generic names like "Rajesh Kumar" or "John Doe" unless explicitly stated in the scenario.
-                4. Return ONLY the final document text.
-                """
-                
-                # Use your existing _safe_generate helper
-                response = await run_in_threadpool(self._safe_generate, drafting_prompt)
-                
-                # Extract text safely
-                result_text = getattr(response, "text", "").strip()
-                if result_text:
-                    return result_text
-                else:
-                    logger.warning("⚠️ Template generation returned empty text. Falling back to scratch.")
+                template = self.template_store.get(final_template_key)
+                if template is None:
+                    raise KeyError(f"Template '{final_template_key}' was removed")
+
+                # 3a. Deterministic pass: substitute everything we already know
+                start_time = time.time()
+                result = fill_template(template.text, flatten_facts(facts))
+                logger.info(
+                    f"Template '{final_template_key}': {len(result.filled)} placeholders filled from facts, "
+                    f"{len(result.missing)} left for the LLM."
+                )
+
+                # 3b. LLM only for the gaps (placeholders it can't support stay as-is). If that
+                # call fails, the deterministic fill is still a usable draft: return it with gaps.
+                drafted_text = result.text
+                if result.missing:
+                    try:
+                        gap_values = await self._fill_template_gaps(scenario, template.text, result.missing, result.hints)
+                    except Exception as e:
+                        logger.warning(
+                            f"⚠️ Gap filling failed ({e}); returning '{final_template_key}' with "
+                            f"{len(result.missing)} placeholders left open."
+                        )
+                        gap_values = {}
+                    drafted_text = apply_values(drafted_text, gap_values)
+                    logger.info(f"LLM filled {len(gap_values)}/{len(result.missing)} remaining placeholders.")
+                logger.info(f"Template draft completed in {time.time() - start_time:.2f}s")
+                return drafted_text.strip()
 
         except Exception as e:
             logger.warning(f"⚠️ Template drafting failed ({e}). Falling back to scratch drafting.")
@@ -573,8 +1214,7 @@ class QueryEngine:
         )
 
         try:
-            # We use run_in_threadpool + _safe_generate because we are using Google GenAI directly
-            response = await run_in_threadpool(self._safe_generate, drafting_prompt)
+            response = await self._agenerate(drafting_prompt, Priority.BULK, "draft_general")
             
             result = getattr(response, "text", "Error: Could not generate document.")
             return result.strip()
@@ -583,46 +1223,18 @@ class QueryEngine:
             logger.error(f"❌ Scratch drafting failed: {e}")
             return f"Error: Could not generate document. Reason: {str(e)}"
         
-    def _get_text_from_image_sync(self, file_content: bytes) -> str:
-        """
-        [Sync Helper] Sends image content to Google Cloud Vision API for OCR.
-        This is a blocking I/O call and must be run in a thread.
-        """
-        try:
-            # This automatically finds the GOOGLE_APPLICATION_CREDENTIALS
-            # environment variable you set in your .env file.
-            client = vision.ImageAnnotatorClient()
-            
-            image = vision.Image(content=file_content)
-            
-            logger.info("Sending request to Google Cloud Vision API...")
-            # Perform text detection (OCR)
-            response = client.document_text_detection(image=image)
-            
-            if response.error.message:
-                logger.error(f"Cloud Vision API error: {response.error.message}")
-                raise Exception(response.error.message)
-                
-            return response.full_text_annotation.text
-        
-        except Exception as e:
-            logger.error(f"Google Cloud Vision API failed: {e}", exc_info=True)
-            # Re-raise the exception to be caught by the async wrapper
-            raise
-
-    async def get_text_from_image(self, file_content: bytes) -> str:
+    async def get_text_from_image(self, file_content: ExtractionSource) -> str:
         """
         [Async Wrapper] Asynchronously extracts text from image bytes using OCR.
+        Routed through the shared extraction service (pooled Vision client + cache).
         """
         logger.info("Extracting text from uploaded file via OCR...")
         try:
-            # Run the blocking I/O call in a separate thread
-            extracted_text = await run_in_threadpool(
-                self._get_text_from_image_sync, file_content
-            )
+            extracted_text = await extraction_service.ocr_image(file_content)
             logger.info(f"Successfully extracted {len(extracted_text)} characters.")
             return extracted_text
         except Exception as e:
+            logger.error(f"Google Cloud Vision API failed: {e}", exc_info=True)
             # Return a specific error message
             return f"Error: Could not extract text from file. The API reported: {e}"
 
@@ -651,8 +1263,7 @@ class QueryEngine:
 
         # 2. Call the LLM (non-blocking)
         try:
-            # Use run_in_threadpool for the synchronous _safe_generate call
-            response = await run_in_threadpool(self._safe_generate, prompt)
+            response = await self._agenerate(prompt, Priority.INTERACTIVE, "document_qa")
             
             answer = getattr(response, "text", "Error: Failed to generate an answer.")
             return answer.strip()
@@ -700,8 +1311,7 @@ class QueryEngine:
         """
 
         try:
-            # Re-using the threadpool wrapper for safety
-            response = await run_in_threadpool(self._safe_generate, prompt)
+            response = await self._agenerate(prompt, Priority.INTERACTIVE, "case_analysis")
             
             # Extract text
             analysis_text = getattr(response, "text", "{}")
@@ -0,0 +1,169 @@
+# src/routes/admin_routes.py
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import uuid4
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+from src.config import DATA_DIR, settings
+from src.security import require_admin
+from src.services.extraction_service import extraction_service
+from src.services.llm_scheduler import llm_scheduler
+from src.utils.profiling import profile_store
+from src.utils.upload_utils import StreamedForm, multipart_form, multipart_openapi
+
+logger = logging.getLogger(__name__)
+
+# Every route here requires the X-Admin-Key header
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+# Corpus folders an admin may add documents to (under data/raw)
+CORPUS_FOLDERS = ["Legal_Corpus", "Procedural_Guides"]
+INGESTIBLE_EXTENSIONS = (".pdf", ".txt")
+
+# In-memory status of background ingestion jobs (job_id -> status dict)
+ingestion_jobs: Dict[str, dict] = {}
+
+
+def _run_ingestion(query_engine, job_id: str, file_path: str, category: Optional[str], keywords: list):
+    """Background task (runs in the threadpool): ingest one document into the live collection."""
+    job = ingestion_jobs[job_id]
+    job["status"] = "running"
+    try:
+        result = query_engine.ingest_document(file_path, category=category, keywords=keywords)
+        job.update(status="completed", **result)
+    except Exception as e:
+        logger.error(f"Ingestion job {job_id} failed: {e}", exc_info=True)
+        job.update(status="failed", error=str(e))
+    job["finished_at"] = datetime.utcnow().isoformat()
+
+
+# --- 1. INGEST A DOCUMENT ---
+@router.post(
+    "/ingest",
+    status_code=202,
+    openapi_extra=multipart_openapi(["file"], file="file", folder="string", category="string", keywords="string"),
+)
+async def ingest_document(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    form: StreamedForm = Depends(multipart_form),
+):
+    """
+    Adds a new Act or procedural guide to the live RAG corpus.
+    The file is saved under data/raw/<folder> (so future full rebuilds include it),
+    then extracted, chunked, embedded and upserted in the background.
+    `category` registers it with the smart filter; `keywords` is a comma-separated list
+    for the fallback keyword classifier.
+    """
+    file = form.file("file")
+    folder = form.field("folder", "Legal_Corpus")
+    category = form.field("category")
+    keywords = form.field("keywords")
+
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is None:
+        raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
+
+    if folder not in CORPUS_FOLDERS:
+        raise HTTPException(status_code=400, detail=f"folder must be one of {CORPUS_FOLDERS}")
+    filename = os.path.basename(file.filename or "")
+    if not filename.lower().endswith(INGESTIBLE_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only .pdf and .txt documents can be ingested.")
+
+    # Save the document into the corpus folder
+    target_dir = os.path.join(DATA_DIR, "raw", folder)
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, filename)
+    # Moves the temp file spooled while streaming (no second copy of the body)
+    await run_in_threadpool(file.save_to, target_path)
+
+    job_id = str(uuid4())
+    ingestion_jobs[job_id] = {
+        "job_id": job_id,
+        "filename": filename,
+        "status": "queued",
+        "submitted_at": datetime.utcnow().isoformat(),
+    }
+    keyword_list = [kw.strip() for kw in (keywords or "").split(",") if kw.strip()]
+    background_tasks.add_task(_run_ingestion, query_engine, job_id, target_path, category, keyword_list)
+
+    logger.info(f"📥 Queued ingestion job {job_id} for {folder}/{filename}")
+    return ingestion_jobs[job_id]
+
+
+# --- 2. INGESTION STATUS ---
+@router.get("/ingest/{job_id}")
+async def get_ingestion_status(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# --- 3. CURRENT SMART-FILTER CATEGORIES ---
+@router.get("/categories")
+async def get_categories(request: Request):
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is None:
+        raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
+    return {
+        "document_map": query_engine.document_map,
+        "keyword_map": query_engine.keyword_map,
+    }
+
+
+# --- 4. LLM SCHEDULER METRICS ---
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_stats():
+    """Queue depth, in-flight Gemini calls, retries, queue-wait percentiles and single-flight sharing."""
+    return llm_scheduler.stats()
+
+
+# --- 5. SINGLE-FLIGHT COALESCING ---
+@router.get("/single-flight")
+async def get_single_flight_stats(request: Request):
+    """How many identical in-flight calls were coalesced, per stage."""
+    stats = {
+        "llm": llm_scheduler.flight.stats(),
+        "ocr": extraction_service.flight.stats(),
+    }
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is not None:
+        stats["smart_filter"] = query_engine._filter_flight.stats()
+        stats["template_classify"] = query_engine._template_flight.stats()
+    return stats
+
+
+# --- 6. QUERY PLANNER ---
+@router.get("/query-planner")
+async def get_query_planner_stats(request: Request):
+    """How queries were planned (local / one LLM call / fallback), LLM round trips saved and speculation hit rate."""
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is None:
+        raise HTTPException(status_code=503, detail="AI Engine is currently unavailable.")
+    speculation = dict(query_engine.speculation_stats)
+    resolved = speculation["speculated"] - speculation["unused"]
+    hits = speculation["hit_unfiltered"] + speculation["hit_category"] + speculation["hit_subset"]
+    speculation["hit_rate"] = round(hits / resolved, 3) if resolved else None
+    return {"planner": query_engine.planner_stats, "speculation": speculation}
+
+
+# --- 7. REQUEST PROFILES (see PROFILING_ENABLED) ---
+@router.get("/profiles")
+async def list_profiles():
+    """Saved request profiles, newest first."""
+    return {"enabled": settings.PROFILING_ENABLED, "profiles": profile_store.list()}
+
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str):
+    """Downloads one profile (speedscope JSON; open it at https://www.speedscope.app)."""
+    path = profile_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="application/json", filename=name)
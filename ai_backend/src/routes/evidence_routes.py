@@ -1,23 +1,50 @@
 # src/routes/evidence_routes.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import List
 from bson import ObjectId
 from src.database import cases_collection
 from src.utils.text_extractor import extract_text_from_file 
+from src.services.extraction_service import extraction_service, OcrResult, IMAGE_CONTENT_TYPES
+from src.utils.upload_utils import StreamedForm, multipart_form, multipart_openapi
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+async def _index_evidence(request: Request, case_id: str, evidence: List[dict], texts: List[str]):
+    """
+    Embeds the FULL extracted text of new evidence into the case's vector index
+    (the MongoDB copy is truncated), so /ask can retrieve the relevant passages.
+    """
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is None:
+        logger.warning("Query Engine unavailable; evidence stored but not indexed.")
+        return
+    for item, text in zip(evidence, texts):
+        try:
+            await run_in_threadpool(query_engine.index_evidence, case_id, item["id"], item["filename"], text)
+        except Exception as e:
+            logger.error(f"Failed to index evidence {item['id']} for case {case_id}: {e}")
+
+
 # --- 1. UPLOAD EVIDENCE ---
-@router.post("/cases/{case_id}/evidence")
-async def upload_evidence(case_id: str, file: UploadFile = File(...)):
+@router.post("/cases/{case_id}/evidence", openapi_extra=multipart_openapi(["file"], file="file"))
+async def upload_evidence(case_id: str, request: Request, form: StreamedForm = Depends(multipart_form)):
     if not ObjectId.is_valid(case_id):
         raise HTTPException(status_code=400, detail="Invalid case ID")
 
-    # Read file bytes
-    file_content = await file.read()
+    # The file was spooled and hashed while the body streamed in (413 if too large)
+    file = form.file("file")
     
     # Extract text using the utility
-    content_text = await extract_text_from_file(file_content, file.content_type, file.filename)
+    try:
+        content_text = await extract_text_from_file(file, file.content_type, file.filename)
+    finally:
+        file.close()
 
     new_evidence = {
         "id": str(ObjectId()),
@@ -36,8 +63,69 @@ async def upload_evidence(case_id: str, file: UploadFile = File(...)):
     if update_result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Case not found")
 
+    await _index_evidence(request, case_id, [new_evidence], [content_text])
+
     return {"message": "Evidence uploaded", "evidence": new_evidence}
 
+# --- 1b. UPLOAD MULTIPLE EVIDENCE FILES (NEW) ---
+@router.post("/cases/{case_id}/evidence/batch", openapi_extra=multipart_openapi(["files"], files="files"))
+async def upload_evidence_batch(case_id: str, request: Request, form: StreamedForm = Depends(multipart_form)):
+    """
+    Uploads several files at once. All images are OCR'd in a single batched
+    Vision request instead of one round trip per photo.
+    """
+    if not ObjectId.is_valid(case_id):
+        raise HTTPException(status_code=400, detail="Invalid case ID")
+
+    files = form.file_list("files")
+    try:
+        texts = [""] * len(files)
+
+        # Images -> one batched OCR call
+        image_indexes = [i for i, file in enumerate(files) if file.content_type in IMAGE_CONTENT_TYPES]
+        if image_indexes:
+            try:
+                ocr_results = await extraction_service.ocr_images([files[i] for i in image_indexes])
+            except Exception as e:
+                logger.error(f"Batched OCR failed for case {case_id}: {e}")
+                ocr_results = [OcrResult(error=str(e))] * len(image_indexes)
+            for i, result in zip(image_indexes, ocr_results):
+                if result.error:
+                    logger.warning(f"OCR failed for '{files[i].filename}' (case {case_id}): {result.error}")
+                    texts[i] = "[OCR Analysis failed for this image]"
+                else:
+                    texts[i] = result.text or "[OCR Analysis returned no text]"
+
+        # Everything else -> regular extractor
+        for i, file in enumerate(files):
+            if i not in image_indexes:
+                texts[i] = await extract_text_from_file(file, file.content_type, file.filename)
+    finally:
+        form.close()
+
+    new_evidence = [
+        {
+            "id": str(ObjectId()),
+            "filename": file.filename,
+            "content_type": file.content_type,
+            "extracted_text": text[:8000], # Limit per file to save DB space
+            "uploaded_at": datetime.utcnow().isoformat()
+        }
+        for file, text in zip(files, texts)
+    ]
+
+    update_result = await cases_collection.update_one(
+        {"_id": ObjectId(case_id)},
+        {"$push": {"evidence": {"$each": new_evidence}}}
+    )
+
+    if update_result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    await _index_evidence(request, case_id, new_evidence, texts)
+
+    return {"message": f"{len(new_evidence)} evidence files uploaded", "evidence": new_evidence}
+
 # --- 2. FETCH EVIDENCE ---
 @router.get("/cases/{case_id}/evidence")
 async def get_evidence(case_id: str):
@@ -52,7 +140,7 @@ async def get_evidence(case_id: str):
 
 # --- 3. DELETE EVIDENCE (NEW) ---
 @router.delete("/cases/{case_id}/evidence/{evidence_id}")
-async def delete_evidence(case_id: str, evidence_id: str):
+async def delete_evidence(case_id: str, evidence_id: str, request: Request):
     """
     Removes a specific file/evidence from the case's evidence list.
     """
@@ -70,4 +158,12 @@ async def delete_evidence(case_id: str, evidence_id: str):
         # OR the specific evidence_id wasn't found in that case.
         raise HTTPException(status_code=404, detail="Evidence not found or Case ID incorrect")
 
+    # Drop the file's passages from the case's vector index too
+    query_engine = getattr(request.app.state, "query_engine", None)
+    if query_engine is not None:
+        try:
+            await run_in_threadpool(query_engine.remove_evidence, case_id, evidence_id)
+        except Exception as e:
+            logger.error(f"Failed to remove evidence vectors for {evidence_id}: {e}")
+
     return {"message": "Evidence deleted successfully"}
\ No newline at end of file
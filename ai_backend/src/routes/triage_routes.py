@@ -5,6 +5,7 @@ import google.generativeai as genai
 import json
 import os
 from src.config import settings
+from src.services.llm_scheduler import llm_scheduler, Priority
 
 router = APIRouter()
 
@@ -13,6 +14,10 @@ router = APIRouter()
 if settings.GOOGLE_API_KEY:
     genai.configure(api_key=settings.GOOGLE_API_KEY)
 
+# 2. Use a specific, known-working model name (created once, reused by every request)
+TRIAGE_MODEL_NAME = "gemini-2.0-flash"
+triage_model = genai.GenerativeModel(TRIAGE_MODEL_NAME)
+
 class TriageRequest(BaseModel):
     description: str
 
@@ -26,10 +31,6 @@ async def classify_case(request: TriageRequest):
     if not settings.GOOGLE_API_KEY:
         raise HTTPException(status_code=500, detail="Server Error: API Key missing in settings")
 
-    # 2. Use a specific, known-working model name
-    # "gemini-1.5-pro" is usually the most stable standard model
-    target_model = "gemini-2.0-flash" 
-    
     prompt = f"""
     You are a legal intake assistant for the Republic of India (Indian Penal Code, Civil Procedure Code).
     Analyze this user situation: "{request.description}"
@@ -49,8 +50,8 @@ async def classify_case(request: TriageRequest):
     """
     
     try:
-        model = genai.GenerativeModel(target_model)
-        response = model.generate_content(prompt)
+        # Queued behind interactive chat by the shared LLM scheduler (non-blocking)
+        response = await llm_scheduler.generate(triage_model, prompt, priority=Priority.CLASSIFICATION, purpose="triage")
         
         # Clean response
         clean_text = response.text.replace("```json", "").replace("```", "").strip()
@@ -1,6 +1,8 @@
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt  # <--- WE ARE USING PyJWT ONLY
+from fastapi import Header, HTTPException
 from .config import settings
 import bcrypt # <--- 1. Import bcrypt directly
 
@@ -42,4 +44,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     
     # Use the jwt library to encode
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+# 3. Admin Guard (for /admin/* routes)
+def is_admin_key(x_admin_key: Optional[str]) -> bool:
+    """True only if admin access is configured and the key matches (constant-time compare)."""
+    return bool(settings.ADMIN_API_KEY and x_admin_key and hmac.compare_digest(x_admin_key, settings.ADMIN_API_KEY))
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """FastAPI dependency: only lets requests with the configured X-Admin-Key through."""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled (ADMIN_API_KEY not set).")
+    if not is_admin_key(x_admin_key):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
@@ -2,6 +2,7 @@
 import google.generativeai as genai
 import json
 from src.config import settings
+from src.services.llm_scheduler import llm_scheduler, Priority
 
 class DraftingService:
     def __init__(self):
@@ -11,6 +12,7 @@ class DraftingService:
         
         # 2. Use the smart model (Gemini 2.0 Flash)
         self.model_name = "gemini-2.0-flash"
+        self.model = genai.GenerativeModel(self.model_name)
 
     async def generate_structured_case(self, user_input: str, category: str, jurisdiction: dict):
         """
@@ -49,11 +51,8 @@ class DraftingService:
         """
 
         try:
-            # 4. Call Gemini
-            model = genai.GenerativeModel(self.model_name)
-            
-            # Request the content
-            response = model.generate_content(prompt)
+            # 4. Call Gemini (bulk priority: yields to chat and classification under quota pressure)
+            response = await llm_scheduler.generate(self.model, prompt, priority=Priority.BULK, purpose="structured_case")
 
             # 5. Clean the response
             # Sometimes AI wraps JSON in ```json ... ``` blocks. We remove them.
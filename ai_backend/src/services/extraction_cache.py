@@ -0,0 +1,185 @@
+# src/services/extraction_cache.py
+import os
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import settings, EXTRACTION_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# --- Extractor identities (part of the cache key) ---
+# Bump the version whenever the extractor's output could change for the same bytes.
+VISION_OCR_BACKEND = "google-vision"
+VISION_OCR_VERSION = "document_text_detection-1"
+
+
+class ExtractionCache:
+    """
+    Disk-backed cache of OCR / text-extraction results.
+
+    Entries are keyed by (sha256 of the uploaded bytes, extractor backend, extractor version),
+    so the same FIR photo uploaded in triage and again as evidence is only OCR'd once.
+    When the cache grows past its size cap, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # path -> (last access time, size in bytes)
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._scan()
+            except Exception as e:
+                logger.error(f"Failed to initialize extraction cache at {self.cache_dir}: {e}")
+                self.enabled = False
+
+    # --- Key Helpers ---
+    @staticmethod
+    def hash_bytes(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def make_key(content_sha256: str, backend: str, version: str) -> str:
+        return hashlib.sha256(f"{content_sha256}:{backend}:{version}".encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def _scan(self):
+        """Builds the in-memory size index from whatever is already on disk."""
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if not filename.endswith(".txt"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self._entries[path] = (stat.st_mtime, stat.st_size)
+                self._total_bytes += stat.st_size
+        logger.info(
+            f"Extraction cache ready: {len(self._entries)} entries, "
+            f"{self._total_bytes / (1024 * 1024):.1f} MB at {self.cache_dir}"
+        )
+
+    # --- Public API (blocking; call from a worker thread) ---
+    def get(self, content_sha256: str, backend: str, version: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self._path_for(self.make_key(content_sha256, backend, version))
+        with self._lock:
+            if path not in self._entries:
+                self.misses += 1
+                return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget_locked(path)
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            if path in self._entries:
+                self._entries[path] = (now, self._entries[path][1])
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return text
+
+    def put(self, content_sha256: str, backend: str, version: str, text: str):
+        if not self.enabled or not text:
+            return
+        path = self._path_for(self.make_key(content_sha256, backend, version))
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write extraction cache entry: {e}")
+            return
+
+        with self._lock:
+            self._forget_locked(path)
+            self._entries[path] = (time.time(), len(data))
+            self._total_bytes += len(data)
+            self._evict_locked()
+
+    def get_or_compute(
+        self,
+        content: Any,
+        backend: str,
+        version: str,
+        compute: Callable[[Any], str],
+        content_sha256: Optional[str] = None,
+    ) -> str:
+        """
+        Returns the cached text for this content, or runs `compute(content)` and caches
+        a non-empty result. Errors raised by `compute` propagate and are never cached.
+        Pass `content_sha256` when the hash is already known (e.g. computed while
+        streaming an upload); `content` is then only handed to `compute` on a miss.
+        """
+        content_sha256 = content_sha256 or self.hash_bytes(content)
+        cached = self.get(content_sha256, backend, version)
+        if cached is not None:
+            logger.info(f"Extraction cache hit ({backend}, sha256={content_sha256[:12]})")
+            return cached
+
+        text = compute(content)
+        if text:
+            self.put(content_sha256, backend, version, text)
+        return text
+
+    # --- Eviction ---
+    def _forget_locked(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry:
+            self._total_bytes -= entry[1]
+
+    def _evict_locked(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        evicted = 0
+        for path, _ in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict extraction cache entry {path}: {e}")
+                continue
+            self._forget_locked(path)
+            evicted += 1
+        if evicted:
+            logger.info(f"Extraction cache evicted {evicted} entries (now {self._total_bytes} bytes).")
+
+
+# Create a singleton instance shared by every extraction entry point
+extraction_cache = ExtractionCache(
+    cache_dir=EXTRACTION_CACHE_PATH,
+    max_bytes=settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+    enabled=settings.EXTRACTION_CACHE_ENABLED,
+)
@@ -0,0 +1,465 @@
+# src/services/extraction_service.py
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple, Union
+
+from google.cloud import vision
+from starlette.concurrency import run_in_threadpool
+
+from src.config import settings
+from src.services.extraction_cache import extraction_cache, VISION_OCR_BACKEND, VISION_OCR_VERSION
+from src.services import tesseract_ocr, pdf_text
+from src.utils.upload_utils import SpooledUpload
+from src.utils.singleflight import SingleFlight, make_key
+from src.utils.metrics import OCR_DURATION
+from src.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+PDF_TEXT_BACKEND = "pymupdf"
+PDF_TEXT_VERSION = pdf_text.PYMUPDF_VERSION
+
+IMAGE_CONTENT_TYPES = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
+
+OCR_BACKENDS = ("vision", "tesseract", "auto")
+TESSERACT_OCR_BACKEND = "tesseract"
+AUTO_OCR_BACKEND = "auto"
+
+# Bracketed notes returned (or stored) in place of text when nothing could be extracted
+PLACEHOLDER_PREFIXES = (
+    "[PDF too large",
+    "[Scanned PDF",
+    "[Error reading PDF",
+    "[OCR Analysis",
+    "[Unsupported file type",
+)
+
+# Extractors accept raw bytes or a streamed upload (hash already computed, maybe on disk)
+ExtractionSource = Union[bytes, SpooledUpload]
+
+
+@dataclass
+class OcrResult:
+    """Outcome of one image in a batch: its text, or the error that image alone failed with."""
+    text: str = ""
+    error: Optional[str] = None
+
+
+def is_placeholder_text(text: Optional[str]) -> bool:
+    """True if an extraction result is empty or one of the placeholder notes above, not document text."""
+    text = (text or "").strip()
+    return not text or (text.startswith(PLACEHOLDER_PREFIXES) and text.endswith("]"))
+
+
+def _as_bytes(source: ExtractionSource) -> bytes:
+    return source.read_bytes() if isinstance(source, SpooledUpload) else source
+
+
+def _sha256(source: ExtractionSource) -> str:
+    return source.sha256 if isinstance(source, SpooledUpload) else extraction_cache.hash_bytes(source)
+
+
+def _size(source: ExtractionSource) -> int:
+    return source.size if isinstance(source, SpooledUpload) else len(source)
+
+
+def _pdf_source(source: ExtractionSource) -> pdf_text.PdfSource:
+    # Uploads are opened from disk, so worker processes are sent a path, not the bytes
+    return source.as_path() if isinstance(source, SpooledUpload) else source
+
+
+class ExtractionService:
+    """
+    Single home for all text extraction (OCR + PDF + plain text).
+    All blocking work runs off the event loop; large PDFs are split into page ranges
+    that are extracted in parallel by the worker process pool.
+
+    Holds one long-lived, thread-safe Vision client (one gRPC channel and auth handshake
+    for the whole process), batches multi-image uploads into a single
+    `batch_annotate_images` request, and caps concurrent Vision calls.
+
+    OCR_BACKEND selects the engine: "vision", "tesseract" (offline, in a bounded process
+    pool with per-page parallelism) or "auto" (Tesseract for small images, Vision only
+    when Tesseract's confidence is low).
+    """
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[], "vision.ImageAnnotatorClient"]] = None,
+        backend: Optional[str] = None,
+    ):
+        self._client_factory = client_factory or self._default_client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, settings.OCR_MAX_CONCURRENCY))
+        self._batch_size = max(1, min(settings.VISION_BATCH_SIZE, 16))
+        # Concurrent OCR of identical bytes (double submits) shares one backend call
+        self.flight = SingleFlight("ocr")
+
+        self.backend = (backend or settings.OCR_BACKEND).lower()
+        if self.backend not in OCR_BACKENDS:
+            logger.warning(f"Unknown OCR_BACKEND '{self.backend}'. Falling back to 'vision'.")
+            self.backend = "vision"
+
+        # --- Worker process pool for Tesseract + large PDFs (created lazily) ---
+        self._process_workers = max(1, settings.OCR_PROCESS_WORKERS)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Bounds queued + running tasks so a burst of uploads can't pile up in the pool
+        self._pool_slots = threading.BoundedSemaphore(self._process_workers * 2)
+        self._tesseract_version: Optional[str] = None
+
+    # --- Client Management ---
+    @staticmethod
+    def _default_client_factory() -> "vision.ImageAnnotatorClient":
+        """
+        Builds the Vision client. `VISION_API_ENDPOINT` (+ `VISION_API_INSECURE`) points it
+        at a local fake gRPC server for testing.
+        """
+        endpoint = settings.VISION_API_ENDPOINT
+        if endpoint and settings.VISION_API_INSECURE:
+            import grpc
+            from google.auth.credentials import AnonymousCredentials
+            from google.cloud.vision_v1.services.image_annotator.transports import (
+                ImageAnnotatorGrpcTransport,
+            )
+
+            channel = grpc.insecure_channel(endpoint)
+            transport = ImageAnnotatorGrpcTransport(channel=channel, credentials=AnonymousCredentials())
+            return vision.ImageAnnotatorClient(transport=transport)
+        if endpoint:
+            return vision.ImageAnnotatorClient(client_options={"api_endpoint": endpoint})
+        # This automatically finds the GOOGLE_APPLICATION_CREDENTIALS environment variable.
+        return vision.ImageAnnotatorClient()
+
+    def _get_client(self) -> "vision.ImageAnnotatorClient":
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    logger.info("Creating shared Google Cloud Vision client...")
+                    self._client = self._client_factory()
+        return self._client
+
+    def reset_client(self):
+        """Drops the shared client (e.g. after credentials change, or between tests)."""
+        with self._client_lock:
+            self._client = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    logger.info(f"Starting extraction process pool ({self._process_workers} workers)...")
+                    self._pool = ProcessPoolExecutor(max_workers=self._process_workers)
+        return self._pool
+
+    def shutdown(self):
+        """Stops the worker processes (called on app shutdown)."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_tesseract_version(self) -> str:
+        if self._tesseract_version is None:
+            try:
+                version = tesseract_ocr.tesseract_version(settings.TESSERACT_CMD)
+            except Exception as e:
+                logger.warning(f"Could not read Tesseract version: {e}")
+                version = "unknown"
+            self._tesseract_version = f"{version}:{settings.TESSERACT_LANGS}"
+        return self._tesseract_version
+
+    # --- OCR (Blocking; run in a worker thread) ---
+    def _annotate_batch_sync(self, contents: List[bytes]) -> List[OcrResult]:
+        """
+        [Blocking] Sends up to `VISION_BATCH_SIZE` images in one batch_annotate_images call.
+        Raises if the whole request fails; a per-image error only marks that image's result.
+        """
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        requests = [
+            vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+            for content in contents
+        ]
+        with self._slots:
+            logger.info(f"Sending {len(requests)} image(s) to Google Cloud Vision API...")
+            started = time.perf_counter()
+            with tracing.span("vision.batch_annotate_images", kind="client", **{"ocr.images": len(requests)}):
+                response = self._get_client().batch_annotate_images(requests=requests)
+            OCR_DURATION.labels("vision").observe(time.perf_counter() - started)
+
+        results = []
+        for i, image_response in enumerate(response.responses):
+            if image_response.error.message:
+                logger.error(f"Cloud Vision API error (image {i + 1}/{len(requests)}): {image_response.error.message}")
+                results.append(OcrResult(error=image_response.error.message))
+            else:
+                results.append(OcrResult(text=image_response.full_text_annotation.text))
+        return results
+
+    def _annotate_sync(self, content: bytes) -> str:
+        """[Blocking] Vision OCR of one image. Raises on any error."""
+        result = self._annotate_batch_sync([content])[0]
+        if result.error:
+            raise Exception(result.error)
+        return result.text
+
+    def _tesseract_sync(self, content: bytes) -> Tuple[str, float]:
+        """
+        [Blocking] OCRs an image with Tesseract in the process pool, one task per page.
+        Returns (text, mean confidence across pages).
+        """
+        started = time.perf_counter()
+        pages = tesseract_ocr.split_pages(content)
+        futures = []
+        with tracing.span("ocr.tesseract", **{"ocr.pages": len(pages)}):
+            try:
+                for page in pages:
+                    futures.append(self._submit_to_pool(
+                        tesseract_ocr.ocr_page, page, settings.TESSERACT_LANGS, settings.TESSERACT_CMD
+                    ))
+                results = [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        texts = [text for text, _ in results]
+        confidences = [conf for _, conf in results if conf >= 0]
+        confidence = sum(confidences) / len(confidences) if confidences else -1.0
+        OCR_DURATION.labels("tesseract").observe(time.perf_counter() - started)
+        return "\n\n".join(texts), confidence
+
+    def _auto_sync(self, content: bytes) -> str:
+        """
+        [Blocking] Local OCR first for small images; Vision only if Tesseract is unsure.
+        """
+        try:
+            if tesseract_ocr.image_pixels(content) <= settings.OCR_AUTO_MAX_PIXELS:
+                text, confidence = self._tesseract_sync(content)
+                if text.strip() and confidence >= settings.OCR_AUTO_MIN_CONFIDENCE:
+                    logger.info(f"Auto OCR: Tesseract accepted (confidence {confidence:.1f}).")
+                    return text
+                logger.info(f"Auto OCR: Tesseract confidence {confidence:.1f} too low. Falling back to Vision.")
+        except Exception as e:
+            logger.warning(f"Auto OCR: Tesseract failed ({e}). Falling back to Vision.")
+        return self._annotate_sync(content)
+
+    def _backend_identity(self, backend: str) -> Tuple[str, str]:
+        """(cache backend name, cache version) for an OCR backend."""
+        if backend == "tesseract":
+            return TESSERACT_OCR_BACKEND, self._get_tesseract_version()
+        if backend == "auto":
+            return AUTO_OCR_BACKEND, (
+                f"{self._get_tesseract_version()}|{VISION_OCR_VERSION}|"
+                f"{settings.OCR_AUTO_MAX_PIXELS}|{settings.OCR_AUTO_MIN_CONFIDENCE}"
+            )
+        return VISION_OCR_BACKEND, VISION_OCR_VERSION
+
+    def _compute_ocr(self, backend: str, content: bytes) -> str:
+        if backend == "tesseract":
+            return self._tesseract_sync(content)[0]
+        if backend == "auto":
+            return self._auto_sync(content)
+        return self._annotate_sync(content)
+
+    def ocr_image_sync(
+        self, content: ExtractionSource, backend: Optional[str] = None, use_cache: bool = True
+    ) -> str:
+        """
+        [Blocking] OCRs one image, consulting the shared extraction cache first.
+        The bytes of a streamed upload are only read in on a cache miss.
+        """
+        backend = backend or self.backend
+        content_sha256 = _sha256(content)
+        if not use_cache:
+            return self.flight.do_sync(
+                make_key("ocr", content_sha256, backend, "nocache"),
+                lambda: self._compute_ocr(backend, _as_bytes(content)),
+            )
+        cache_backend, cache_version = self._backend_identity(backend)
+        # The same file uploaded twice at once is OCR'd once, then served from the cache
+        return self.flight.do_sync(
+            make_key("ocr", content_sha256, cache_backend, cache_version),
+            lambda: extraction_cache.get_or_compute(
+                content,
+                cache_backend,
+                cache_version,
+                lambda source: self._compute_ocr(backend, _as_bytes(source)),
+                content_sha256=content_sha256,
+            ),
+        )
+
+    def ocr_images_sync(self, contents: List[ExtractionSource]) -> List[OcrResult]:
+        """
+        [Blocking] OCRs many images, one OcrResult per image (an image that fails does not
+        fail the others). Cached images are served locally; with the Vision backend the
+        misses are grouped into as few batch_annotate_images requests as possible.
+        Raises only if a whole Vision request fails.
+        """
+        if self.backend != "vision":
+            results = []
+            for content in contents:
+                try:
+                    results.append(OcrResult(text=self.ocr_image_sync(content)))
+                except Exception as e:
+                    logger.error(f"OCR ({self.backend}) failed: {e}")
+                    results.append(OcrResult(error=str(e)))
+            return results
+
+        results: List[Optional[OcrResult]] = [None] * len(contents)
+        hashes = [_sha256(content) for content in contents]
+
+        misses = []
+        for i, content_sha256 in enumerate(hashes):
+            cached = extraction_cache.get(content_sha256, VISION_OCR_BACKEND, VISION_OCR_VERSION)
+            if cached is not None:
+                results[i] = OcrResult(text=cached)
+            else:
+                misses.append(i)
+
+        if misses:
+            logger.info(f"OCR batch: {len(contents) - len(misses)} cached, {len(misses)} to annotate.")
+        for start in range(0, len(misses), self._batch_size):
+            chunk = misses[start:start + self._batch_size]
+            annotated = self._annotate_batch_sync([_as_bytes(contents[i]) for i in chunk])
+            for i, result in zip(chunk, annotated):
+                results[i] = result
+                if not result.error:
+                    extraction_cache.put(hashes[i], VISION_OCR_BACKEND, VISION_OCR_VERSION, result.text or "")
+
+        return results
+
+    # --- PDF (Blocking) ---
+    def _submit_to_pool(self, fn, *args):
+        """Submits one task to the worker pool, waiting for a free slot first."""
+        self._pool_slots.acquire()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._pool_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._pool_slots.release())
+        return future
+
+    def _pymupdf_text_sync(self, source: pdf_text.PdfSource) -> str:
+        """
+        [Blocking] Extracts the embedded text layer of a PDF with PyMuPDF.
+        Documents with at least PDF_PARALLEL_MIN_PAGES pages are split into page ranges
+        extracted in parallel worker processes; the parts are joined once at the end.
+        """
+        n_pages = pdf_text.page_count(source)
+        limit = min(n_pages, settings.PDF_MAX_PAGES)
+
+        if limit < settings.PDF_PARALLEL_MIN_PAGES:
+            text = pdf_text.extract_page_range(source, 0, limit)
+        else:
+            ranges = pdf_text.split_ranges(limit, self._process_workers, settings.PDF_PAGES_PER_TASK)
+            logger.info(f"Extracting {limit} PDF pages in {len(ranges)} parallel ranges...")
+            futures = [
+                self._submit_to_pool(pdf_text.extract_page_range, source, start, stop)
+                for start, stop in ranges
+            ]
+            try:
+                text = "\n".join(future.result() for future in futures)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        if n_pages > limit:
+            text += f"\n[Truncated: extracted the first {limit} of {n_pages} pages]"
+        return text
+
+    def pdf_text_sync(self, file_content: ExtractionSource) -> str:
+        """[Blocking] PDF text via the extraction cache."""
+        return extraction_cache.get_or_compute(
+            file_content,
+            PDF_TEXT_BACKEND,
+            PDF_TEXT_VERSION,
+            lambda source: self._pymupdf_text_sync(_pdf_source(source)),
+            content_sha256=_sha256(file_content),
+        )
+
+    def pdf_file_text_sync(self, path: str) -> str:
+        """[Blocking] PDF text of a file on disk via the extraction cache (hashed in chunks, never read whole)."""
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return extraction_cache.get_or_compute(
+            path,
+            PDF_TEXT_BACKEND,
+            PDF_TEXT_VERSION,
+            self._pymupdf_text_sync,
+            content_sha256=hasher.hexdigest(),
+        )
+
+    # --- Async Entry Points ---
+    async def ocr_image(self, content: ExtractionSource) -> str:
+        """[Async] OCRs one image without blocking the event loop. Raises on API failure."""
+        return await run_in_threadpool(self.ocr_image_sync, content)
+
+    async def ocr_images(self, contents: List[ExtractionSource]) -> List[OcrResult]:
+        """[Async] OCRs several images via batched annotation. Raises if a whole request fails."""
+        return await run_in_threadpool(self.ocr_images_sync, contents)
+
+    async def extract_text_from_upload(self, upload: SpooledUpload) -> str:
+        """Extracts text from a streamed upload (see `src.utils.upload_utils.parse_multipart`)."""
+        return await self.extract_text_from_file(upload, upload.content_type, upload.filename)
+
+    async def extract_text_from_file(
+        self, file_content: ExtractionSource, content_type: str, filename: str
+    ) -> str:
+        """
+        Unified Extractor:
+        1. PDFs -> PyMuPDF (Local, Fast; parallel page ranges for large files)
+        2. Images -> OCR_BACKEND (Google Cloud Vision, Tesseract, or auto)
+        3. Text/JSON -> decoded as UTF-8
+        """
+        text = ""
+        content_type = content_type or ""
+        try:
+            # A. PDF Handling
+            if content_type == "application/pdf":
+                if _size(file_content) > settings.PDF_MAX_MB * 1024 * 1024:
+                    return f"[PDF too large - limit is {settings.PDF_MAX_MB} MB]"
+                try:
+                    # PyMuPDF parsing is CPU-bound: keep it off the event loop
+                    text = await run_in_threadpool(self.pdf_text_sync, file_content)
+
+                    # If PDF text is empty, it might be a scan.
+                    if not text.strip():
+                        text = "[Scanned PDF - Text extraction incomplete. Please upload as image for best results.]"
+                except Exception as e:
+                    text = f"[Error reading PDF: {e}]"
+
+            # B. Image Handling (OCR)
+            elif content_type in IMAGE_CONTENT_TYPES:
+                try:
+                    text = await self.ocr_image(file_content)
+                except Exception as e:
+                    logger.error(f"OCR ({self.backend}) failed: {e}")
+                    text = ""
+
+                if not text:
+                    text = "[OCR Analysis returned no text]"
+
+            # C. Plain Text
+            elif "text" in content_type or "json" in content_type:
+                text = _as_bytes(file_content).decode("utf-8")
+
+            else:
+                text = "[Unsupported file type]"
+
+        except Exception as e:
+            logger.error(f"Extraction Error ({filename}): {e}")
+            return ""
+
+        return text
+
+
+# Create a singleton instance shared by QueryEngine and the upload routes
+extraction_service = ExtractionService()
@@ -0,0 +1,311 @@
+# src/services/intent_router.py
+import re
+import math
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Labeled exemplars ---
+# "draft": the user wants a document produced now. "question": anything to answer (incl. how-to
+# questions that merely mention drafting words, e.g. "how do I prepare for a bail hearing", and
+# "what is a/an X" questions about a document type). Every document the chat can draft has both
+# imperative and question-form exemplars, so naming a document decides nothing on its own.
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "draft": [
+        "draft a legal notice for me",
+        "please draft a bail application",
+        "can you draft an affidavit",
+        "draft the plaint",
+        "generate a vakalatnama",
+        "generate the document",
+        "create a rental agreement contract",
+        "create a written statement for my case",
+        "make a legal notice",
+        "make a complaint letter for me",
+        "please make a vakalatnama",
+        "make an affidavit",
+        "prepare a bail application",
+        "prepare the affidavit for me",
+        "write a legal notice to my tenant",
+        "write me a cheque bounce notice",
+        "i need a document drafted",
+        "i want you to draft a reply",
+        "draft it now",
+        "now prepare the notice",
+        "send me a draft of the complaint",
+        "give me a draft",
+        "draft a vakalatnama",
+        "prepare a vakalatnama",
+        "write an affidavit for me",
+        "draft an affidavit",
+        "draft a bail application for my brother",
+        "write a bail petition",
+        "prepare a plaint for recovery of money",
+        "draft a written statement",
+        "prepare the written statement",
+        "draft a request for evidence",
+        "draft a rental agreement",
+        "write a loan agreement",
+        "draft a cheque bounce notice",
+        "i need a cheque bounce notice",
+        "i need a legal notice against him",
+        "create an rti application",
+        "write an rti application for me",
+        "file an rti application for me",
+        "please write a reply to the consumer complaint",
+        "draft a consumer complaint",
+        "prepare a debt recovery notice",
+        "draft a rent recovery notice for my tenant",
+        "prepare a superdari application",
+    ],
+    "question": [
+        "how do i prepare for a bail hearing",
+        "how to prepare for court",
+        "what should i prepare before filing a case",
+        "what documents do i need to prepare",
+        "what is section 138 of the negotiable instruments act",
+        "what is the punishment for theft",
+        "can i get bail for this offence",
+        "is a verbal agreement valid",
+        "how long does a consumer case take",
+        "what are my rights as a tenant",
+        "who should i contact first",
+        "explain the procedure to file an fir",
+        "what happens after a legal notice is sent",
+        "do i need a lawyer",
+        "how do i create a strong case",
+        "how can i make my landlord return the deposit",
+        "how do i make a complaint to the consumer court",
+        "how do i file a complaint",
+        "what does this clause mean",
+        "tell me about the rti act",
+        "what is the limitation period",
+        "what is a vakalatnama",
+        "explain a vakalatnama",
+        "what is an affidavit",
+        "explain what an affidavit is",
+        "what is a bail application",
+        "explain anticipatory bail",
+        "what is a plaint",
+        "what is a written statement",
+        "explain the written statement",
+        "what is a request for evidence",
+        "what is a contract",
+        "explain this agreement",
+        "what is a cheque bounce notice",
+        "what is a legal notice",
+        "explain the rti act",
+        "what is an rti application",
+        "what is a consumer complaint",
+        "how do i reply to a consumer complaint",
+        "what is superdari",
+        "hello",
+        "thank you",
+    ],
+}
+
+# Template keys the chat can draft (see SUPPORTED_TEMPLATES in main.py) -> exemplar phrasings.
+# "auto" collects documents that have no chat key (the sample templates, generic notices): those
+# are left to the engine's template selector rather than forced onto the nearest chat key.
+TEMPLATE_EXEMPLARS: Dict[str, List[str]] = {
+    "auto": [
+        "cheque bounce notice", "dishonoured cheque notice", "legal notice", "notice to my tenant",
+        "debt recovery notice", "rent recovery notice", "rti application", "right to information application",
+        "consumer complaint", "reply to the consumer complaint", "trader reply notice", "superdari application",
+        "release of seized vehicle", "complaint letter",
+    ],
+    "vakalatnama": ["vakalatnama", "vakalat nama", "authorize an advocate", "power for my lawyer to appear"],
+    "affidavit": ["affidavit", "sworn statement", "declaration on oath"],
+    "bail_application": ["bail application", "bail petition", "anticipatory bail", "get bail for my brother"],
+    "plaint": ["plaint", "civil suit", "file a suit for recovery", "suit against"],
+    "written_statement": ["written statement", "reply to the plaint", "defence statement"],
+    "rfe": ["request for evidence", "rfe", "ask for evidence"],
+    "contract": ["contract", "agreement", "rental agreement", "loan agreement", "sale deed"],
+}
+
+# Ignored when matching template names: they say *that* a document is wanted, not *which* one
+TEMPLATE_STOPWORDS = {
+    "a", "an", "the", "for", "my", "me", "to", "of", "and", "i", "please", "can", "you", "it", "this",
+    "draft", "make", "create", "generate", "prepare", "write", "need", "want", "legal", "document",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def _features(text: str, stopwords: frozenset = frozenset()) -> Counter:
+    """Word unigrams and bigrams."""
+    tokens = [token for token in _TOKEN_RE.findall(text.lower()) if token not in stopwords]
+    grams = Counter(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return grams
+
+
+class _NearestExemplar:
+    """TF-IDF over word n-grams; a label's score is its best cosine similarity to any of its exemplars."""
+
+    # Softmax temperature for intent probabilities (TF-IDF cosines spread over 0..1)
+    temperature = 0.1
+
+    def __init__(self, exemplars: Dict[str, List[str]], stopwords: frozenset = frozenset()):
+        self.stopwords = stopwords
+        documents = [(label, _features(text, stopwords)) for label, texts in exemplars.items() for text in texts]
+        document_frequency = Counter(gram for _, grams in documents for gram in grams)
+        n_documents = len(documents)
+        self.idf = {gram: math.log((1 + n_documents) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        self.labels = list(exemplars)
+        self.vectors: List[Tuple[str, Dict[str, float]]] = [(label, self._vector(grams)) for label, grams in documents]
+
+    def _vector(self, grams: Counter) -> Dict[str, float]:
+        # Unknown n-grams carry no signal (no exemplar shares them), so they are dropped
+        vector = {gram: (1 + math.log(count)) * self.idf[gram] for gram, count in grams.items() if gram in self.idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {gram: v / norm for gram, v in vector.items()}
+
+    def scores(self, text: str) -> Dict[str, float]:
+        query = self._vector(_features(text, self.stopwords))
+        best = {label: 0.0 for label in self.labels}
+        for label, vector in self.vectors:
+            small, large = (query, vector) if len(query) < len(vector) else (vector, query)
+            score = sum(weight * large.get(gram, 0.0) for gram, weight in small.items())
+            if score > best[label]:
+                best[label] = score
+        return best
+
+
+class _EmbeddedExemplars:
+    """
+    Same contract as _NearestExemplar, scored by cosine similarity of sentence embeddings
+    (the QueryEngine's MiniLM), so paraphrases match without sharing words with an exemplar.
+    """
+
+    # Sentence-embedding cosines of related short texts sit much closer together
+    temperature = 0.05
+
+    def __init__(self, embedder, exemplars: Dict[str, List[str]], stopwords: frozenset = frozenset()):
+        self.embedder = embedder
+        self.stopwords = stopwords
+        self.labels = list(exemplars)
+        texts = [text for texts in exemplars.values() for text in texts]
+        self.owners = np.array([i for i, texts in enumerate(exemplars.values()) for _ in texts])
+        self.matrix = self._encode(texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # Stopwords are dropped as in _NearestExemplar ("prepare a vakalatnama" -> "vakalatnama")
+        texts = [" ".join(t for t in _TOKEN_RE.findall(text.lower()) if t not in self.stopwords) for text in texts]
+        return np.asarray(self.embedder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        similarities = self.matrix @ self._encode([text])[0]
+        return {label: float(similarities[self.owners == i].max()) for i, label in enumerate(self.labels)}
+
+
+@dataclass
+class RoutedIntent:
+    intent: str
+    confidence: float
+    template_key: str  # a TEMPLATE_EXEMPLARS key, or "auto" when no specific template was recognised
+    template_confidence: float
+    latency_ms: float
+
+
+class IntentRouter:
+    """
+    Local chat intent router (no LLM calls). Decides draft vs question, and for drafts which
+    template the user named. Scores with word n-gram TF-IDF (well under 1 ms); `use_embedder`
+    opts in to sentence-embedding scoring (a few ms per message on CPU, see
+    INTENT_ROUTER_EMBEDDINGS), with TF-IDF as the fallback if the embedder fails.
+    """
+
+    def __init__(
+        self,
+        intent_exemplars: Optional[Dict[str, List[str]]] = None,
+        template_exemplars: Optional[Dict[str, List[str]]] = None,
+        min_draft_confidence: float = 0.6,
+        min_template_score: float = 0.3,
+        min_embedded_template_score: float = 0.6,
+        template_margin: float = 0.05,
+    ):
+        self.intent_exemplars = intent_exemplars or INTENT_EXEMPLARS
+        self.template_exemplars = template_exemplars or TEMPLATE_EXEMPLARS
+        self._intents = _NearestExemplar(self.intent_exemplars)
+        self._templates = _NearestExemplar(self.template_exemplars, frozenset(TEMPLATE_STOPWORDS))
+        self._embedded: Optional[Tuple[_EmbeddedExemplars, _EmbeddedExemplars]] = None
+        self.min_draft_confidence = min_draft_confidence
+        self.min_template_score = min_template_score
+        self.min_embedded_template_score = min_embedded_template_score
+        self.template_margin = template_margin
+
+    @property
+    def uses_embeddings(self) -> bool:
+        return self._embedded is not None
+
+    def use_embedder(self, embedder):
+        """[Blocking] Embeds the exemplars once; later `route` calls score with `embedder`."""
+        try:
+            self._embedded = (
+                _EmbeddedExemplars(embedder, self.intent_exemplars),
+                _EmbeddedExemplars(embedder, self.template_exemplars, frozenset(TEMPLATE_STOPWORDS)),
+            )
+            logger.info("🧭 Intent router using sentence embeddings.")
+        except Exception as e:
+            logger.warning(f"Intent router could not embed exemplars ({e}); staying on TF-IDF.")
+
+    @staticmethod
+    def _softmax(scores: Dict[str, float], temperature: float = 0.1) -> Dict[str, float]:
+        exps = {label: math.exp(score / temperature) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def _scorers(self, text: str):
+        """(intent scores, intent temperature, template scorer, minimum template score)."""
+        if self._embedded is not None:
+            intents, templates = self._embedded
+            try:
+                return intents.scores(text), intents.temperature, templates, self.min_embedded_template_score
+            except Exception as e:
+                logger.warning(f"Embedding intent routing failed ({e}); using TF-IDF.")
+        return self._intents.scores(text), self._intents.temperature, self._templates, self.min_template_score
+
+    def route(self, text: str) -> RoutedIntent:
+        """[Blocking] Routes one chat message."""
+        start = time.perf_counter()
+        intent_scores, temperature, templates, min_template_score = self._scorers(text)
+        probabilities = self._softmax(intent_scores, temperature)
+        intent = max(probabilities, key=probabilities.get)
+        confidence = probabilities[intent]
+        # Drafting is the expensive branch: only take it when the router is sure
+        if intent == "draft" and confidence < self.min_draft_confidence:
+            intent, confidence = "question", probabilities.get("question", 1 - confidence)
+
+        # Only a clear, specific match picks a chat template; anything weaker, close to a
+        # second key, or nearest to an "auto" document is left to the engine's selector
+        template_key, template_score = "auto", 0.0
+        if intent == "draft":
+            try:
+                template_scores = templates.scores(text)
+            except Exception as e:
+                logger.warning(f"Embedding template routing failed ({e}); using TF-IDF.")
+                template_scores, min_template_score = self._templates.scores(text), self.min_template_score
+            ranked = sorted(template_scores.items(), key=lambda item: item[1], reverse=True)
+            best, best_score = ranked[0]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if best_score >= min_template_score and best_score - runner_up >= self.template_margin:
+                template_key, template_score = best, best_score
+
+        return RoutedIntent(
+            intent=intent,
+            confidence=round(confidence, 4),
+            template_key=template_key,
+            template_confidence=round(template_score, 4),
+            latency_ms=(time.perf_counter() - start) * 1000,
+        )
+
+
+# Create a singleton instance used by the /chat endpoint
+intent_router = IntentRouter()
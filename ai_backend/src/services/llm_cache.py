@@ -0,0 +1,167 @@
+# src/services/llm_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Iterable, Optional
+
+from src.config import settings, LLM_CACHE_PATH
+from src.utils.singleflight import make_key
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """
+    Stand-in for a Gemini response served from the cache.
+    Exposes the attributes our call sites read: `.text` and `.candidates[0].content.parts[0].text`.
+    """
+
+    cached = True
+    usage_metadata = None
+
+    def __init__(self, text: str):
+        self.text = text
+        part = SimpleNamespace(text=text)
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[part]))]
+
+
+def response_text(response: Any) -> Optional[str]:
+    """Text of a Gemini response, or None if it has none (e.g. blocked by safety filters)."""
+    try:
+        return response.text
+    except Exception:
+        return None
+
+
+class LLMCache:
+    """
+    Persistent prompt -> response cache (SQLite), for LLM calls that are effectively pure
+    functions of their input: classification, triage, question re-framing.
+
+    Entries are keyed by (model name, sha256 of the prompt, generation config), expire after
+    `ttl_seconds` and are evicted least-recently-used beyond `max_entries`. Blocking; call it
+    from a worker thread.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, purposes: Iterable[str], enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.purposes = {p.strip() for p in purposes if p.strip()}
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts_since_prune = 0
+
+        if self.enabled:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, model TEXT, purpose TEXT,"
+                    " created REAL, accessed REAL, response TEXT)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed)")
+                self._prune()
+                logger.info(f"LLM cache ready at {self.path} (purposes: {sorted(self.purposes)})")
+            except Exception as e:
+                logger.error(f"Failed to initialize LLM cache at {self.path}: {e}")
+                self.enabled = False
+                self._conn = None
+
+    # --- Policy ---
+    def should_cache(self, purpose: str, override: Optional[bool] = None) -> bool:
+        """Call sites can force caching on/off; otherwise only the configured purposes are cached."""
+        if not self.enabled:
+            return False
+        if override is not None:
+            return override
+        return purpose in self.purposes
+
+    @staticmethod
+    def make_key(model_name: str, prompt: Any, generation_config: Any = None) -> str:
+        prompt_hash = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+        return make_key(model_name, prompt_hash, generation_config)
+
+    # --- Public API ---
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT created, response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[0] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return CachedResponse(row[1])
+
+    def put(self, key: str, model_name: str, purpose: str, text: Optional[str]):
+        if not self.enabled or not text:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, purpose, created, accessed, response)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, purpose, now, now, text),
+                )
+                self._puts_since_prune += 1
+                # Pruning is amortized: at most once per 1% of capacity written
+                if self._puts_since_prune >= max(100, self.max_entries // 100):
+                    self._prune_locked()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write LLM cache entry: {e}")
+
+    def clear(self):
+        if self.enabled:
+            with self._lock:
+                self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {"enabled": self.enabled, "entries": entries, "hits": self.hits, "misses": self.misses}
+
+    # --- Expiry / Eviction ---
+    def _prune(self):
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        self._puts_since_prune = 0
+        expired = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        evicted = 0
+        if overflow > 0:
+            evicted = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        if expired or evicted:
+            logger.info(f"LLM cache pruned {expired} expired and {evicted} least-recently-used entries.")
+
+
+# Create a singleton instance used by the LLM scheduler
+llm_cache = LLMCache(
+    path=LLM_CACHE_PATH,
+    ttl_seconds=settings.LLM_CACHE_TTL_HOURS * 3600,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    purposes=settings.LLM_CACHE_PURPOSES.split(","),
+    enabled=settings.LLM_CACHE_ENABLED,
+)
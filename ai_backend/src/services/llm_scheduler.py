@@ -0,0 +1,421 @@
+# src/services/llm_scheduler.py
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+import concurrent.futures
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import settings
+from src.services.llm_cache import llm_cache, response_text
+from src.utils.singleflight import SingleFlight, make_key
+from src.utils.metrics import LLM_CALL_DURATION, LLM_QUEUE_WAIT, LLM_RETRIES
+from src.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value = served first."""
+    INTERACTIVE = 0     # Chat answers, document Q&A, case analysis
+    CLASSIFICATION = 1  # Smart filter, template classification, triage
+    BULK = 2            # Document drafting
+
+
+# Errors worth retrying: quota (429), overload (503) and transient network/deadline failures
+RETRYABLE_MARKERS = ("429", "ResourceExhausted", "quota", "503", "Unavailable", "DeadlineExceeded", "504")
+
+
+def is_retryable(error: Exception) -> bool:
+    text = f"{type(error).__name__}: {error}"
+    return any(marker.lower() in text.lower() for marker in RETRYABLE_MARKERS)
+
+
+def estimate_tokens(prompt: Any) -> int:
+    """Rough token estimate (~4 characters per token) used for the tokens-per-minute budget."""
+    return max(1, len(str(prompt)) // 4)
+
+
+class _TokenBucket:
+    """Refills `per_minute` units evenly over a minute. Only used from the scheduler loop."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """Takes `amount` units; negative amounts refund. The balance may go negative (debt)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    fn: Callable[[], Any] = field(compare=False)
+    future: concurrent.futures.Future = field(compare=False)
+    context: contextvars.Context = field(compare=False)
+    est_tokens: int = field(compare=False, default=1)
+    purpose: str = field(compare=False, default="generate")
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """
+    One shared gate in front of every Gemini call.
+
+    Requests are queued by priority and released only when both the requests-per-minute
+    and tokens-per-minute budgets allow it. The blocking `generate_content` call runs on a
+    small dedicated executor, while queueing, rate limiting and retry backoff (exponential
+    with full jitter) are plain `asyncio.sleep`s on the scheduler's own event loop, so no
+    worker thread is ever parked waiting for quota.
+
+    Works from both worlds: `await scheduler.generate(...)` from async code,
+    `scheduler.generate_sync(...)` from code already running in a threadpool.
+    """
+
+    def __init__(
+        self,
+        rpm: int,
+        tpm: int,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        expected_output_tokens: int,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.expected_output_tokens = expected_output_tokens
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = 0
+        # Identical in-flight requests (double submits, popular questions) share one Gemini call
+        self.flight = SingleFlight("llm")
+
+        # Metrics (guarded by _stats_lock; read from request threads via stats())
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._retries = 0
+        self._rate_limited = 0
+        self._waits: Dict[str, deque] = {p.name: deque(maxlen=1000) for p in Priority}
+        self._max_wait: Dict[str, float] = {p.name: 0.0 for p in Priority}
+
+    # --- Lifecycle ---
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._queue = asyncio.PriorityQueue()
+                loop.create_task(self._dispatch())
+                ready.set()
+                loop.run_forever()
+
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="llm"
+            )
+            self._thread = threading.Thread(target=run, name="llm-scheduler", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            logger.info(
+                f"LLM scheduler started (rpm={self.rpm}, tpm={self.tpm}, concurrency={self.max_concurrency})"
+            )
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self._loop).result(timeout=5)
+            except Exception as e:
+                logger.warning(f"LLM scheduler did not stop cleanly: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._loop = self._thread = self._executor = self._queue = None
+
+    @staticmethod
+    async def _cancel_tasks():
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- Public API ---
+    def submit(
+        self,
+        fn: Callable[[], Any],
+        priority: Priority = Priority.INTERACTIVE,
+        est_tokens: int = 1,
+        purpose: str = "generate",
+    ) -> concurrent.futures.Future:
+        """
+        Queues a blocking LLM call and returns a Future for its result.
+        The caller's contextvars are captured here and restored around `fn`.
+        """
+        self._ensure_started()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        job = _Job(
+            priority=int(priority),
+            seq=seq,
+            fn=fn,
+            future=future,
+            context=contextvars.copy_context(),
+            est_tokens=est_tokens,
+            purpose=purpose,
+        )
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return future
+
+    @staticmethod
+    def _model_name(model) -> str:
+        return getattr(model, "model_name", repr(model))
+
+    def _prepare(self, model, prompt, purpose: str, cache: Optional[bool], kwargs) -> Tuple[str, Optional[str], Callable[[], Any]]:
+        """Returns (single-flight key, response-cache key or None, the blocking call to schedule)."""
+        model_name = self._model_name(model)
+        flight_key = make_key(model_name, prompt, kwargs)
+        cache_key = None
+        if llm_cache.should_cache(purpose, cache):
+            generation_config = (getattr(model, "_generation_config", None), kwargs)
+            cache_key = llm_cache.make_key(model_name, prompt, generation_config)
+
+        def call():
+            # Runs in the submitter's context, so the span is a child of the request's span
+            with tracing.span(
+                "gemini.generate_content", kind="client",
+                **{"llm.model": model_name, "llm.purpose": purpose, "llm.prompt_chars": len(str(prompt)),
+                   "llm.prompt_tokens_estimate": estimate_tokens(prompt), "llm.cacheable": bool(cache_key)},
+            ):
+                response = model.generate_content(prompt, **kwargs)
+                usage = getattr(response, "usage_metadata", None)
+                if usage is not None:
+                    tracing.set_attributes(**{
+                        "llm.prompt_tokens": getattr(usage, "prompt_token_count", None),
+                        "llm.output_tokens": getattr(usage, "candidates_token_count", None),
+                    })
+            if cache_key:
+                llm_cache.put(cache_key, model_name, purpose, response_text(response))
+            return response
+
+        return flight_key, cache_key, call
+
+    def generate_sync(
+        self, model, prompt, priority: Priority = Priority.INTERACTIVE, purpose: str = "generate",
+        dedupe: bool = True, cache: Optional[bool] = None, **kwargs
+    ):
+        """
+        [Blocking] Scheduled `model.generate_content(prompt, **kwargs)`. Do not call from the event loop.
+        With `dedupe`, identical concurrent requests (same model, prompt and kwargs) share one call.
+        `cache` forces the persistent response cache on/off; by default it follows LLM_CACHE_PURPOSES.
+        """
+        est = estimate_tokens(prompt) + self.expected_output_tokens
+        flight_key, cache_key, fn = self._prepare(model, prompt, purpose, cache, kwargs)
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                tracing.add_event("llm.cache_hit", **{"llm.purpose": purpose})
+                return cached
+
+        def call():
+            return self.submit(fn, priority, est, purpose).result()
+
+        if not dedupe:
+            return call()
+        return self.flight.do_sync(flight_key, call)
+
+    async def generate(
+        self, model, prompt, priority: Priority = Priority.INTERACTIVE, purpose: str = "generate",
+        dedupe: bool = True, cache: Optional[bool] = None, **kwargs
+    ):
+        """[Async] Scheduled `model.generate_content(prompt, **kwargs)` without occupying a threadpool worker."""
+        est = estimate_tokens(prompt) + self.expected_output_tokens
+        flight_key, cache_key, fn = self._prepare(model, prompt, purpose, cache, kwargs)
+        if cache_key:
+            cached = await asyncio.to_thread(llm_cache.get, cache_key)
+            if cached is not None:
+                tracing.add_event("llm.cache_hit", **{"llm.purpose": purpose})
+                return cached
+
+        async def call():
+            return await asyncio.wrap_future(self.submit(fn, priority, est, purpose))
+
+        if not dedupe:
+            return await call()
+        return await self.flight.do_async(flight_key, call)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls, retry counts and queue-wait percentiles per priority class."""
+        with self._stats_lock:
+            waits = {name: sorted(values) for name, values in self._waits.items()}
+            result = {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "max_concurrency": self.max_concurrency,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "retries": self._retries,
+                "rate_limited": self._rate_limited,
+                "single_flight": self.flight.stats(),
+                "response_cache": {"hits": llm_cache.hits, "misses": llm_cache.misses},
+                "queue_wait_ms": {},
+            }
+            max_wait = dict(self._max_wait)
+
+        def pct(values, q):
+            return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1) if values else 0.0
+
+        for name, values in waits.items():
+            result["queue_wait_ms"][name] = {
+                "samples": len(values),
+                "p50": pct(values, 0.50),
+                "p95": pct(values, 0.95),
+                "max": round(max_wait[name] * 1000, 1),
+            }
+        return result
+
+    # --- Scheduler Loop (runs on the dedicated thread) ---
+    async def _dispatch(self):
+        self._rpm_bucket = _TokenBucket(self.rpm)
+        self._tpm_bucket = _TokenBucket(self.tpm)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._cooldown_until = 0.0
+
+        while True:
+            await self._slots.acquire()
+            # Wait for request budget before picking a job, so a higher-priority job
+            # that arrives during the wait is still served first.
+            await self._wait_for_budget(self._rpm_bucket, 1)
+            job = await self._queue.get()
+            if not job.future.set_running_or_notify_cancel():
+                # Caller went away while queued (e.g. client disconnected)
+                self._slots.release()
+                continue
+            await self._wait_for_budget(self._tpm_bucket, job.est_tokens)
+            self._rpm_bucket.consume(1)
+            self._tpm_bucket.consume(job.est_tokens)
+
+            wait = time.monotonic() - job.enqueued_at
+            name = Priority(job.priority).name
+            LLM_QUEUE_WAIT.labels(name).observe(wait)
+            with self._stats_lock:
+                self._waits[name].append(wait)
+                self._max_wait[name] = max(self._max_wait[name], wait)
+                self._in_flight += 1
+            if wait > 5:
+                logger.warning(f"⏳ LLM call '{job.purpose}' ({name}) waited {wait:.1f}s in queue")
+            asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _wait_for_budget(self, bucket: _TokenBucket, amount: float):
+        while True:
+            delay = max(bucket.wait_time(amount), self._cooldown_until - time.monotonic())
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _run(self, job: _Job):
+        loop = asyncio.get_running_loop()
+        try:
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = await loop.run_in_executor(self._executor, job.context.run, job.fn)
+                    LLM_CALL_DURATION.labels(job.purpose, "ok").observe(time.perf_counter() - started)
+                    self._settle_tokens(job, response)
+                    job.future.set_result(response)
+                    with self._stats_lock:
+                        self._completed += 1
+                    return
+                except Exception as e:
+                    LLM_CALL_DURATION.labels(job.purpose, "error").observe(time.perf_counter() - started)
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        logger.error(f"Gemini call '{job.purpose}' failed: {e}")
+                        job.future.set_exception(e)
+                        with self._stats_lock:
+                            self._failed += 1
+                        return
+                    # Exponential backoff with full jitter; quota errors also pause new dispatches
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                    attempt += 1
+                    rate_limited = "429" in str(e) or "ResourceExhausted" in type(e).__name__
+                    LLM_RETRIES.labels(job.purpose, str(rate_limited).lower()).inc()
+                    with self._stats_lock:
+                        self._retries += 1
+                        self._rate_limited += int(rate_limited)
+                    if rate_limited:
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                    logger.warning(
+                        f"Gemini call '{job.purpose}' failed ({e}). Retry {attempt}/{self.max_retries} in {delay:.2f}s"
+                    )
+                    await asyncio.sleep(delay)
+                    await self._wait_for_budget(self._rpm_bucket, 1)
+                    self._rpm_bucket.consume(1)
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _settle_tokens(self, job: _Job, response):
+        """Corrects the token budget with the real usage reported by Gemini, when available."""
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None) if usage is not None else None
+        if actual:
+            self._tpm_bucket.consume(actual - job.est_tokens)
+
+
+# Create a singleton instance shared by QueryEngine, triage and drafting
+llm_scheduler = LLMScheduler(
+    rpm=settings.LLM_RPM_LIMIT,
+    tpm=settings.LLM_TPM_LIMIT,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+    expected_output_tokens=settings.LLM_EXPECTED_OUTPUT_TOKENS,
+)
@@ -0,0 +1,46 @@
+# src/services/pdf_text.py
+"""
+PDF text extraction with PyMuPDF.
+
+Like `tesseract_ocr`, these functions also run inside the extraction service's worker
+processes (PyMuPDF documents must not be shared across threads), so keep imports light.
+"""
+from typing import Tuple, Union
+
+import fitz  # PyMuPDF
+
+PYMUPDF_VERSION = fitz.VersionBind
+
+# A PDF is either raw bytes or a path on disk. Uploads (spooled to a temp file) and corpus
+# files are passed as paths, so only the path is sent to each worker.
+PdfSource = Union[bytes, str]
+
+
+def _open(source: PdfSource) -> "fitz.Document":
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def page_count(source: PdfSource) -> int:
+    with _open(source) as doc:
+        return doc.page_count
+
+
+def extract_page_range(source: PdfSource, start: int, stop: int) -> str:
+    """
+    [Worker Process] Returns the text of pages [start, stop), one page per line block.
+    Each call opens its own document, so ranges can be extracted in parallel.
+    """
+    with _open(source) as doc:
+        stop = min(stop, doc.page_count)
+        return "\n".join(doc[i].get_text() for i in range(start, stop))
+
+
+def split_ranges(n_pages: int, n_tasks: int, min_pages_per_task: int) -> Tuple[Tuple[int, int], ...]:
+    """Splits [0, n_pages) into at most `n_tasks` contiguous ranges of at least `min_pages_per_task`."""
+    pages_per_task = max(min_pages_per_task, -(-n_pages // max(1, n_tasks)))
+    return tuple(
+        (start, min(start + pages_per_task, n_pages))
+        for start in range(0, n_pages, pages_per_task)
+    )
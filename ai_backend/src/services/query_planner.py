@@ -0,0 +1,96 @@
+# src/services/query_planner.py
+"""
+Query planning helpers: one structured LLM call that replaces the separate re-frame and
+category-classification round trips, plus the local shortcuts that skip the LLM entirely.
+"""
+import re
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+# Pure small talk never needs the legal corpus
+SMALL_TALK_RE = re.compile(
+    r"^\s*(hi+|hello+|hey+|namaste|good\s+(morning|afternoon|evening)|"
+    r"thanks?(\s+you)?(\s+(so\s+much|a\s+lot|very\s+much))?|thank\s+u|ty|"
+    r"ok(ay)?|great|cool|got\s+it|bye|goodbye)[\s!.,🙏]*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class QueryPlan:
+    standalone_question: str
+    category: str
+    needs_retrieval: bool
+    # How the plan was made: "local" (no LLM), "llm" (one planner call) or "fallback" (old two-call path)
+    source: str
+    llm_calls: int = 0
+    round_trips_saved: int = 0
+
+
+def is_small_talk(text: str) -> bool:
+    return bool(SMALL_TALK_RE.match(text or ""))
+
+
+def confident_category(scores: Dict[str, int], min_score: int = 2) -> Optional[str]:
+    """The keyword classifier's pick, only if it is unambiguous (clear winner with enough hits)."""
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] < min_score:
+        return None
+    if len(ranked) > 1 and ranked[1][1] * 2 > ranked[0][1]:
+        return None
+    return ranked[0][0]
+
+
+def build_plan_prompt(question: str, chat_history: List[Dict[str, str]], categories: Iterable[str]) -> str:
+    history_str = "\n".join(f"{msg['role']}: {msg['content']}" for msg in chat_history) or "(none)"
+    category_list = "\n".join(f"- {key}" for key in categories)
+    return f"""
+        You are the query planner for an Indian legal assistant. Given the conversation and the latest
+        user message, return ONLY a JSON object (no markdown) with exactly these keys:
+        {{
+            "standalone_question": "the latest message rephrased to be fully understandable without the history",
+            "category": "the single most relevant category name from the list below",
+            "needs_retrieval": true
+        }}
+        Set "needs_retrieval" to false only for greetings, thanks or small talk that need no legal sources.
+
+        Categories:
+        {category_list}
+        - General: (Use if the question is non-legal, conversational, or doesn't fit others)
+
+        Chat History:
+        ---
+        {history_str}
+        ---
+        Latest Message: "{question}"
+        """
+
+
+def parse_plan(raw: str, categories: Iterable[str]) -> Optional[dict]:
+    """Parses the planner's JSON reply. Returns None if it is unusable (caller falls back)."""
+    cleaned = (raw or "").replace("```json", "").replace("```", "").strip()
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(cleaned[start: end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    question = str(data.get("standalone_question") or "").strip()
+    if not question:
+        return None
+
+    raw_category = str(data.get("category") or "General")
+    category = "General"
+    for key in categories:
+        if key.lower() == raw_category.strip().lower() or key in raw_category:
+            category = key
+            break
+
+    needs_retrieval = data.get("needs_retrieval", True)
+    if isinstance(needs_retrieval, str):
+        needs_retrieval = needs_retrieval.strip().lower() not in ("false", "no", "0")
+    return {"standalone_question": question, "category": category, "needs_retrieval": bool(needs_retrieval)}
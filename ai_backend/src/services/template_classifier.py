@@ -0,0 +1,138 @@
+# src/services/template_classifier.py
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.services.template_store import Template
+
+logger = logging.getLogger(__name__)
+
+# Short descriptions embedded alongside each template's text (what the document is *for*).
+# Templates without an entry are described by their humanized key and Subject line.
+TEMPLATE_DESCRIPTIONS: Dict[str, str] = {
+    "cheque_bounce_notice": "Legal notice under Section 138 Negotiable Instruments Act for a dishonoured / bounced cheque.",
+    "consumer_complaint_notice": "Consumer complaint before the consumer commission for a defective product or deficient service, seeking refund or compensation.",
+    "debt_recovery_notice": "Legal notice demanding repayment of a personal loan or money owed.",
+    "rent_recovery_notice": "Legal notice from a landlord to a tenant for unpaid rent arrears and eviction.",
+    "rti_application_template": "Right to Information (RTI) application requesting information from a public authority.",
+    "superdari_application": "Application to the court for release of a seized vehicle or property on superdari (interim custody).",
+    "trader_reply_notice": "Written reply / version of the opposite party (trader or seller) to a consumer complaint.",
+}
+
+# How much of a template body is embedded (the embedder truncates long inputs anyway)
+TEMPLATE_TEXT_CHARS = 2000
+
+
+def describe_template(template: Template) -> str:
+    if template.key in TEMPLATE_DESCRIPTIONS:
+        return TEMPLATE_DESCRIPTIONS[template.key]
+    description = template.key.replace("_", " ")
+    subject = re.search(r"^\s*Subject\s*:\s*(.+)$", template.text, re.IGNORECASE | re.MULTILINE)
+    if subject:
+        description += f". {subject.group(1).strip()}"
+    return description
+
+
+@dataclass
+class TemplateMatch:
+    key: Optional[str]
+    confidence: float
+    # "confident": use it; "ambiguous": close call (LLM tie-breaker); "none": nothing fits
+    decision: str
+    candidates: List[Tuple[str, float]] = field(default_factory=list)
+    latency_ms: float = 0.0
+
+
+class TemplateClassifier:
+    """
+    Picks a document template for a scenario locally, by cosine similarity between the
+    scenario embedding and each template's (description, text) embeddings.
+
+    Template vectors are computed once and recomputed only for templates whose file changed.
+    """
+
+    def __init__(self, embedding_model, threshold: float, min_score: float, margin: float):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.min_score = min_score
+        self.margin = margin
+        self._lock = threading.Lock()
+        # key -> (mtime, [description vector, text vector])
+        self._vectors: Dict[str, Tuple[float, np.ndarray]] = {}
+        # Snapshot used by classify(): (keys, matrix of shape (n_templates, 2, dim))
+        self._index: Tuple[List[str], Optional[np.ndarray]] = ([], None)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.embedding_model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def rebuild(self, templates: Iterable[Template]):
+        """[Blocking] Embeds new or modified templates and drops removed ones."""
+        start = time.perf_counter()
+        templates = list(templates)
+        with self._lock:
+            stale = [t for t in templates if self._vectors.get(t.key, (None,))[0] != t.mtime]
+            if stale:
+                inputs = []
+                for template in stale:
+                    inputs += [describe_template(template), template.text[:TEMPLATE_TEXT_CHARS]]
+                vectors = self._encode(inputs).reshape(len(stale), 2, -1)
+                for template, pair in zip(stale, vectors):
+                    self._vectors[template.key] = (template.mtime, pair)
+            current = {t.key for t in templates}
+            for key in list(self._vectors):
+                if key not in current:
+                    del self._vectors[key]
+
+            keys = sorted(self._vectors)
+            matrix = np.stack([self._vectors[k][1] for k in keys]) if keys else None
+            self._index = (keys, matrix)
+        logger.info(
+            f"Template classifier: embedded {len(stale)} template(s), {len(keys)} indexed "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms."
+        )
+
+    def classify(self, scenario: str, top_n: int = 3) -> TemplateMatch:
+        """[Blocking] Scores every template against the scenario (one embedding + a tiny matmul)."""
+        start = time.perf_counter()
+        keys, matrix = self._index
+        if matrix is None or not scenario.strip():
+            return TemplateMatch(None, 0.0, "none")
+
+        query = self._encode([scenario])[0]
+        # Average of description and text similarity per template
+        scores = (matrix @ query).mean(axis=1)
+        order = np.argsort(-scores)[:top_n]
+        candidates = [(keys[i], round(float(scores[i]), 4)) for i in order]
+
+        best_key, best = candidates[0]
+        runner_up = candidates[1][1] if len(candidates) > 1 else -1.0
+        if best < self.min_score:
+            decision, best_key = "none", None
+        elif best >= self.threshold and best - runner_up >= self.margin:
+            decision = "confident"
+        else:
+            decision = "ambiguous"
+        return TemplateMatch(best_key, float(best), decision, candidates, (time.perf_counter() - start) * 1000)
+
+
+def normalize_template_reply(reply: str, keys: Iterable[str]) -> Optional[str]:
+    """
+    Maps a free-text LLM reply ("Cheque_Bounce_Notice.txt", "`debt recovery notice`", ...) to a
+    template key, or None if it names no known template.
+    """
+    keys = list(keys)
+    text = (reply or "").strip().lower()
+    text = re.sub(r"\.txt\b", "", text)
+    text = re.sub(r"[^a-z0-9]+", "_", text).strip("_")
+    if text in keys:
+        return text
+    # Longest key first, so "notice" fragments don't shadow a more specific match
+    for key in sorted(keys, key=len, reverse=True):
+        if key in text:
+            return key
+    return None
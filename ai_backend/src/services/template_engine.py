@@ -0,0 +1,246 @@
+# src/services/template_engine.py
+"""
+Deterministic template filling.
+
+Placeholders such as [DATE_OF_NOTICE], [CLIENT_NAME] or [CHEQUE_AMOUNT_WORDS] are filled
+locally from facts we already hold for a case (`facts`, `structured_facts`, jurisdiction).
+Whatever cannot be filled here is returned as `missing`, for a small LLM gap-filling call;
+free-text sections ([PRAYER_1: e.g., ...]) are always missing and carry their hint.
+"""
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.services.template_store import PLACEHOLDER_RE, parse_placeholder_hints, parse_placeholders
+
+# Fact values that mean "we don't know"
+EMPTY_VALUES = {"", "not mentioned", "n/a", "na", "none", "null", "unknown", "-"}
+
+# Placeholder -> fact keys to try, in order (keys are normalized: lower-case, non-alphanumerics -> "_").
+# A placeholder whose normalized name equals a fact key is always matched first.
+_PARTY_SELF = ["client_name", "complainant_name", "applicant_name", "user_name", "your_name", "sender_name", "name"]
+_PARTY_OTHER = [
+    "opponent_name", "opposite_party_name", "respondent_name", "accused_name", "debtor_name",
+    "drawer_name", "tenant_name", "opposite_party", "opponent", "other_party",
+]
+_AMOUNT = ["amount_due", "amount_involved", "amount", "total_amount", "claim_amount"]
+
+FACT_ALIASES: Dict[str, List[str]] = {
+    # Parties
+    "CLIENT_NAME": _PARTY_SELF,
+    "COMPLAINANT_NAME": _PARTY_SELF,
+    "COMPLAINANT_FULL_NAME": _PARTY_SELF,
+    "APPLICANT_FULL_NAME": _PARTY_SELF,
+    "LANDLORD'S NAME": ["landlord_name"] + _PARTY_SELF,
+    "DRAWER_NAME": _PARTY_OTHER,
+    "DEBTOR_NAME": _PARTY_OTHER,
+    "OPPONENT_NAME": _PARTY_OTHER,
+    "OPPONENT_FULL_NAME": _PARTY_OTHER,
+    "OPPOSITE_PARTY_NAME": _PARTY_OTHER,
+    "ACCUSED_NAME": _PARTY_OTHER,
+    "TENANT'S NAME": _PARTY_OTHER,
+    # Addresses
+    "CLIENT_ADDRESS": ["client_address", "complainant_address", "address"],
+    "COMPLAINANT_FULL_ADDRESS": ["complainant_address", "client_address", "address"],
+    "DRAWER_ADDRESS": ["opponent_address", "drawer_address"],
+    "OPPONENT_FULL_ADDRESS_WITH_PIN": ["opponent_address"],
+    "OPPOSITE_PARTY_ADDRESS": ["opponent_address", "opposite_party_address"],
+    "PROPERTY_ADDRESS": ["property_address"],
+    # Amounts
+    "CHEQUE_AMOUNT": ["cheque_amount"] + _AMOUNT,
+    "LOAN_AMOUNT": ["loan_amount"] + _AMOUNT,
+    "TOTAL_DUE": ["total_due"] + _AMOUNT,
+    "TOTAL_CLAIM_AMOUNT": ["claim_amount"] + _AMOUNT,
+    "REFUND_AMOUNT": ["refund_amount"] + _AMOUNT,
+    "INVOICE_AMOUNT": ["invoice_amount"] + _AMOUNT,
+    "RENT_AMOUNT": ["rent_amount", "monthly_rent"],
+    # Dates / identifiers
+    "CHEQUE_DATE": ["cheque_date", "extracted_date"],
+    "CHEQUE_NO": ["cheque_no", "cheque_number"],
+    "BANK_NAME": ["bank_name", "drawee_bank"],
+    "FIR_NO": ["fir_no", "fir_number"],
+    "DATE_OF_FIR": ["fir_date", "date_of_fir"],
+    "POLICE_STATION_NAME": ["police_station"],
+    # Jurisdiction
+    "DISTRICT_NAME": ["district"],
+    "CITY_NAME": ["city", "district"],
+    "PLACE": ["city", "district"],
+    "STATE": ["state"],
+}
+
+
+def normalize_key(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(key).lower()).strip("_")
+
+
+def flatten_facts(*sources: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Merges fact dicts (later sources win) into {normalized_key: value}.
+    Nested dicts are flattened one level (e.g. jurisdiction -> state, district); empty values are dropped.
+    """
+    facts: Dict[str, str] = {}
+
+    def add(key, value):
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                add(sub_key, sub_value)
+            return
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value if v)
+        text = str(value).strip() if value is not None else ""
+        if text.lower() not in EMPTY_VALUES:
+            facts[normalize_key(key)] = text
+
+    for source in sources:
+        for key, value in (source or {}).items():
+            add(key, value)
+    return facts
+
+
+# --- Amount in words (Indian numbering: thousand, lakh, crore) ---
+_ONES = [
+    "", "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten",
+    "Eleven", "Twelve", "Thirteen", "Fourteen", "Fifteen", "Sixteen", "Seventeen", "Eighteen", "Nineteen",
+]
+_TENS = ["", "", "Twenty", "Thirty", "Forty", "Fifty", "Sixty", "Seventy", "Eighty", "Ninety"]
+
+
+def _two_digits(n: int) -> str:
+    if n < 20:
+        return _ONES[n]
+    return f"{_TENS[n // 10]} {_ONES[n % 10]}".strip()
+
+
+def _three_digits(n: int) -> str:
+    hundreds, rest = divmod(n, 100)
+    parts = [f"{_ONES[hundreds]} Hundred"] if hundreds else []
+    if rest:
+        parts.append(_two_digits(rest))
+    return " ".join(parts)
+
+
+def amount_in_words(amount: str) -> Optional[str]:
+    """'50,000 INR' -> 'Fifty Thousand'. Returns None if no whole rupee amount can be read."""
+    match = re.search(r"\d[\d,]*", amount or "")
+    if not match:
+        return None
+    n = int(match.group().replace(",", ""))
+    if n == 0:
+        return "Zero"
+    parts = []
+    for divisor, label in ((10_000_000, "Crore"), (100_000, "Lakh"), (1000, "Thousand")):
+        count, n = divmod(n, divisor)
+        if count:
+            parts.append(f"{amount_in_words(str(count)) if count >= 100 else _two_digits(count)} {label}")
+    if n:
+        parts.append(_three_digits(n))
+    return " ".join(parts)
+
+
+def _amount_figure(amount: str) -> str:
+    """'Rs. 50,000/- INR' -> '50,000' (the templates already print 'Rs.' and '/-')."""
+    match = re.search(r"\d[\d,]*(\.\d+)?", amount)
+    return match.group() if match else amount
+
+
+@dataclass
+class FillResult:
+    text: str
+    filled: Dict[str, str] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    # Instructions of the missing free-text placeholders (known facts already substituted)
+    hints: Dict[str, str] = field(default_factory=dict)
+
+
+def resolve_placeholder(name: str, facts: Dict[str, str]) -> Optional[str]:
+    """Value for one placeholder from case facts, or None. Dates are never defaulted to today."""
+    key = normalize_key(name)
+    if key in facts:
+        return facts[key]
+
+    if name.endswith("_WORDS"):
+        figure = resolve_placeholder(name[: -len("_WORDS")], facts)
+        return amount_in_words(figure) if figure else None
+
+    for candidate in FACT_ALIASES.get(name, []):
+        if candidate in facts:
+            value = facts[candidate]
+            return _amount_figure(value) if "AMOUNT" in name or name == "TOTAL_DUE" else value
+    return None
+
+
+def fill_template(text: str, facts: Dict[str, str]) -> FillResult:
+    """Substitutes every placeholder resolvable from `facts` (already flattened). No LLM involved."""
+    filled: Dict[str, str] = {}
+    missing: List[str] = []
+    hints = parse_placeholder_hints(text)
+    # Placeholders that only appear inside hints ("Rs. [REFUND_AMOUNT]") are resolved too
+    nested = [name for hint in hints.values() for name in parse_placeholders(hint)]
+    for name in parse_placeholders(text) + nested:
+        if name in filled or name in missing:
+            continue
+        # A hinted placeholder is a section to write, unless the facts hold it verbatim
+        value = facts.get(normalize_key(name)) if name in hints else resolve_placeholder(name, facts)
+        if value:
+            filled[name] = value
+        elif name not in nested:
+            missing.append(name)
+    missing_hints = {name: apply_values(hints[name], filled) for name in missing if name in hints}
+    return FillResult(apply_values(text, filled), filled, missing, missing_hints)
+
+
+def apply_values(text: str, values: Dict[str, str]) -> str:
+    """
+    Replaces [NAME] (or [NAME: hint]) with values[NAME]. Placeholders without a value are
+    left untouched, except that known values are substituted inside their hints.
+    """
+    if not values:
+        return text
+
+    def replace(match: re.Match) -> str:
+        name, hint = match.group(1).strip(), match.group(2)
+        if name in values:
+            return values[name]
+        if hint:
+            return match.group(0).replace(hint, apply_values(hint, values))
+        return match.group(0)
+
+    return PLACEHOLDER_RE.sub(replace, text)
+
+
+def placeholder_context(text: str, names: List[str], width: int = 100) -> Dict[str, str]:
+    """A short snippet of the line each placeholder first appears on, to guide gap filling."""
+    first_seen: Dict[str, int] = {}
+    for match in PLACEHOLDER_RE.finditer(text):
+        first_seen.setdefault(match.group(1).strip(), match.start())
+    context = {}
+    for name in names:
+        index = first_seen.get(name, -1)
+        if index == -1:
+            continue
+        line_start = text.rfind("\n", 0, index) + 1
+        line_end = text.find("\n", index)
+        line = text[line_start: line_end if line_end != -1 else len(text)].strip()
+        context[name] = line if len(line) <= width else line[: width - 3] + "..."
+    return context
+
+
+def parse_gap_values(raw: str, names: List[str]) -> Dict[str, str]:
+    """Parses the LLM's JSON map of placeholder -> value, keeping only requested, non-empty values."""
+    cleaned = raw.replace("```json", "").replace("```", "").strip()
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(cleaned[start: end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    wanted = set(names)
+    return {
+        name: str(value).strip()
+        for name, value in data.items()
+        if name in wanted and value is not None and str(value).strip().lower() not in EMPTY_VALUES
+    }
@@ -0,0 +1,176 @@
+# src/services/template_store.py
+import os
+import re
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Placeholders are bracketed upper-case tokens, e.g. [DATE], [ADVOCATE_NAME], [CITY, STATE, PIN_CODE].
+# A placeholder may carry a free-text instruction (its hint) after ":" or ", e.g.,", as in
+# [PRAYER_2: e.g., To replace the defective [PRODUCT_NAME] ...] or [DESIGNATION, e.g., Proprietor];
+# the hint may contain plain placeholders of its own. Group 1 is the name, group 2 the hint.
+PLACEHOLDER_RE = re.compile(
+    r"\[([A-Z][A-Z0-9_' ,/\-]*?)"
+    r"(?:(?::|,\s*e\.g\.,?)\s*((?:[^\[\]\n]|\[[^\[\]\n]*\])*))?\]"
+)
+
+
+def parse_placeholders(text: str) -> List[str]:
+    """Unique placeholder names in order of first appearance."""
+    seen: Dict[str, None] = {}
+    for match in PLACEHOLDER_RE.finditer(text):
+        seen.setdefault(match.group(1).strip(), None)
+    return list(seen)
+
+
+def parse_placeholder_hints(text: str) -> Dict[str, str]:
+    """{name: hint} for placeholders that carry an instruction (first occurrence wins)."""
+    hints: Dict[str, str] = {}
+    for match in PLACEHOLDER_RE.finditer(text):
+        if match.group(2) and match.group(2).strip():
+            hints.setdefault(match.group(1).strip(), match.group(2).strip())
+    return hints
+
+
+@dataclass
+class Template:
+    key: str
+    filename: str
+    text: str
+    placeholders: List[str] = field(default_factory=list)
+    mtime: float = 0.0
+
+    def metadata(self) -> dict:
+        return {
+            "key": self.key,
+            "filename": self.filename,
+            "placeholders": self.placeholders,
+            "placeholder_count": len(self.placeholders),
+            "updated_at": datetime.fromtimestamp(self.mtime).isoformat(),
+        }
+
+
+class TemplateStore:
+    """
+    In-memory copy of the document templates in Sample_Templates, with parsed placeholders.
+
+    Template bodies are read once; a background watcher (watchfiles, or mtime polling if it
+    is unavailable) reloads only changed files, picks up new ones and drops deleted ones.
+    Readers always see a consistent snapshot: the whole map is swapped on reload.
+    """
+
+    def __init__(self, directory: str, poll_seconds: float = 2.0):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self._templates: Dict[str, Template] = {}
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Reads (no disk access) ---
+    def get(self, key: str) -> Optional[Template]:
+        return self._templates.get(key.lower()) if key else None
+
+    def keys(self) -> List[str]:
+        return list(self._templates)
+
+    def templates(self) -> List[Template]:
+        return list(self._templates.values())
+
+    @property
+    def template_map(self) -> Dict[str, str]:
+        """key -> filename, e.g. {"cheque_bounce_notice": "cheque_bounce_notice.txt"}."""
+        return {key: template.filename for key, template in self._templates.items()}
+
+    def list_metadata(self) -> List[dict]:
+        return [template.metadata() for template in self._templates.values()]
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    # --- Loading ---
+    def add_listener(self, callback: Callable[[Set[str]], None]):
+        """`callback(changed_keys)` runs on the watcher thread after each reload that changed something."""
+        self._listeners.append(callback)
+
+    def refresh(self) -> Set[str]:
+        """[Blocking] Re-reads new or modified templates and drops deleted ones. Returns the changed keys."""
+        with self._reload_lock:
+            current = self._templates
+            updated: Dict[str, Template] = {}
+            changed: Set[str] = set()
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.is_file() and e.name.endswith(".txt")]
+            except FileNotFoundError:
+                logger.error(f"Sample templates directory not found at: {self.directory}")
+                entries = []
+
+            for entry in sorted(entries, key=lambda e: e.name):
+                # Create a key from the filename, e.g., "cheque_bounce_notice.txt" -> "cheque_bounce_notice"
+                key = entry.name.replace(".txt", "").lower()
+                mtime = entry.stat().st_mtime
+                existing = current.get(key)
+                if existing and existing.mtime == mtime:
+                    updated[key] = existing
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                except Exception as e:
+                    logger.error(f"Error reading template file {entry.path}: {e}")
+                    if existing:
+                        updated[key] = existing
+                    continue
+                updated[key] = Template(key, entry.name, text, parse_placeholders(text), mtime)
+                changed.add(key)
+
+            changed |= set(current) - set(updated)
+            self._templates = updated
+
+        if changed and current:
+            logger.info(f"🔄 Templates reloaded: {sorted(changed)}")
+        if changed:
+            for callback in self._listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.error(f"Template change listener failed: {e}", exc_info=True)
+        return changed
+
+    # --- Watching ---
+    def start_watching(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="template-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _watch(self):
+        try:
+            from watchfiles import watch
+        except ImportError:
+            watch = None
+
+        if watch is not None and os.path.isdir(self.directory):
+            logger.info(f"Watching {self.directory} for template changes (watchfiles).")
+            try:
+                for _ in watch(self.directory, stop_event=self._stop, debounce=500):
+                    self.refresh()
+                return
+            except Exception as e:
+                logger.warning(f"Template file watcher failed ({e}). Falling back to polling.")
+
+        logger.info(f"Polling {self.directory} for template changes every {self.poll_seconds}s.")
+        while not self._stop.wait(self.poll_seconds):
+            self.refresh()
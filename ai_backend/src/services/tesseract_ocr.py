@@ -0,0 +1,73 @@
+# src/services/tesseract_ocr.py
+"""
+Offline OCR with Tesseract.
+
+These functions run inside worker processes of the extraction service's
+ProcessPoolExecutor, so this module must stay light: no settings, no Google
+clients, nothing that needs the .env file to import.
+"""
+import io
+from typing import List, Optional, Tuple
+
+from PIL import Image
+import pytesseract
+
+
+def split_pages(content: bytes) -> List[bytes]:
+    """
+    Splits a multi-frame image (e.g. a multi-page TIFF scan) into one PNG per page
+    so each page can be OCR'd in parallel. Single-frame images are returned as-is.
+    """
+    with Image.open(io.BytesIO(content)) as img:
+        n_frames = getattr(img, "n_frames", 1)
+        if n_frames <= 1:
+            return [content]
+        pages = []
+        for frame in range(n_frames):
+            img.seek(frame)
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, format="PNG")
+            pages.append(buffer.getvalue())
+        return pages
+
+
+def image_pixels(content: bytes) -> int:
+    """Returns width * height without decoding the full image."""
+    with Image.open(io.BytesIO(content)) as img:
+        width, height = img.size
+        return width * height
+
+
+def ocr_page(content: bytes, langs: str, tesseract_cmd: Optional[str] = None) -> Tuple[str, float]:
+    """
+    [Worker Process] OCRs one page image.
+    Returns (text, mean word confidence 0-100). Confidence is -1 if no words were found.
+    """
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    with Image.open(io.BytesIO(content)) as img:
+        data = pytesseract.image_to_data(img, lang=langs, output_type=pytesseract.Output.DICT)
+
+    # Rebuild the text line by line from the word boxes (one Tesseract pass, not two)
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        if not word:
+            continue
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line_key, []).append(word)
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            confidences.append(conf)
+
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = sum(confidences) / len(confidences) if confidences else -1.0
+    return text, confidence
+
+
+def tesseract_version(tesseract_cmd: Optional[str] = None) -> str:
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return str(pytesseract.get_tesseract_version())
@@ -0,0 +1,414 @@
+# src/services/vector_store.py
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    """
+    The statute corpus behind QueryEngine's retrieval. Filters are the ones _build_filter
+    makes: {"source_document": x} or {"source_document": {"$in": [...]}}.
+    """
+
+    backend = "base"
+
+    def search(self, embedding: Sequence[float], where_filter: Optional[Dict], n_results: int) -> Tuple[List[str], List[Dict]]:
+        """[Blocking] Nearest chunks, best first: (documents, metadatas)."""
+        raise NotImplementedError
+
+    def search_many(self, embeddings: Sequence[Sequence[float]], where_filter: Optional[Dict],
+                    n_results: int) -> List[Tuple[List[str], List[Dict]]]:
+        """[Blocking] `search` for several query vectors sharing one filter, in input order."""
+        return [self.search(embedding, where_filter, n_results) for embedding in embeddings]
+
+    def replace_source(self, source_document: str, ids: List[str], embeddings: List[List[float]],
+                       documents: List[str], metadatas: List[Dict]):
+        """[Blocking] Drops every chunk of `source_document`, then adds the given ones."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """The Chroma collection built by scripts/ingest.py (HNSW index, SQLite metadata)."""
+
+    backend = "chroma"
+
+    def __init__(self, collection, batch_size: int = 64):
+        self.collection = collection
+        self.batch_size = batch_size
+
+    def search(self, embedding, where_filter, n_results):
+        results = self.collection.query(
+            query_embeddings=[list(embedding)],
+            n_results=n_results,
+            where=where_filter,
+            include=['metadatas', 'documents']
+        )
+        return results.get("documents", [[]])[0], results.get("metadatas", [[]])[0]
+
+    def search_many(self, embeddings, where_filter, n_results):
+        # One round trip: Chroma applies the filter once and searches every query vector
+        results = self.collection.query(
+            query_embeddings=[list(embedding) for embedding in embeddings],
+            n_results=n_results,
+            where=where_filter,
+            include=['metadatas', 'documents']
+        )
+        return list(zip(results.get("documents") or [[]] * len(embeddings), results.get("metadatas") or [[]] * len(embeddings)))
+
+    def replace_source(self, source_document, ids, embeddings, documents, metadatas):
+        self.collection.delete(where={"source_document": source_document})
+        for i in range(0, len(ids), self.batch_size):
+            self.collection.upsert(
+                ids=ids[i:i + self.batch_size],
+                embeddings=embeddings[i:i + self.batch_size],
+                documents=documents[i:i + self.batch_size],
+                metadatas=metadatas[i:i + self.batch_size],
+            )
+
+    def count(self):
+        return self.collection.count()
+
+
+# --- NumPy store: files under NUMPY_STORE_DIR ---
+# manifest.json               count, dimension, file names, source list, embedding model
+# embeddings-<v>.f16.npy      (count, dim) float16, L2-normalized, memory-mapped
+# embeddings-<v>.f32.npy      (count, dim) float32 full precision, mmap'd, read only to rescore
+# embeddings-<v>.i8.npy       (count, dim) int8, per-dimension scale in int8-scales-<v>.npy
+# embeddings-<v>.bin.npy      (count, dim / 8) uint8, packed bits of (row > corpus mean), mean in binary-center-<v>.npy
+# sources-<v>.npy             (count,) int32 index into manifest["sources"], one per row
+# records-<v>.json            ids, documents, metadatas (row order)
+# Rows are grouped by source, so every source is one contiguous row range. Files are
+# versioned so a rebuild never overwrites arrays a running reader still maps.
+MANIFEST_FILE = "manifest.json"
+
+# Rows widened (float16 / int8 -> float32) or XOR-ed per step when not scoring a float32 copy in RAM
+SCORE_BLOCK_ROWS = 8192
+
+# First-pass representations (NUMPY_STORE_QUANTIZATION); "none" scores the float16 matrix exactly
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-dimension scalar quantization: row ≈ int8_row * scales."""
+    scales = np.abs(matrix).max(axis=0) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    return np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8), scales
+
+
+def quantize_binary(matrix: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """
+    One bit per dimension, packed 8 per byte (compared by Hamming distance). Bits are taken
+    around the corpus mean: sentence embeddings are not zero-centred, so plain sign bits
+    would waste many dimensions on values that are almost always positive.
+    """
+    return np.packbits(matrix > center, axis=-1)
+
+
+def write_numpy_store(directory: str, ids: List[str], embeddings, documents: List[str],
+                      metadatas: List[Dict], embedding_model: str = "") -> dict:
+    """[Blocking] Writes a new version of the store and points manifest.json at it. Returns the manifest."""
+    if not ids:
+        raise ValueError("Refusing to write an empty NumPy vector store.")
+    os.makedirs(directory, exist_ok=True)
+    previous = _read_manifest(directory)
+    version = (previous or {}).get("version", 0) + 1
+
+    matrix = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+    metadatas = [dict(meta or {}) for meta in metadatas]
+    sources = sorted({str(meta.get("source_document", "")) for meta in metadatas})
+    source_index = {source: i for i, source in enumerate(sources)}
+    source_codes = np.array([source_index[str(meta.get("source_document", ""))] for meta in metadatas], dtype=np.int32)
+
+    order = np.argsort(source_codes, kind="stable")
+    matrix, source_codes = matrix[order], source_codes[order]
+    ids = [ids[i] for i in order]
+    documents = [documents[i] for i in order]
+    metadatas = [metadatas[i] for i in order]
+
+    files = {
+        "embeddings": f"embeddings-{version}.f16.npy",
+        "full": f"embeddings-{version}.f32.npy",
+        "int8": f"embeddings-{version}.i8.npy",
+        "int8_scales": f"int8-scales-{version}.npy",
+        "binary": f"embeddings-{version}.bin.npy",
+        "binary_center": f"binary-center-{version}.npy",
+        "sources": f"sources-{version}.npy",
+        "records": f"records-{version}.json",
+    }
+    int8_matrix, int8_scales = quantize_int8(matrix)
+    np.save(os.path.join(directory, files["embeddings"]), matrix.astype(np.float16))
+    np.save(os.path.join(directory, files["full"]), matrix)
+    np.save(os.path.join(directory, files["int8"]), int8_matrix)
+    np.save(os.path.join(directory, files["int8_scales"]), int8_scales)
+    binary_center = matrix.mean(axis=0).astype(np.float32)
+    np.save(os.path.join(directory, files["binary"]), quantize_binary(matrix, binary_center))
+    np.save(os.path.join(directory, files["binary_center"]), binary_center)
+    np.save(os.path.join(directory, files["sources"]), source_codes)
+    with open(os.path.join(directory, files["records"]), "w", encoding="utf-8") as f:
+        json.dump({"ids": list(ids), "documents": list(documents), "metadatas": metadatas}, f, ensure_ascii=False)
+
+    manifest = {
+        "version": version,
+        "count": len(ids),
+        "dimension": int(matrix.shape[1]),
+        "embedding_model": embedding_model,
+        "sources": sources,
+        "files": files,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    # Best effort: a reader that still maps the old arrays keeps them alive (or, on Windows, the delete fails)
+    for name in (previous or {}).get("files", {}).values():
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+    return manifest
+
+
+def export_chroma_collection(collection, directory: str, embedding_model: str = "", page_size: int = 1000) -> dict:
+    """[Blocking] Copies a Chroma collection (ids, embeddings, documents, metadatas) into a NumPy store."""
+    ids, embeddings, documents, metadatas = [], [], [], []
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids += page["ids"]
+        embeddings += list(page["embeddings"])
+        documents += page["documents"]
+        metadatas += page["metadatas"]
+    return write_numpy_store(directory, ids, embeddings, documents, metadatas, embedding_model)
+
+
+def _read_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class _NumpyState:
+    """One loaded version of the store; replaced as a whole, so searches never see a mix."""
+
+    def __init__(self, directory: str, manifest: dict, max_ram_mb: float, quantization: str = "none"):
+        files = manifest["files"]
+        self.manifest = manifest
+        self.quantization = quantization
+        self.matrix = np.load(os.path.join(directory, files["embeddings"]), mmap_mode="r")
+        # Stores written before quantization support have no float32 copy; float16 then stands in
+        self.full = np.load(os.path.join(directory, files["full"]), mmap_mode="r") if "full" in files else None
+        self.scoring: Optional[np.ndarray] = None
+        self.int8: Optional[np.ndarray] = None
+        self.int8_scales: Optional[np.ndarray] = None
+        self.binary: Optional[np.ndarray] = None
+        self.binary_center: Optional[np.ndarray] = None
+        if quantization == "none":
+            # NumPy has no fast float16 matrix-vector kernel: widening the rows costs ~10x the product
+            # itself. Small stores (the statute corpus is a few MB) keep one float32 copy in RAM;
+            # larger ones are widened block by block from the mmap on every search.
+            widened_mb = self.matrix.shape[0] * self.matrix.shape[1] * 4 / (1024 * 1024)
+            self.scoring = np.asarray(self.matrix, dtype=np.float32) if widened_mb <= max_ram_mb else None
+        else:
+            if quantization not in files or self.full is None:
+                raise ValueError(
+                    f"NumPy vector store at {directory} has no {quantization} vectors; "
+                    f"rebuild it with 'python scripts/ingest.py --numpy-only'."
+                )
+            # The first-pass vectors are what every search scans, so they live in RAM (int8 is a
+            # quarter of float32, binary a 32nd); full-precision rows stay on disk until rescored.
+            if quantization == "int8":
+                self.int8 = np.load(os.path.join(directory, files["int8"]))
+                self.int8_scales = np.load(os.path.join(directory, files["int8_scales"]))
+            else:
+                self.binary = np.load(os.path.join(directory, files["binary"]))
+                self.binary_center = np.load(os.path.join(directory, files["binary_center"]))
+        source_codes = np.load(os.path.join(directory, files["sources"]))
+        with open(os.path.join(directory, files["records"]), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids: List[str] = records["ids"]
+        self.documents: List[str] = records["documents"]
+        self.metadatas: List[Dict] = records["metadatas"]
+        if not (len(self.ids) == len(self.documents) == len(self.metadatas) == self.matrix.shape[0] == len(source_codes)):
+            raise ValueError(f"NumPy vector store at {directory} is inconsistent (version {manifest.get('version')}).")
+        # Row range per source document, so a `where` filter is a slice instead of a scan
+        bounds = np.searchsorted(source_codes, np.arange(len(manifest["sources"]) + 1))
+        self.source_rows: Dict[str, Tuple[int, int]] = {
+            source: (int(bounds[code]), int(bounds[code + 1])) for code, source in enumerate(manifest["sources"])
+        }
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact search over a memory-mapped float16 matrix: one matrix-vector product per query
+    (cosine similarity; the MiniLM embeddings are normalized, so the ranking matches Chroma's
+    L2). Filters select precomputed per-source row ranges. Meant for a corpus of a few thousand
+    to a few hundred thousand chunks; build it with `python scripts/ingest.py --numpy-only`.
+
+    With quantization="int8" or "binary" the first pass scans the quantized vectors for
+    n_results * oversample candidates, which are then rescored against the float32 rows on disk.
+    Check the recall cost with benchmarks/quantization_benchmark.py.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, directory: str, embedding_model: str = "", max_ram_mb: float = 512,
+                 quantization: str = "none", oversample: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}' (expected one of {QUANTIZATIONS}).")
+        self.directory = directory
+        self.embedding_model = embedding_model
+        self.max_ram_mb = max_ram_mb
+        self.quantization = quantization
+        self.oversample = max(1, oversample)
+        self._write_lock = threading.Lock()
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(
+                f"No NumPy vector store at {directory}. Run 'python scripts/ingest.py --numpy-only' to build it."
+            )
+        if embedding_model and manifest.get("embedding_model") not in ("", embedding_model):
+            logger.warning(
+                f"NumPy vector store was built with '{manifest.get('embedding_model')}', "
+                f"but the engine embeds with '{embedding_model}'."
+            )
+        self._state = _NumpyState(directory, manifest, max_ram_mb, quantization)
+        logger.info(
+            f"NumPy vector store loaded: {manifest['count']} chunks x {manifest['dimension']} dims, "
+            f"{len(manifest['sources'])} sources (version {manifest['version']}, first pass: {quantization}"
+            f"{f', oversample x{self.oversample}' if quantization != 'none' else ''})."
+        )
+
+    @staticmethod
+    def _ranges_for(state: _NumpyState, where_filter: Optional[Dict]) -> List[Tuple[int, int]]:
+        """Row ranges the filter allows."""
+        if not where_filter:
+            return [(0, state.matrix.shape[0])]
+        condition = where_filter.get("source_document")
+        if condition is None or len(where_filter) != 1:
+            raise ValueError(f"Unsupported filter for the NumPy vector store: {where_filter}")
+        sources = condition.get("$in", []) if isinstance(condition, dict) else [condition]
+        return sorted(state.source_rows[source] for source in set(sources) if source in state.source_rows)
+
+    @staticmethod
+    def _score(state: _NumpyState, start: int, stop: int, query: np.ndarray) -> np.ndarray:
+        """
+        First-pass scores of rows [start, stop), higher is closer. Without quantization `query`
+        may also be a (dim, m) matrix of m queries, giving (rows, m) scores.
+        """
+        if state.scoring is not None:
+            return state.scoring[start:stop] @ query
+        blocks = range(start, stop, SCORE_BLOCK_ROWS)
+        if state.int8 is not None:
+            # row · query ≈ int8_row · (scales * query)
+            scaled_query = state.int8_scales * query
+            return np.concatenate([
+                state.int8[i:min(i + SCORE_BLOCK_ROWS, stop)].astype(np.float32) @ scaled_query for i in blocks
+            ])
+        if state.binary is not None:
+            query_bits = quantize_binary(query, state.binary_center)
+            return np.concatenate([
+                -np.bitwise_count(state.binary[i:min(i + SCORE_BLOCK_ROWS, stop)] ^ query_bits).sum(axis=1, dtype=np.int32)
+                for i in blocks
+            ]).astype(np.float32)
+        return np.concatenate([
+            np.asarray(state.matrix[i:min(i + SCORE_BLOCK_ROWS, stop)], dtype=np.float32) @ query for i in blocks
+        ])
+
+    @staticmethod
+    def _top(scores: np.ndarray, n: int) -> np.ndarray:
+        """Positions of the n highest scores, best first."""
+        n = min(n, scores.shape[0])
+        top = np.argpartition(-scores, n - 1)[:n] if n < scores.shape[0] else np.arange(scores.shape[0])
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def search(self, embedding, where_filter, n_results):
+        state = self._state
+        ranges = [(start, stop) for start, stop in self._ranges_for(state, where_filter) if stop > start]
+        if not ranges or n_results <= 0:
+            return [], []
+
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores = np.concatenate([self._score(state, start, stop, query) for start, stop in ranges])
+        first_pass = n_results if state.quantization == "none" else n_results * self.oversample
+        top = self._top(scores, first_pass)
+        if len(ranges) > 1 or ranges[0][0] != 0:
+            top = np.concatenate([np.arange(start, stop) for start, stop in ranges])[top]
+
+        if state.quantization != "none":
+            # Rescore the oversampled candidates against full-precision rows (ascending order: sequential reads)
+            candidates = np.sort(top)
+            exact = np.asarray(state.full[candidates], dtype=np.float32) @ query
+            top = candidates[self._top(exact, n_results)]
+        return [state.documents[i] for i in top], [state.metadatas[i] for i in top]
+
+    def search_many(self, embeddings, where_filter, n_results):
+        state = self._state
+        if state.quantization != "none" or len(embeddings) < 2:
+            return super().search_many(embeddings, where_filter, n_results)
+        ranges = [(start, stop) for start, stop in self._ranges_for(state, where_filter) if stop > start]
+        if not ranges or n_results <= 0:
+            return [([], []) for _ in embeddings]
+
+        # One matrix-matrix product for all queries instead of one matrix-vector product each
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        scores = np.concatenate([self._score(state, start, stop, queries.T) for start, stop in ranges])
+        row_index = None
+        if len(ranges) > 1 or ranges[0][0] != 0:
+            row_index = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+        results = []
+        for column in scores.T:
+            top = self._top(column, n_results)
+            if row_index is not None:
+                top = row_index[top]
+            results.append(([state.documents[i] for i in top], [state.metadatas[i] for i in top]))
+        return results
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Bytes held in RAM for scanning vs. mapped from disk (full precision / float16)."""
+        state = self._state
+        resident = sum(
+            a.nbytes for a in (state.scoring, state.int8, state.int8_scales, state.binary, state.binary_center) if a is not None
+        )
+        mapped = sum(a.nbytes for a in (state.matrix, state.full) if a is not None)
+        return {"resident_bytes": int(resident), "mapped_bytes": int(mapped)}
+
+    def replace_source(self, source_document, ids, embeddings, documents, metadatas):
+        # Small corpus: rewrite the store (new version) and swap it in
+        with self._write_lock:
+            state = self._state
+            keep = [i for i, meta in enumerate(state.metadatas) if meta.get("source_document") != source_document]
+            matrix = np.asarray((state.full if state.full is not None else state.matrix)[keep], dtype=np.float32)
+            if ids:
+                added = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+                matrix = np.concatenate([matrix, added]) if keep else added
+            manifest = write_numpy_store(
+                self.directory,
+                [state.ids[i] for i in keep] + list(ids),
+                matrix,
+                [state.documents[i] for i in keep] + list(documents),
+                [state.metadatas[i] for i in keep] + list(metadatas),
+                self.embedding_model or state.manifest.get("embedding_model", ""),
+            )
+            self._state = _NumpyState(self.directory, manifest, self.max_ram_mb, self.quantization)
+
+    def count(self):
+        return self._state.manifest["count"]
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from typing import List
+
+# Separators tried in order: paragraphs, lines, sentences, words
+_SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+
+def clean_text(text: str) -> str:
+    """
+    Cleans raw text by normalizing unicode, fixing hyphenation, and handling whitespace.
+    Shared by scripts/preprocess.py and online ingestion so both produce the same chunks.
+    """
+    # Fix common encoding artifacts
+    text = text.replace('â€™', "'").replace('â€œ', '"').replace('â€', '"')
+    text = text.replace('â€”', '-').replace('â€¦', '...')
+
+    # Normalize unicode characters
+    text = unicodedata.normalize("NFKC", text)
+
+    # Fix words broken by hyphenation at line breaks (e.g., "docu-\nment" -> "document")
+    text = re.sub(r'(\w)-\s*\n\s*(\w)', r'\1\2', text)
+
+    # Remove common PDF artifacts (e.g., page numbers or section labels)
+    text = re.sub(r'\d+\s+SECTIONS', '', text)
+
+    # Remove excessive whitespace, newlines, and tabs
+    text = re.sub(r'\s+', ' ', text)
+
+    return text.strip()
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Splits text into chunks of at most `chunk_size` characters, preferring to break on
+    paragraph, line, sentence and word boundaries (in that order). Consecutive chunks
+    share up to `chunk_overlap` characters so a passage cut at a boundary is still
+    retrievable from either side.
+    """
+    text = re.sub(r"[ \t]+", " ", text or "").strip()
+    if not text:
+        return []
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for separator in _SEPARATORS:
+                cut = window.rfind(separator)
+                # Only accept a boundary in the back half so chunks don't get tiny
+                if cut > chunk_size // 2:
+                    end = start + cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        next_start = max(end - chunk_overlap, start + 1)
+        # Begin the overlap on a word boundary rather than mid-word
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
@@ -0,0 +1,73 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional
+
+
+class StageTimings:
+    """Per-request stage durations in milliseconds (a stage entered twice accumulates)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, elapsed_ms: float):
+        # Speculative work records from pool threads (they run in a copy of the request context)
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+
+_current: contextvars.ContextVar[Optional[StageTimings]] = contextvars.ContextVar("stage_timings", default=None)
+
+# Called as observer(stage_name, elapsed_seconds) after every stage, collected or not
+_observers: List[Callable[[str, float], None]] = []
+
+
+def add_stage_observer(observer: Callable[[str, float], None]):
+    _observers.append(observer)
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    """Records every `stage()` entered in this context (and copies of it) into a new StageTimings."""
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+# Optional span_factory(stage_name) -> context manager, wrapping every stage (see src/utils/tracing.py)
+_span_factory: Optional[Callable[[str], ContextManager]] = None
+
+
+def set_stage_span_factory(factory: Optional[Callable[[str], ContextManager]]):
+    global _span_factory
+    _span_factory = factory
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed * 1000)
+        for observer in _observers:
+            observer(name, elapsed)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times a named step of request processing, e.g. `with stage("retrieve"): ...`."""
+    if _span_factory is None:
+        with _timed(name):
+            yield
+    else:
+        with _span_factory(name), _timed(name):
+            yield
@@ -0,0 +1,132 @@
+import os
+import sys
+import copy
+import gzip
+import json
+import queue
+import random
+import shutil
+import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from src.config import settings, QUERY_LOG_FILE
+
+# Set per HTTP request (see the request id middleware in src/main.py). Threadpool work, the
+# speculative pool and the LLM scheduler run in copies of the request context, so their
+# records carry the same id.
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] [%(request_id)s] %(name)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, thread, message (+ exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RequestQueueHandler(QueueHandler):
+    """
+    Runs on the logging thread (usually the request path), so it only does cheap work:
+    drops sampled-out DEBUG records, stamps the request id, renders and truncates the
+    message, then enqueues. Formatting and file/stdout I/O happen on the listener thread.
+    """
+
+    def __init__(self, log_queue, max_chars: int, debug_sample_rate: float):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0 and random.random() >= self.debug_sample_rate:
+            return False
+        return super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if self.max_chars and len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}… [truncated {len(message) - self.max_chars} chars]"
+        record = copy.copy(record)
+        record.msg, record.args = message, None
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            # Tracebacks are kept whole; render them here so no frames cross threads
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _file_handler(path: str) -> RotatingFileHandler:
+    """Size-based rotation; rotated files are gzipped (query_engine.log.1.gz, ...)."""
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.LOG_FILE_MAX_MB * 1024 * 1024,
+        backupCount=settings.LOG_FILE_BACKUPS,
+        encoding="utf-8",
+        delay=True,
+    )
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging():
+    """
+    Configures the root logger once for the API process: a QueueHandler on the root,
+    and a QueueListener thread writing to stdout and the rotating QUERY_LOG_FILE.
+    Scripts keep their own basicConfig.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if QUERY_LOG_FILE:
+        handlers.append(_file_handler(QUERY_LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_RequestQueueHandler(log_queue, settings.LOG_MAX_MESSAGE_CHARS, settings.LOG_DEBUG_SAMPLE_RATE))
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records and closes the files."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,158 @@
+import os
+import logging
+from typing import Callable, Iterable, List
+
+from src.utils.instrumentation import add_stage_observer
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    METRICS_AVAILABLE = True
+except ImportError:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    METRICS_AVAILABLE = False
+    logger.warning("prometheus-client not installed. /metrics is disabled.")
+
+
+class _NoopMetric:
+    """Stands in for every metric when prometheus-client is missing."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+def _metric(kind: str, name: str, documentation: str, labels: Iterable[str] = (), **kwargs):
+    if not METRICS_AVAILABLE:
+        return _NoopMetric()
+    return {"counter": Counter, "gauge": Gauge, "histogram": Histogram}[kind](name, documentation, list(labels), **kwargs)
+
+
+# Seconds. Local steps (embed, Chroma, Mongo) sit in the low buckets; LLM calls and OCR in the high ones.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+# --- HTTP ---
+HTTP_REQUEST_DURATION = _metric(
+    "histogram", "http_request_duration_seconds", "HTTP request latency by route template.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = _metric("gauge", "http_requests_in_progress", "HTTP requests being served.", ["method"])
+
+# --- QueryEngine stages (fed by src.utils.instrumentation.stage) ---
+QUERY_STAGE_DURATION = _metric(
+    "histogram", "query_stage_duration_seconds", "Time spent in each QueryEngine stage.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+
+# --- LLM scheduler ---
+LLM_CALL_DURATION = _metric(
+    "histogram", "llm_call_duration_seconds", "Gemini call latency (one attempt) by purpose.",
+    ["purpose", "outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUE_WAIT = _metric(
+    "histogram", "llm_queue_wait_seconds", "Time LLM calls waited in the scheduler queue.",
+    ["priority"], buckets=LATENCY_BUCKETS,
+)
+LLM_RETRIES = _metric("counter", "llm_retries_total", "Retried Gemini calls.", ["purpose", "rate_limited"])
+
+# --- OCR ---
+OCR_DURATION = _metric(
+    "histogram", "ocr_duration_seconds", "OCR latency by backend (cache misses only).",
+    ["backend"], buckets=LATENCY_BUCKETS,
+)
+
+# --- MongoDB (pymongo command monitoring) ---
+MONGO_COMMAND_DURATION = _metric(
+    "histogram", "mongodb_command_duration_seconds", "MongoDB command latency.",
+    ["command", "outcome"], buckets=LATENCY_BUCKETS,
+)
+
+
+def observe_stage(name: str, elapsed_seconds: float):
+    QUERY_STAGE_DURATION.labels(name).observe(elapsed_seconds)
+
+
+def mongo_event_listeners() -> list:
+    """pymongo command listeners for the client in src/database.py (none without prometheus-client)."""
+    if not METRICS_AVAILABLE:
+        return []
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        """Records every MongoDB command's server round trip (duration reported by the driver)."""
+
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_COMMAND_DURATION.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+        def failed(self, event):
+            MONGO_COMMAND_DURATION.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+    return [MongoCommandMetrics()]
+
+
+# --- Scrape-time values ---
+# Gauges and counters the services already keep (queue depths, cache hits) are read when
+# /metrics is scraped, so the hot path does no extra work for them.
+_snapshot_sources: List[Callable[[], Iterable]] = []
+
+
+def add_snapshot_source(source: Callable[[], Iterable]):
+    """`source()` yields metric families (see gauge_family / counter_family) at scrape time."""
+    _snapshot_sources.append(source)
+
+
+def gauge_family(name: str, documentation: str, labels: Iterable[str], samples: Iterable[tuple]):
+    """samples: (label values, value) pairs."""
+    family = GaugeMetricFamily(name, documentation, labels=list(labels))
+    for label_values, value in samples:
+        family.add_metric(list(label_values), value)
+    return family
+
+
+def counter_family(name: str, documentation: str, labels: Iterable[str], samples: Iterable[tuple]):
+    family = CounterMetricFamily(name, documentation, labels=list(labels))
+    for label_values, value in samples:
+        family.add_metric(list(label_values), value)
+    return family
+
+
+class _SnapshotCollector:
+    def collect(self):
+        for source in list(_snapshot_sources):
+            try:
+                yield from source()
+            except Exception as e:
+                logger.warning(f"Metrics snapshot source failed: {e}")
+
+
+if METRICS_AVAILABLE:
+    REGISTRY.register(_SnapshotCollector())
+    add_stage_observer(observe_stage)
+
+
+def render_latest() -> bytes:
+    """Prometheus text exposition of every registered metric (all workers in multiprocess mode)."""
+    if not METRICS_AVAILABLE:
+        return b""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
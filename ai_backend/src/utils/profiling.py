@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.config import settings, PROFILES_PATH
+
+logger = logging.getLogger(__name__)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Leaf frames of a thread that is blocked, not burning CPU (pool workers waiting for work,
+# the event loop in select(), callers waiting on a future or lock)
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("_base.py", "result"),
+    ("_base.py", "wait"),
+}
+
+FrameKey = Tuple[str, str, int]
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler across all threads, for one request at a time.
+
+    A request's CPU work is spread over the event loop, threadpool workers, the speculative
+    pool and the LLM scheduler, so a per-thread profiler (cProfile) would miss most of it.
+    Every `interval` seconds this samples each thread's stack (sys._current_frames) and keeps
+    the busy ones; idle threads are skipped. Concurrent requests show up too; keep that in
+    mind on a busy server. Nothing runs unless a profile is started.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._frames: Dict[FrameKey, int] = {}
+        # thread name -> (stacks as frame-index lists, weights in ms)
+        self._samples: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _frame_index(self, key: FrameKey) -> int:
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight_ms, last = (now - last) * 1000, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(self._frame_index((code.co_name, code.co_filename, code.co_firstlineno)))
+                    frame = frame.f_back
+                stack.reverse()
+                stacks, weights = self._samples.setdefault(names.get(thread_id, str(thread_id)), ([], []))
+                stacks.append(stack)
+                weights.append(weight_ms)
+
+    def to_speedscope(self, name: str) -> dict:
+        """Speedscope "sampled" profiles, one per thread (open at https://www.speedscope.app)."""
+        frames = [None] * len(self._frames)
+        for (function, filename, line), index in self._frames.items():
+            frames[index] = {"name": function, "file": filename, "line": line}
+        end_ms = self.duration * 1000
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "gen-vidhik-sahayak",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end_ms,
+                    "samples": stacks,
+                    "weights": weights,
+                }
+                for thread_name, (stacks, weights) in sorted(
+                    self._samples.items(), key=lambda item: sum(item[1][1]), reverse=True
+                )
+            ],
+        }
+
+
+class ProfileStore:
+    """Keeps the newest `max_files` profiles in one directory (oldest deleted first)."""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, label: str, profile: dict) -> str:
+        """[Blocking] Writes the profile and returns its file name."""
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")[:60]
+        filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{safe_label}.speedscope.json"
+        with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        self._prune()
+        return filename
+
+    def _prune(self):
+        with self._lock:
+            entries = sorted(self.list(), key=lambda entry: entry["name"])
+            for entry in entries[: max(0, len(entries) - self.max_files)]:
+                try:
+                    os.remove(os.path.join(self.directory, entry["name"]))
+                except OSError:
+                    pass
+
+    def list(self) -> List[dict]:
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and e.name.endswith(".speedscope.json")]
+        except FileNotFoundError:
+            return []
+        return sorted(
+            ({"name": e.name, "bytes": e.stat().st_size} for e in entries),
+            key=lambda entry: entry["name"],
+            reverse=True,
+        )
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Absolute path of a stored profile, or None (also for names that try to leave the directory)."""
+        if os.path.basename(name) != name or not name.endswith(".speedscope.json"):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+# Create a singleton instance used by the profiling middleware and /admin/profiles
+profile_store = ProfileStore(PROFILES_PATH, settings.PROFILING_MAX_FILES)
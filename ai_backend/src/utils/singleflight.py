@@ -0,0 +1,102 @@
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Any) -> str:
+    """Canonical sha256 of JSON-serializable parts (dict keys sorted; unknown types via str())."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the leading caller was cancelled; followers retry."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work: while a call for `key` is in flight, later
+    callers with the same key wait for its result instead of starting their own.
+    Nothing is cached once the call finishes (see the extraction and LLM caches for that).
+
+    Works across threads and event loops: the shared result is a concurrent.futures.Future,
+    awaited from async code via `asyncio.wrap_future`. Results are shared by reference,
+    so callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key: str) -> Tuple[concurrent.futures.Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str, future: concurrent.futures.Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do_sync(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """[Blocking] Runs `fn(*args, **kwargs)` once per in-flight key; errors are shared too."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e if isinstance(e, Exception) else _LeaderCancelled())
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                self._finish(key, future)
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """[Async] Awaits `fn(*args, **kwargs)` once per in-flight key, sharing it with sync callers too."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # shield: a follower being cancelled must not cancel the shared call
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                self._finish(key, future)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
@@ -0,0 +1,170 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.config import settings
+from src.utils.instrumentation import set_stage_span_factory
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
+
+_provider = None
+
+
+def setup_tracing() -> bool:
+    """
+    Installs the global tracer provider (parent-based ratio sampling, batch export to an OTLP
+    collector or stdout) and hooks QueryEngine stages. Returns False if tracing stays off.
+    Until this runs, every span below is the OpenTelemetry API's no-op span.
+    """
+    global _provider
+    if not settings.TRACING_ENABLED:
+        return False
+    if not TRACING_AVAILABLE:
+        logger.warning("TRACING_ENABLED is set but opentelemetry is not installed. Tracing is off.")
+        return False
+    if _provider is not None:
+        return True
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    if settings.TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT, insecure=settings.TRACING_OTLP_INSECURE)
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+    set_stage_span_factory(lambda name: span(f"query.{name}"))
+    logger.info(
+        f"🔭 Tracing enabled: exporter={settings.TRACING_EXPORTER}, "
+        f"sample ratio={settings.TRACING_SAMPLE_RATIO}, service={settings.TRACING_SERVICE_NAME}"
+    )
+    return True
+
+
+def shutdown_tracing():
+    """Flushes buffered spans."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+        set_stage_span_factory(None)
+
+
+def _tracer():
+    return trace.get_tracer("gen_vidhik_sahayak")
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenTelemetry accepts str/bool/int/float (and sequences of them); drop None
+    return {key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Any]:
+    """
+    `with span("gemini.generate_content", **{"llm.purpose": "answer"}) as s:` — a child of
+    the current span (the request span, across threadpool and scheduler hops, since both
+    copy contextvars). Yields None when opentelemetry is not installed.
+    """
+    if not TRACING_AVAILABLE:
+        yield None
+        return
+    span_kind = {"server": SpanKind.SERVER, "client": SpanKind.CLIENT}.get(kind, SpanKind.INTERNAL)
+    with _tracer().start_as_current_span(name, kind=span_kind, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def set_attributes(**attributes):
+    """Adds attributes to the current span (no-op when nothing is being recorded)."""
+    if not TRACING_AVAILABLE:
+        return
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(_clean(attributes))
+
+
+def add_event(name: str, **attributes):
+    """Records a point-in-time event (e.g. a cache hit) on the current span."""
+    if not TRACING_AVAILABLE:
+        return
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.add_event(name, _clean(attributes))
+
+
+@contextmanager
+def server_span(method: str, headers, path: str) -> Iterator[Any]:
+    """Root span for an incoming request, continuing a W3C traceparent if the caller sent one."""
+    if not TRACING_AVAILABLE or _provider is None:
+        yield None
+        return
+    context = propagate.extract(dict(headers))
+    with _tracer().start_as_current_span(
+        f"{method} {path}", context=context, kind=SpanKind.SERVER,
+        attributes={"http.request.method": method, "url.path": path},
+    ) as current:
+        yield current
+
+
+def mongo_event_listeners() -> list:
+    """pymongo command listener emitting one CLIENT span per MongoDB command."""
+    if not settings.TRACING_ENABLED or not TRACING_AVAILABLE:
+        return []
+    from pymongo import monitoring
+
+    class MongoCommandTracer(monitoring.CommandListener):
+        def __init__(self):
+            self._spans: Dict[tuple, Any] = {}
+            self._lock = threading.Lock()
+
+        def started(self, event):
+            command = event.command
+            collection = command.get(event.command_name)
+            current = _tracer().start_span(
+                f"mongodb.{event.command_name}",
+                kind=SpanKind.CLIENT,
+                attributes=_clean({
+                    "db.system": "mongodb",
+                    "db.name": event.database_name,
+                    "db.operation": event.command_name,
+                    "db.mongodb.collection": collection if isinstance(collection, str) else None,
+                }),
+            )
+            with self._lock:
+                self._spans[(event.request_id, event.connection_id)] = current
+
+        def _finish(self, event, error: Optional[str] = None):
+            with self._lock:
+                current = self._spans.pop((event.request_id, event.connection_id), None)
+            if current is None:
+                return
+            if error:
+                current.set_status(Status(StatusCode.ERROR, error))
+            current.end()
+
+        def succeeded(self, event):
+            self._finish(event)
+
+        def failed(self, event):
+            self._finish(event, str(event.failure.get("errmsg", "failed")) if isinstance(event.failure, dict) else "failed")
+
+    return [MongoCommandTracer()]
@@ -0,0 +1,387 @@
+import io
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import FormParserError
+
+from src.config import settings
+
+# Initialize Logger
+logger = logging.getLogger(__name__)
+
+FORM_FIELD_MAX_BYTES = 1024 * 1024  # Text fields (e.g. a long situation description)
+FORM_MAX_FIELDS = 32
+
+
+class SpooledUpload:
+    """
+    An uploaded file that was streamed to a spool (memory for small files, a temp file
+    on disk for large ones) with its size and SHA-256 computed on the way in.
+    Extractors receive this handle (or its path) instead of a full `bytes` copy.
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str],
+        content_type: Optional[str],
+        size: int,
+        sha256: str,
+        buffer: Optional[io.BytesIO] = None,
+        path: Optional[str] = None,
+    ):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self._buffer = buffer
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._buffer is not None
+
+    def open(self) -> BinaryIO:
+        """A new read handle positioned at the start (callers close it)."""
+        if self._buffer is not None:
+            return io.BytesIO(self._buffer.getbuffer())
+        return open(self.path, "rb")
+
+    def read_bytes(self) -> bytes:
+        """[Blocking] Full contents as bytes, for APIs that need them (e.g. Vision requests)."""
+        with self.open() as f:
+            return f.read()
+
+    def as_path(self) -> str:
+        """
+        [Blocking] A path to the contents on disk. An in-memory upload is written to a
+        temp file once (and removed on close), so worker processes can be sent the path.
+        """
+        with self._lock:
+            if self.path is None:
+                with tempfile.NamedTemporaryFile(prefix="upload_", delete=False) as disk_file:
+                    disk_file.write(self._buffer.getbuffer())
+                self.path = disk_file.name
+                self._buffer.close()
+                self._buffer = None
+            return self.path
+
+    def save_to(self, path: str):
+        """[Blocking] Moves the spooled file to `path` (written out if it is still in memory)."""
+        with self._lock:
+            if self.path is not None:
+                shutil.move(self.path, path)
+                self.path = None
+            else:
+                with open(path, "wb") as target:
+                    target.write(self._buffer.getbuffer())
+
+    def close(self):
+        """Releases the spool: drops the memory buffer or deletes the temp file."""
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.close()
+                self._buffer = None
+            if self.path:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. The limit is {max_bytes // (1024 * 1024)} MB.",
+    )
+
+
+class _FileSpool:
+    """Accumulates one file part: hashes each chunk and rolls over from memory to disk."""
+
+    def __init__(self, filename: str, content_type: Optional[str], memory_limit: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0  # Bytes written so far
+        self.received = 0  # Bytes parsed so far (writes lag by at most one network chunk)
+        self._memory_limit = memory_limit
+        self._hasher = hashlib.sha256()
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._disk_file = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._disk_file is not None
+
+    def write(self, chunk: bytes):
+        """[Blocking once on disk] Hashes and stores a chunk of the part's body."""
+        self.size += len(chunk)
+        self._hasher.update(chunk)
+        if self._disk_file is not None:
+            self._disk_file.write(chunk)
+            return
+        self._buffer.write(chunk)
+        if self.size > self._memory_limit:
+            # Roll over from memory to a temp file on disk
+            self._disk_file = tempfile.NamedTemporaryFile(prefix="upload_", delete=False)
+            self._disk_file.write(self._buffer.getbuffer())
+            self._buffer.close()
+            self._buffer = None
+
+    def finish(self) -> SpooledUpload:
+        path = None
+        if self._disk_file is not None:
+            self._disk_file.close()
+            path = self._disk_file.name
+            self._disk_file = None
+        else:
+            self._buffer.seek(0)
+        return SpooledUpload(
+            filename=self.filename,
+            content_type=self.content_type,
+            size=self.size,
+            sha256=self._hasher.hexdigest(),
+            buffer=self._buffer,
+            path=path,
+        )
+
+    def discard(self):
+        if self._disk_file is not None:
+            self._disk_file.close()
+            os.remove(self._disk_file.name)
+            self._disk_file = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+
+class StreamedForm:
+    """Text fields and spooled files of a multipart request, parsed as its body streamed in."""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.files: Dict[str, List[SpooledUpload]] = {}
+
+    def field(self, name: str, default: Optional[str] = None, required: bool = False) -> Optional[str]:
+        if name in self.fields:
+            return self.fields[name]
+        if required:
+            raise HTTPException(status_code=422, detail=f"Missing form field '{name}'.")
+        return default
+
+    def file(self, name: str, required: bool = True) -> Optional[SpooledUpload]:
+        uploads = self.file_list(name, required=required)
+        return uploads[0] if uploads else None
+
+    def file_list(self, name: str, required: bool = True) -> List[SpooledUpload]:
+        uploads = self.files.get(name, [])
+        if required and not uploads:
+            raise HTTPException(status_code=422, detail=f"Missing file field '{name}'.")
+        return uploads
+
+    def close(self):
+        for uploads in self.files.values():
+            for upload in uploads:
+                upload.close()
+
+
+class _StreamingMultipartParser:
+    """
+    python-multipart callbacks (the same ones Starlette's form parser uses), except that
+    file parts go to `_FileSpool`s and the per-file size limit is checked on every chunk.
+    """
+
+    def __init__(self, charset: str, max_file_bytes: int, max_files: int):
+        self.form = StreamedForm()
+        self._charset = charset
+        self._max_file_bytes = max_file_bytes
+        self._max_files = max_files
+        self._memory_limit = settings.UPLOAD_SPOOL_MEMORY_MB * 1024 * 1024
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._field_name = ""
+        self._field_data = bytearray()
+        self._spool: Optional[_FileSpool] = None
+        self._open_spools: List[_FileSpool] = []
+        self._n_files = 0
+        # File data is written after each `parser.write` so disk I/O can leave the event loop
+        self._pending_writes: List[tuple] = []
+        self._finished: List[tuple] = []
+
+    def _decode(self, raw: bytes) -> str:
+        try:
+            return raw.decode(self._charset)
+        except (UnicodeDecodeError, LookupError):
+            return raw.decode("latin-1")
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._field_data = bytearray()
+        self._spool = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail='Multipart part without a "name" in Content-Disposition.')
+        self._field_name = self._decode(options[b"name"])
+        if b"filename" in options:
+            self._n_files += 1
+            if self._n_files > self._max_files:
+                raise HTTPException(status_code=413, detail=f"Too many files. The limit is {self._max_files} per request.")
+            content_type = self._headers.get(b"content-type")
+            self._spool = _FileSpool(
+                filename=self._decode(options[b"filename"]),
+                content_type=self._decode(content_type) if content_type else None,
+                memory_limit=self._memory_limit,
+            )
+            self._open_spools.append(self._spool)
+        elif len(self.form.fields) >= FORM_MAX_FIELDS:
+            raise HTTPException(status_code=413, detail=f"Too many form fields. The limit is {FORM_MAX_FIELDS}.")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if self._spool is None:
+            if len(self._field_data) + len(chunk) > FORM_FIELD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field '{self._field_name}' is too large.")
+            self._field_data.extend(chunk)
+            return
+        # Reject as soon as the streamed size passes the limit, before the rest arrives
+        self._spool.received += len(chunk)
+        if self._spool.received > self._max_file_bytes:
+            raise _too_large(self._max_file_bytes)
+        self._pending_writes.append((self._spool, chunk))
+
+    def on_part_end(self):
+        if self._spool is None:
+            self.form.fields[self._field_name] = self._decode(bytes(self._field_data))
+        else:
+            self._finished.append((self._field_name, self._spool))
+
+    async def flush(self):
+        """Writes the chunks queued by the last `parser.write` (off the loop once on disk)."""
+        for spool, chunk in self._pending_writes:
+            if spool.on_disk or spool.size + len(chunk) > self._memory_limit:
+                await run_in_threadpool(spool.write, chunk)
+            else:
+                spool.write(chunk)
+        self._pending_writes.clear()
+        for name, spool in self._finished:
+            self._open_spools.remove(spool)
+            upload = spool.finish()
+            if not upload.filename and upload.size == 0:
+                # An empty <input type="file"> is sent as a nameless, empty part
+                upload.close()
+                continue
+            self.form.files.setdefault(name, []).append(upload)
+        self._finished.clear()
+
+    def discard(self):
+        for spool in self._open_spools:
+            spool.discard()
+        self._open_spools.clear()
+        self.form.close()
+
+
+async def parse_multipart(
+    request: Request,
+    max_file_bytes: Optional[int] = None,
+    max_files: Optional[int] = None,
+) -> StreamedForm:
+    """
+    Parses a multipart/form-data body straight from `request.stream()`.
+    Each file is hashed and spooled as it arrives, and the request fails with 413 as soon
+    as one file passes `max_file_bytes` (UPLOAD_MAX_MB) - the rest of the body is not read.
+    """
+    max_file_bytes = max_file_bytes or settings.UPLOAD_MAX_MB * 1024 * 1024
+    max_files = max_files or settings.UPLOAD_MAX_FILES
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body.")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+
+    state = _StreamingMultipartParser(charset, max_file_bytes, max_files)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": state.on_part_begin,
+        "on_part_data": state.on_part_data,
+        "on_part_end": state.on_part_end,
+        "on_header_field": state.on_header_field,
+        "on_header_value": state.on_header_value,
+        "on_header_end": state.on_header_end,
+        "on_headers_finished": state.on_headers_finished,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await state.flush()
+        parser.finalize()
+        await state.flush()
+    except FormParserError as e:
+        state.discard()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    except BaseException:
+        state.discard()
+        raise
+    return state.form
+
+
+async def multipart_form(request: Request) -> AsyncIterator[StreamedForm]:
+    """FastAPI dependency: the streamed form of this request, spools released afterwards."""
+    form = await parse_multipart(request)
+    try:
+        yield form
+    finally:
+        form.close()
+
+
+def multipart_openapi(required: List[str], **properties: str) -> dict:
+    """
+    `openapi_extra` describing a body read by `multipart_form` (FastAPI cannot infer it).
+    Each property is "file", "files" or "string".
+    """
+    schemas = {
+        "file": {"type": "string", "format": "binary"},
+        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        "string": {"type": "string"},
+    }
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {name: schemas[kind] for name, kind in properties.items()},
+                        "required": required,
+                    }
+                }
+            },
+        }
+    }
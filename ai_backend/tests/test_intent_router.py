@@ -0,0 +1,102 @@
+import re
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.services.intent_router import IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text", [
+    "What is an affidavit?",
+    "what is a vakalatnama",
+    "explain the vakalatnama",
+    "how do i prepare for a bail hearing",
+    "What are my rights if arrested?",
+    "what is a plaint",
+])
+def test_questions_are_not_drafted(router, text):
+    assert router.route(text).intent == "question"
+
+
+@pytest.mark.parametrize("text, template_key", [
+    ("prepare a vakalatnama", "vakalatnama"),
+    ("make an affidavit", "affidavit"),
+    ("draft a bail application for my son", "bail_application"),
+    ("Draft the plaint for recovery of 5 lakh", "plaint"),
+    # Documents without a chat template key are left to the engine's template selector
+    ("please write a reply to the consumer complaint", "auto"),
+    ("I need a cheque bounce notice against Ravi", "auto"),
+    ("create an RTI application for my pension file", "auto"),
+])
+def test_drafting_requests(router, text, template_key):
+    routed = router.route(text)
+    assert routed.intent == "draft"
+    assert routed.template_key == template_key
+
+
+class _BrokenEmbedder:
+    def encode(self, texts, **kwargs):
+        raise RuntimeError("model not loaded")
+
+
+def test_embedder_failure_keeps_tfidf():
+    router = IntentRouter()
+    router.use_embedder(_BrokenEmbedder())
+    routed = router.route("prepare a vakalatnama")
+    assert (routed.intent, routed.template_key) == ("draft", "vakalatnama")
+
+
+class _BagOfWordsEmbedder:
+    """Deterministic stand-in for the sentence embedder: hashed, L2-normalized word counts."""
+
+    dim = 4096
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"[a-z0-9']+", text.lower()):
+                vectors[row, int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dim] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+@pytest.fixture(scope="module")
+def embedded_router():
+    router = IntentRouter()
+    router.use_embedder(_BagOfWordsEmbedder())
+    assert router.uses_embeddings
+    return router
+
+
+def test_tfidf_is_the_default(router):
+    assert not router.uses_embeddings
+
+
+@pytest.mark.parametrize("text", [
+    "What is an affidavit?",
+    "explain the vakalatnama",
+    "how do i prepare for a bail hearing",
+    "What are my rights if arrested?",
+])
+def test_embedded_questions_are_not_drafted(embedded_router, text):
+    assert embedded_router.route(text).intent == "question"
+
+
+@pytest.mark.parametrize("text, template_key", [
+    ("prepare a vakalatnama", "vakalatnama"),
+    ("make an affidavit", "affidavit"),
+    ("draft a bail application for my son", "bail_application"),
+    ("please write a reply to the consumer complaint", "auto"),
+    ("I need a cheque bounce notice against Ravi", "auto"),
+    ("create an RTI application for my pension file", "auto"),
+])
+def test_embedded_drafting_requests(embedded_router, text, template_key):
+    routed = embedded_router.route(text)
+    assert routed.intent == "draft"
+    assert routed.template_key == template_key
@@ -196,7 +196,8 @@ export default function Workspace() {
       setDraft(`⏳ Generating ${type} template...`);
       const response = await api.post("/draft-document", {
         scenario: originalSituation, 
-        template_type: type 
+        template_type: type,
+        facts: facts
       });
       setDraft(response.data.drafted_document);
     } catch (error) {